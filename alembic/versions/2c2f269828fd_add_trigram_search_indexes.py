@@ -0,0 +1,50 @@
+"""Add trigram search indexes for the dashboard text filters
+
+Revision ID: 2c2f269828fd
+Revises: 4f7082996b06
+Create Date: 2026-10-18 08:12:04.117362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c2f269828fd'
+down_revision: Union[str, None] = '4f7082996b06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Columns searched with ILIKE '%...%' by apply_filters() in app.py.
+# gin_trgm_ops handles ILIKE natively, so the indexes are on the raw columns (no lower()).
+TRIGRAM_COLUMNS = ['area', 'street_name', 'complex_name', 'agent']
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY keeps the properties table writable while the indexes build,
+    # it can not run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for column in TRIGRAM_COLUMNS:
+            op.create_index(
+                f'ix_properties_{column}_trgm',
+                'properties',
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in TRIGRAM_COLUMNS:
+            op.drop_index(
+                f'ix_properties_{column}_trgm',
+                table_name='properties',
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,48 @@
+"""Add saved_searches and saved_search_matches tables
+
+Revision ID: 3c9d5e6f1a27
+Revises: e81f4c2a7b35
+Create Date: 2026-10-18 18:12:47.602931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d5e6f1a27'
+down_revision: Union[str, None] = 'e81f4c2a7b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saved_searches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=True),
+    sa.Column('filters', sa.Text(), nullable=True),
+    sa.Column('notify', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_saved_searches_user_id'), 'saved_searches', ['user_id'], unique=False)
+    op.create_table('saved_search_matches',
+    sa.Column('search_id', sa.Integer(), nullable=False),
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('matched_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['search_id'], ['saved_searches.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('search_id', 'property_id')
+    )
+    op.create_index(op.f('ix_saved_search_matches_property_id'), 'saved_search_matches', ['property_id'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_saved_search_matches_property_id'), table_name='saved_search_matches')
+    op.drop_table('saved_search_matches')
+    op.drop_index(op.f('ix_saved_searches_user_id'), table_name='saved_searches')
+    op.drop_table('saved_searches')
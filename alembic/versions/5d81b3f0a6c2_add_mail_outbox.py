@@ -0,0 +1,42 @@
+"""Add mail_outbox table for queued outgoing email
+
+Revision ID: 5d81b3f0a6c2
+Revises: 9a4e1c7d2b60
+Create Date: 2026-10-18 11:06:52.284190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d81b3f0a6c2'
+down_revision: Union[str, None] = '9a4e1c7d2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mail_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=True),
+    sa.Column('recipients', sa.Text(), nullable=True),
+    sa.Column('cc', sa.Text(), nullable=True),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_mail_outbox_status'), 'mail_outbox', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mail_outbox_status'), table_name='mail_outbox')
+    op.drop_table('mail_outbox')
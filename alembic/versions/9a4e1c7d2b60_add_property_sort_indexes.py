@@ -0,0 +1,50 @@
+"""Add (column, id) indexes for server-side sorting of the property list
+
+Revision ID: 9a4e1c7d2b60
+Revises: 2c2f269828fd
+Create Date: 2026-10-18 09:41:27.530918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e1c7d2b60'
+down_revision: Union[str, None] = '2c2f269828fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Columns in SORT_COLUMNS (app.py) apart from the primary key.
+# The dashboard orders on (column NULLS LAST, id) in either direction, an ascending index can only be
+# scanned backwards as DESC NULLS FIRST so each column gets a matching DESC NULLS LAST index as well.
+SORT_COLUMNS = ['price', 'bedrooms', 'floor_area', 'stand_area', 'area']
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in SORT_COLUMNS:
+            op.create_index(
+                f'ix_properties_{column}_id',
+                'properties',
+                [column, 'id'],
+                postgresql_concurrently=True,
+            )
+            op.create_index(
+                f'ix_properties_{column}_id_desc',
+                'properties',
+                [sa.text(f'{column} DESC NULLS LAST'), sa.text('id DESC')],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in SORT_COLUMNS:
+            op.drop_index(f'ix_properties_{column}_id_desc', table_name='properties',
+                          postgresql_concurrently=True)
+            op.drop_index(f'ix_properties_{column}_id', table_name='properties',
+                          postgresql_concurrently=True)
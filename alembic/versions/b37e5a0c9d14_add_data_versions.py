@@ -0,0 +1,31 @@
+"""Add data_versions table for conditional GETs on property pages
+
+Revision ID: b37e5a0c9d14
+Revises: 5d81b3f0a6c2
+Create Date: 2026-10-18 15:42:10.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37e5a0c9d14'
+down_revision: Union[str, None] = '5d81b3f0a6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('data_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
@@ -0,0 +1,41 @@
+"""Add area_statistics summary table for per-area market statistics
+
+Revision ID: e81f4c2a7b35
+Revises: b37e5a0c9d14
+Create Date: 2026-10-18 17:05:33.214870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81f4c2a7b35'
+down_revision: Union[str, None] = 'b37e5a0c9d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('area_statistics',
+    sa.Column('area', sa.String(length=30), nullable=False),
+    sa.Column('prop_type', sa.String(length=255), nullable=False),
+    sa.Column('prop_category', sa.String(length=255), nullable=False),
+    sa.Column('listings', sa.Integer(), nullable=False),
+    sa.Column('priced', sa.Integer(), nullable=False),
+    sa.Column('price_p25', sa.BigInteger(), nullable=True),
+    sa.Column('price_median', sa.BigInteger(), nullable=True),
+    sa.Column('price_p75', sa.BigInteger(), nullable=True),
+    sa.Column('floor_price_per_m2', sa.Integer(), nullable=True),
+    sa.Column('stand_price_per_m2', sa.Integer(), nullable=True),
+    sa.Column('bedrooms_median', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('area', 'prop_type', 'prop_category')
+    )
+    # Filled by `flask refresh-area-statistics` after the upgrade, then kept up to date by the app
+
+
+def downgrade() -> None:
+    op.drop_table('area_statistics')
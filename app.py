@@ -1,17 +1,38 @@
-from flask import Flask, jsonify, render_template, request, redirect, url_for, session, flash, make_response
-from sqlalchemy import create_engine, or_, and_, func
+from flask import Flask, jsonify, render_template, request, redirect, url_for, session, flash, make_response, abort, g, \
+    Response, stream_with_context
+from sqlalchemy import or_, and_, func, select, tuple_, true
 from sqlalchemy.orm import sessionmaker, joinedload
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
-from models import User, Login, Property, Base, db
+from models import User, Login, Property, DataVersion, AreaStatistic, SavedSearch, SavedSearchMatch, Base, db
+from flask_sqlalchemy.pagination import QueryPagination
+from result_cache import ResultCache, CachedCounter, SharedVersion
+from pool_metrics import PoolMonitor
+from request_metrics import RequestMetrics
+from slow_queries import SlowQueryLog
+from mail_outbox import OutboxSender, enqueue
+from web_workers import WorkerBoard, reload_server
+from static_assets import StaticAssets, build_assets
+from property_import import IMPORT_COLUMNS, import_properties, read_rows
+from property_export import EXPORT_COLUMNS, stream_csv, stream_xlsx
+from property_batch import BATCH_ACTIONS, BATCH_COLUMNS, MAX_BATCH_IDS, BatchConflict, batch_values, count_batch, \
+    run_batch
+from facets import FacetCounts, PRICE_BANDS, bedroom_filter_counts, collect, facet_statement
+from area_stats import AreaStatistics, group_of
+from saved_searches import MATCH_COLUMNS, SavedSearchIndex, compile_filters
 from functools import wraps
-import smtplib
-from email.message import EmailMessage
-from string import Template
+from itsdangerous import URLSafeSerializer, BadSignature
 from pathlib import Path
+from types import SimpleNamespace
 import secrets
+import json
+import hashlib
+import time
 import os
+import click
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
 
 load_dotenv()
 
@@ -21,22 +42,234 @@ app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Dashboard pagination: 'offset' (numbered pages) or 'cursor' (keyset seek with prev/next cursors)
+app.config['DASHBOARD_PAGINATION'] = os.getenv("DASHBOARD_PAGINATION", "offset")
+# Largest page a client may ask for with ?per_page=, the dashboard shows 20 rows by default
+app.config['DASHBOARD_MAX_PER_PAGE'] = int(os.getenv("DASHBOARD_MAX_PER_PAGE", 500))
+
 # Database configuration
-app.config['SQLALCHEMY_POOL_TIMEOUT'] = 3600  # Set database time-out to 1 hour
+# The whole app shares one engine and one connection pool: Flask-SQLAlchemy's db.session (Property.query)
+# and the Session factory below both check out from it. The pool is sized for the request threads of one
+# process (WAITRESS_THREADS, used by my_waitress.py and gunicorn.conf.py alike), the overflow covers the mail
+# workers and the odd CLI command. Every worker process has its own pool.
+app.config['WAITRESS_THREADS'] = int(os.getenv("WAITRESS_THREADS", 4))
+# Where the site is reached, for links in mail sent outside a request (CLI imports)
+app.config['SITE_URL'] = os.getenv("SITE_URL", "http://localhost:8000/")
+pool_monitor = PoolMonitor(leak_seconds=int(os.getenv("DB_POOL_LEAK_SECONDS", 60)),
+                           trace=os.getenv("DB_POOL_LEAK_TRACE", "false").lower() == "true")
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True,  # Automatically reconnect on connection loss
+    'poolclass': pool_monitor.pool_class(),
+    'pool_size': int(os.getenv("DB_POOL_SIZE", app.config['WAITRESS_THREADS'])),
+    'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", 4)),
+    'pool_timeout': int(os.getenv("DB_POOL_TIMEOUT", 10)),  # Seconds a request waits for a free connection
+    'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", 1800)),
 }
 
-engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
 
+# Production runs several worker processes under gunicorn (see gunicorn.conf.py), each reporting its status to a
+# board shared through WORKER_STATUS_DIR; WEB_PIDFILE is the gunicorn master's pid file used by reload-server
+app.config['WORKER_STATUS_DIR'] = os.getenv("WORKER_STATUS_DIR", os.path.join(app.instance_path, 'workers'))
+app.config['WEB_PIDFILE'] = os.getenv("WEB_PIDFILE", os.path.join(app.instance_path, 'gunicorn.pid'))
+worker_board = WorkerBoard(app.config['WORKER_STATUS_DIR'])
+
+
+# Request, SQL, template and mail timings, scraped from /metrics. Registered first so a request answered by
+# another before_request function still carries its endpoint.
+request_metrics = RequestMetrics()
+request_metrics.init_app(app)
+
+# Statements slower than SLOW_QUERY_MS are kept with their plan for /admin/slow_queries
+slow_query_log = SlowQueryLog(threshold_ms=int(os.getenv("SLOW_QUERY_MS", 500)),
+                              size=int(os.getenv("SLOW_QUERY_LOG_SIZE", 100)),
+                              explain=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true")
+slow_query_log.init_app(app)
+
+
+# Registered before db.init_app() so it runs after Flask-SQLAlchemy has removed db.session (teardown
+# functions run in reverse order): whatever this thread still has checked out by then was leaked.
+@app.teardown_appcontext
+def check_connection_leaks(exc):
+    pool_monitor.check_thread(g.get('request_path', 'an app context'))
+
+
+@app.before_request
+def remember_request_path():
+    # The request is gone by the time the app context tears down, keep its path for the leak report
+    g.request_path = f'{request.method} {request.path}'
+
+
+# Creating the engine does not connect, the first query does. The schema is managed by alembic
+# (`flask create-tables` creates missing tables on a fresh development database).
 db.init_app(app)
+with app.app_context():
+    engine = db.engine
+pool_monitor.attach(engine)
+request_metrics.attach(engine)
+slow_query_log.attach(engine)
+
+Session = sessionmaker(bind=engine)
+
+# Compiled templates are cached as bytecode on disk, shared by every worker process and kept across
+# restarts, so only the first process after a template changes pays for compiling it
+app.config['JINJA_CACHE_DIR'] = os.getenv("JINJA_CACHE_DIR", os.path.join(app.instance_path, 'jinja_cache'))
+os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+
+# Static files are served from the fingerprinted, precompressed copies `flask build-assets` writes to
+# STATIC_BUILD_DIR (once per deploy, before reload-server) and cached by browsers for a year. Until the first
+# build they are served as they are. STATIC_BUILD_DIR must be inside the static folder, the app refuses to start
+# otherwise.
+app.config['STATIC_BUILD_DIR'] = os.getenv("STATIC_BUILD_DIR", os.path.join(app.static_folder, 'dist'))
+static_assets = StaticAssets(app.config['STATIC_BUILD_DIR'])
+static_assets.init_app(app)
+
+# Cache of dashboard search results, cleared whenever a property is added, updated or deleted
+dashboard_cache = ResultCache(maxsize=int(os.getenv("DASHBOARD_CACHE_SIZE", 512)),
+                              ttl=int(os.getenv("DASHBOARD_CACHE_TTL", 300)))
+
+# Optional cross-request cache of the logged-in user's details and admin flag, disabled when USER_CACHE_TTL is 0.
+# Cleared by admin_edit_user, account_settings and admin_delete_user.
+USER_INFO_FIELDS = ['id', 'name', 'surname', 'email', 'joined', 'has_access', 'is_admin']
+user_cache_ttl = int(os.getenv("USER_CACHE_TTL", 0))
+user_cache = ResultCache(maxsize=1024 if user_cache_ttl > 0 else 0, ttl=user_cache_ttl)
+
+# Number of registered users waiting for approval, shown to admins in the navbar.
+# Kept in memory and adjusted by register_user, admin_edit_user and admin_delete_user, and reconciled
+# against the database every PENDING_USERS_RECONCILE seconds.
+def count_pending_users():
+    with Session() as db_session:
+        return db_session.query(User).filter_by(has_access=False).count()
+
+
+pending_users_counter = CachedCounter(count_pending_users, int(os.getenv("PENDING_USERS_RECONCILE", 300)))
+PENDING_USERS_MAX_AGE = int(os.getenv("PENDING_USERS_MAX_AGE", 30))
+
+# Dashboard search backend: 'sql' (apply_filters on the database) or 'columnar' (in-memory NumPy engine
+# over a memory-mapped snapshot shared by all worker processes)
+app.config['SEARCH_BACKEND'] = os.getenv("SEARCH_BACKEND", "sql")
+app.config['SEARCH_SNAPSHOT_DIR'] = os.getenv(
+    "SEARCH_SNAPSHOT_DIR", os.path.join(app.instance_path, 'search_snapshot'))
+_search_engine = None
+
+
+def get_search_engine():
+    # Imported on first use: NumPy adds about 100ms to every worker boot and only the columnar backend needs it
+    global _search_engine
+    if _search_engine is None:
+        from search_engine import ColumnarSearchEngine
+        _search_engine = ColumnarSearchEngine(app.config['SEARCH_SNAPSHOT_DIR'])
+    return _search_engine
+
+
+# Versions of tables kept in the data_versions table so every process sees them, see result_cache.SharedVersion.
+# The properties version is bumped by properties_changed(): property pages use it as their ETag, and a process
+# that finds it was bumped by another process drops its own dashboard cache. Re-read at most every
+# DATA_VERSION_MAX_AGE seconds.
+def load_data_version(name):
+    with Session() as db_session:
+        row = db_session.get(DataVersion, name)
+        return (row.version, row.updated_at) if row else (0, None)
+
+
+def bump_data_version(name):
+    now = datetime.utcnow()
+    for _ in range(2):
+        with Session() as db_session:
+            updated = db_session.query(DataVersion).filter_by(name=name).update(
+                {'version': DataVersion.version + 1, 'updated_at': now}, synchronize_session=False)
+            if not updated:
+                db_session.add(DataVersion(name=name, version=1, updated_at=now))
+            try:
+                db_session.flush()
+            except IntegrityError:
+                # Another process created the row first, bump that one instead
+                db_session.rollback()
+                continue
+            version = db_session.query(DataVersion.version).filter_by(name=name).scalar()
+            db_session.commit()
+            return version, now
+    raise RuntimeError(f'Could not bump the {name} data version')
+
+
+def properties_changed_elsewhere():
+    # The caches of this process. The columnar search snapshot is shared on disk and the writing process has
+    # already published its change there, every search reads the live generation from CURRENT.
+    dashboard_cache.clear()
+    catalogue_facets.invalidate()
+
+
+# Filter facet counts (areas, types, agents, bedrooms, price bands, flags) of the whole catalogue, counted once
+# and then adjusted by every ORM write to a property, see facets.FacetCounts
+def count_facets(query):
+    with Session() as db_session:
+        return collect(db_session.execute(facet_statement(query)).all())
+
+
+catalogue_facets = FacetCounts(lambda: count_facets(Property.query))
+catalogue_facets.track()
+
+# Market statistics per area, type and category in the area_statistics table, recomputed for the groups a
+# committed write touched, see area_stats.AreaStatistics
+area_statistics = AreaStatistics(engine)
+area_statistics.track()
+
+properties_version = SharedVersion(lambda: load_data_version('properties'), lambda: bump_data_version('properties'),
+                                   max_age=float(os.getenv("DATA_VERSION_MAX_AGE", 1)),
+                                   on_change=properties_changed_elsewhere)
+
+
+# Saved dashboard searches, matched against every property written by add_property, update_property or an
+# import through an inverted index over their predicates (see saved_searches.SearchIndex). The index lives in
+# memory, searches saved or deleted here are applied to it directly and a change made by another process
+# (seen through the saved_searches data version) rebuilds it.
+def load_saved_searches():
+    with Session() as db_session:
+        return [(search_id, json.loads(filters))
+                for search_id, filters in db_session.query(SavedSearch.id, SavedSearch.filters)]
+
+
+saved_search_index = SavedSearchIndex(load_saved_searches)
+saved_searches_version = SharedVersion(lambda: load_data_version('saved_searches'),
+                                       lambda: bump_data_version('saved_searches'),
+                                       max_age=float(os.getenv("DATA_VERSION_MAX_AGE", 1)),
+                                       on_change=saved_search_index.invalidate)
+SAVED_SEARCHES_PER_USER = int(os.getenv("SAVED_SEARCHES_PER_USER", 50))
+# Properties loaded and matched per round trip, and listed per search in a notification email
+SAVED_SEARCH_BATCH = 1000
+SAVED_SEARCH_MAIL_LISTINGS = 20
+
+
+# Bulk property import: rows per COPY chunk and processes validating rows (0 for one per CPU)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 0)) or None
+
+
+# Rows fetched per server-side cursor round trip when streaming a filtered result as CSV/XLSX
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
 
 
 smtp_email = os.getenv("SMTP_EMAIL")
 smtp_password = os.getenv("SMTP_PASSWORD")
 
+# Outgoing mail is written to the mail_outbox table by the request and delivered by a pool of background
+# workers that keep their SMTP connections open. Set MAIL_WORKERS=0 to leave delivery to `flask mail-worker`.
+mail_sender = OutboxSender(
+    Session,
+    smtp_settings={
+        'host': os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        'port': int(os.getenv("SMTP_PORT", 587)),
+        'username': smtp_email,
+        'password': smtp_password,
+        'starttls': os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+    },
+    workers=int(os.getenv("MAIL_WORKERS", 2)),
+    batch_size=int(os.getenv("MAIL_BATCH_SIZE", 20)),
+    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", 5)),
+    backoff=int(os.getenv("MAIL_RETRY_BACKOFF", 30)),
+    metrics=request_metrics,
+)
+
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
 #                                                                       Function Declarations
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
@@ -52,29 +285,46 @@ def format_currency(value):
 
 
 def send_email(subject, recipients, content, cc=None):
-    html_template = Template(content)
-    html_content = html_template.substitute()
+    # Only queue the message here, the mail_sender workers deliver it
+    with Session() as db_session:
+        enqueue(db_session, subject, recipients, content, cc)
+    mail_sender.wake()
+
+
+# Property fields shown on each card of the export email, in the order the export template unpacks them
+EXPORT_FIELDS = ['description', 'price', 'beds', 'baths', 'garages', 'link_display', 'link']
 
-    message = EmailMessage()
-    message['from'] = 'Click & Buy - Mailer'
-    message['subject'] = subject
-    message.set_content(html_content, 'html')
 
-    with smtplib.SMTP(host='smtp.gmail.com', port=587) as smtp:
-        smtp.ehlo()
-        smtp.starttls()
-        smtp.login(smtp_email, smtp_password)
+# Renders an email body from the templates folder.
+# Goes straight to the Jinja environment, which compiles each template once and keeps it cached, and skips
+# the context processors render_template() runs for pages (no current user or pending count in mail).
+def render_mail(template_name, **context):
+    start = time.perf_counter()
+    html = app.jinja_env.get_template(template_name).render(**context)
+    request_metrics.observe_template(template_name, time.perf_counter() - start)
+    return html
 
-        for recipient in recipients:
-            message['to'] = recipient
-            if cc:
-                message['cc'] = cc  # Set the cc field if provided
-            smtp.send_message(message)
 
+# Builds an ILIKE '%value%' pattern, escaping any LIKE wildcards typed by the user.
+# The pattern is matched against the raw column (no lower()) so the pg_trgm GIN indexes can be used.
+def like_contains(value):
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
 
-def generate_pagination_html(total_pages, current_page):
+
+def generate_pagination_html(total_pages, current_page, cursors=None):
     pagination_html = '<ul class="pagination pagination-links justify-content-center">'
 
+    # Cursor (keyset) mode: only previous/next links, each carrying the opaque cursor for that page
+    if cursors is not None:
+        if cursors.get('prev'):
+            pagination_html += f'<li class="page-item"><a class="page-link pagination-link" data-page="{current_page - 1}" data-cursor="{cursors["prev"]}" href="#"><</a></li>'
+        pagination_html += f'<li class="page-item active"><span class="page-link">{current_page}</span></li>'
+        if cursors.get('next'):
+            pagination_html += f'<li class="page-item"><a class="page-link pagination-link" data-page="{current_page + 1}" data-cursor="{cursors["next"]}" href="#">></a></li>'
+        pagination_html += '</ul>'
+        return pagination_html
+
     # Previous page link
     if current_page > 1:
         pagination_html += f'<li class="page-item"><a class="page-link pagination-link" data-page="{current_page - 1}" href="#"><</a></li>'
@@ -100,6 +350,144 @@ def generate_pagination_html(total_pages, current_page):
     return pagination_html
 
 
+# Columns the property list can be ordered by on the server, the id is always added as the tie-break.
+# Each one is backed by (column, id) indexes in both directions, see alembic revision 9a4e1c7d2b60.
+SORT_COLUMNS = {
+    'id': Property.id,
+    'price': Property.price,
+    'bedrooms': Property.bedrooms,
+    'floor_area': Property.floor_area,
+    'stand_area': Property.stand_area,
+    'area': Property.area,
+}
+
+
+# ORDER BY clause for the property list, NULLs always last so listings without a value never lead the list.
+def property_ordering(sort, descending=False):
+    sort_column = SORT_COLUMNS[sort]
+    if sort_column is Property.id:
+        return [Property.id.desc() if descending else Property.id.asc()]
+    if descending:
+        return [sort_column.desc().nulls_last(), Property.id.desc()]
+    return [sort_column.asc().nulls_last(), Property.id.asc()]
+
+
+# Conditional GETs for pages built from the properties table. The ETag covers the data version, the
+# templates, the signed in user (name and admin badge in the navbar) and the parts given by the page, so an
+# If-None-Match that still matches is answered with 304 before properties is queried at all.
+def templates_version():
+    global _templates_version
+    if _templates_version is None or app.debug:
+        # Every template in the tree (pages/ and the partials too), and the directories so a removed file counts
+        mtimes = []
+        for directory, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+            mtimes.append(os.stat(directory).st_mtime)
+            mtimes += [os.stat(os.path.join(directory, name)).st_mtime for name in files]
+        _templates_version = max(mtimes, default=0)
+    return _templates_version
+
+
+_templates_version = None
+
+
+def property_page_etag(*parts):
+    version, updated_at = properties_version.current()
+    user = get_current_user_info()
+    pending = pending_users_counter.get() if user and user.is_admin else None
+    key = repr((version, templates_version(), static_assets.version, sorted(vars(user).items()) if user else None,
+                pending, parts))
+    return hashlib.sha1(key.encode()).hexdigest(), updated_at
+
+
+def not_modified(etag, updated_at):
+    # A page with flashed messages waiting must be rendered to show them
+    if not request.if_none_match.contains(etag) or session.get('_flashes'):
+        return None
+    return add_validators(Response(status=304), etag, updated_at)
+
+
+def add_validators(response, etag, updated_at):
+    response.set_etag(etag)
+    if updated_at is not None:
+        response.last_modified = updated_at
+    # Stored by the browser but revalidated on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+# Columns of the dashboard list (the table columns plus the sort keys the cursors need). The list is read as
+# plain rows instead of Property instances. bathrooms stays a Decimal, the JSON provider writes it as the same
+# "2.0" the page renders.
+LIST_COLUMNS = ['id', 'street_number', 'street_name', 'complex_number', 'complex_name', 'area', 'price',
+                'bedrooms', 'bathrooms', 'garages', 'swimming_pool', 'garden_flat', 'study', 'ground_floor',
+                'pet_friendly', 'link', 'link_display', 'floor_area', 'stand_area']
+LIST_SELECT = [getattr(Property, column) for column in LIST_COLUMNS]
+
+
+# Dicts for a page of list rows, extra trailing columns (such as total_count) are left out
+def serialize_rows(rows):
+    return [dict(zip(LIST_COLUMNS, row)) for row in rows]
+
+
+# Total of a filtered query as a scalar subquery column.
+# Added to the page query so the rows and the total count come back from the database in a single statement.
+def total_count_column(query):
+    return select(func.count()).select_from(
+        query.order_by(None).subquery()).scalar_subquery().label('total_count')
+
+
+# Offset pagination that fetches the page rows and the total in one round trip instead of a separate COUNT.
+class PropertyPagination(QueryPagination):
+    def _query_items(self):
+        query = self._query_args['query']
+        rows = query.add_columns(total_count_column(query)).limit(
+            self.per_page).offset(self._query_offset).all()
+        self._total_count = rows[0].total_count if rows else None
+        # The dashboard pages LIST_SELECT rows, they are returned whole with the total as last column
+        return rows
+
+    def _query_count(self):
+        if self._total_count is None:
+            # Only an empty page needs the separate COUNT
+            return super()._query_count() if self.page > 1 else 0
+        return self._total_count
+
+
+# Canonical form of a dashboard filter dict, used in the result cache key.
+# Text filters are matched with ILIKE so they are case-folded, the comma separated areas are also sorted.
+def normalize_filters(filters):
+    normalized = []
+    for name, value in sorted(filters.items()):
+        if value and name == 'area_filter':
+            value = ','.join(sorted({area.strip().lower()
+                             for area in value.split(',') if area.strip()}))
+        elif value and name in ('street_name_filter', 'complex_name_filter', 'agent_filter'):
+            value = value.lower()
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+# Opaque, signed cursors for keyset pagination on the dashboard.
+# A cursor holds the sort key and id of the boundary row, the direction to seek in and the page number it leads to.
+cursor_serializer = URLSafeSerializer(app.config['SECRET_KEY'] or '', salt='dashboard-cursor')
+
+
+def encode_cursor(sort_key, sort_value, row_id, direction, page):
+    return cursor_serializer.dumps({'s': sort_key, 'v': sort_value, 'id': row_id, 'd': direction, 'p': page})
+
+
+def decode_cursor(cursor, sort_key):
+    try:
+        data = cursor_serializer.loads(cursor)
+    except BadSignature:
+        return None
+    # A cursor taken under a different ordering can not be used to seek, start over from the first page
+    if data.get('s') != sort_key or data.get('d') not in ('next', 'prev'):
+        return None
+    return data
+
+
 # Function to check if the user is authenticated before each request
 def require_login():
     # Add routes that do not require authentication to the following list
@@ -125,34 +513,50 @@ def require_login():
     return decorator
 
 
+# Load the user columns the views and templates use into a plain object that is safe to share between
+# requests and threads (no session attached, no lazy loads).
+def load_user_info(user_id):
+    with Session() as db_session:
+        user = db_session.get(User, user_id)
+        if user is None:
+            return None
+        return SimpleNamespace(**{field: getattr(user, field) for field in USER_INFO_FIELDS})
+
+
 # Get user information to display in page.
+# Loaded at most once per request (kept on flask.g) and shared by require_login, the views and the templates.
 def get_current_user_info():
     user_id = session.get('user_id')
-    if user_id:
-        with Session() as db_session:
-            user = db_session.query(User).get(user_id)
-            if user:
-                return user
-    return None
+    if not user_id:
+        return None
+
+    if g.get('current_user_id') != user_id:
+        user = user_cache.get(user_id)
+        if user is None:
+            generation = user_cache.generation
+            user = load_user_info(user_id)
+            if user is not None:
+                user_cache.put(user_id, user, generation)
+        g.current_user_id = user_id
+        g.current_user = user
+    return g.current_user
 
 
 # Function to check if the logged-in user is an admin
 def is_admin(user_id):
-    with Session() as db_session:
-        user = db_session.query(User).get(user_id)
-        if user:
-            return user.is_admin
-        return False
+    if user_id is not None and user_id == session.get('user_id'):
+        user = get_current_user_info()
+    else:
+        user = load_user_info(user_id) if user_id else None
+    if user:
+        return user.is_admin
+    return False
 
 
 # Function that sends a notification email whenever a new user is registered.
 def send_notification_email(new_user_info, cc=None):
-    # Load the email template from the templates folder
-    template_path = os.path.join(os.path.dirname(
-        __file__), 'templates', 'mail.html')
-    html_template = Template(open(template_path, 'r').read())
-
-    html_content = html_template.substitute(
+    html_content = render_mail(
+        'mail.html',
         name=new_user_info['name'],
         surname=new_user_info['surname'],
         email=new_user_info['email']
@@ -184,14 +588,7 @@ def send_password_reset_email(user, reset_token):
     reset_link = f'{reset_token}'
 
     # Create the email content using an HTML template
-    content = f'''
-    <p>Hello {user.name},</p>
-    <p>You have requested to reset your password for your Click & Buy account.</p>
-    <p>Please click the following link to reset your password:</p>
-    <p><a href="{reset_link}">Reset Password</a></p>
-    <p>If you did not request this password reset, please ignore this email.</p>
-    <p>Best regards,<br>Your Click & Buy Team</p>
-    '''
+    content = render_mail('mail_password_reset.html', name=user.name, reset_link=reset_link)
 
     # Send the email
     send_email(subject, recipients, content)
@@ -204,6 +601,377 @@ def is_token_expired(token_creation_time, expiration_duration):
     return token_age > expiration_duration
 
 
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+#                                                                       Property Search Filters
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+
+# Checkbox filters post 'on' or 'true', read as a boolean the way PostgreSQL reads those literals
+def boolean_filter_value(value):
+    return value.strip().lower() in ('t', 'true', 'y', 'yes', 'on', '1')
+
+
+def apply_numeric_filter(property_attr, filter_value):
+    if filter_value == '1':
+        return property_attr == 1
+    elif filter_value == '2':
+        return (property_attr == 2) & (property_attr.isnot(None))
+    elif filter_value == '2+':
+        return (property_attr >= 2) & (property_attr.isnot(None))
+    elif filter_value == '3':
+        return (property_attr == 3) & (property_attr.isnot(None))
+    elif filter_value == '3+':
+        return (property_attr >= 3) & (property_attr.isnot(None))
+    elif filter_value == '4+':
+        return (property_attr >= 4) & (property_attr.isnot(None))
+    return None
+
+
+def apply_opertaions_filter(property_attr, filter_value, operation):
+    if operation == '=':
+        print('Equal to: ', filter_value)
+        return filter_value == property_attr
+    elif operation == '>':
+        print('Greater than: ', filter_value)
+        return filter_value < property_attr
+    elif operation == '<':
+        print('Less than: ', filter_value)
+        return filter_value > property_attr
+    return None
+
+
+def build_filters_from_form(form_data):
+    filters = {
+        'area_filter': form_data.get('area_filter'),
+        'min_price_filter': form_data.get('min_price_filter'),
+        'max_price_filter': form_data.get('max_price_filter'),
+        'street_name_filter': form_data.get('street_name_filter'),
+        'complex_name_filter': form_data.get('complex_name_filter'),
+        'number_filter': form_data.get('number_filter'),
+        'bedroom_filter': form_data.get('bedroom_filter'),
+        'bathroom_filter': form_data.get('bathroom_filter'),
+        'garages_filter': form_data.get('garages_filter'),
+        'swimming_pool_filter': form_data.get('swimming_pool_filter'),
+        'garden_flat_filter': form_data.get('garden_flat_filter'),
+        'study_filter': form_data.get('study_filter'),
+        'ground_floor_filter': form_data.get('ground_floor_filter'),
+        'pet_friendly_filter': form_data.get('pet_friendly_filter'),
+        'prop_type_filter': form_data.get('prop_type_filter'),
+        'prop_category_filter': form_data.get('prop_category_filter'),
+        'carports_filter': form_data.get('carports_filter'),
+        'agent_filter': form_data.get('agent_filter'),
+        'floor_area_filter': form_data.get('floor_area_filter'),
+        'floor_area_select': form_data.get('floor_area_select'),
+        'stand_area_filter': form_data.get('stand_area_filter'),
+        'stand_area_select': form_data.get('stand_area_select'),
+        # Add other filters here...
+    }
+
+    return filters
+
+
+def build_filters_from_request_args(args):
+    filters = {
+        'area_filter': args.get('area_filter'),
+        'min_price_filter': args.get('min_price_filter'),
+        'max_price_filter': args.get('max_price_filter'),
+        'street_name_filter': args.get('street_name_filter'),
+        'complex_name_filter': args.get('complex_name_filter'),
+        'number_filter': args.get('number_filter'),
+        'bedroom_filter': args.get('bedroom_filter'),
+        'bathroom_filter': args.get('bathroom_filter'),
+        'garages_filter': args.get('garages_filter'),
+        'swimming_pool_filter': args.get('swimming_pool_filter'),
+        'garden_flat_filter': args.get('garden_flat_filter'),
+        'study_filter': args.get('study_filter'),
+        'ground_floor_filter': args.get('ground_floor_filter'),
+        'pet_friendly_filter': args.get('pet_friendly_filter'),
+        'prop_type_filter': args.get('prop_type_filter'),
+        'prop_category_filter': args.get('prop_category_filter'),
+        'carports_filter': args.get('carports_filter'),
+        'agent_filter': args.get('agent_filter'),
+        'floor_area_filter': args.get('floor_area_filter'),
+        'floor_area_select': args.get('floor_area_select'),
+        'stand_area_filter': args.get('stand_area_filter'),
+        'stand_area_select': args.get('stand_area_select'),
+        # Add other filters here...
+    }
+    return filters
+
+
+def apply_filters(query, filters):
+    filter_clauses = []
+
+    if filters['area_filter']:
+        # Split areas into a list, each area becomes an ILIKE that the trigram index can serve (BitmapOr)
+        areas = [area.strip()
+                 for area in filters['area_filter'].split(',') if area.strip()]
+        if areas:
+            area_clauses = [Property.area.ilike(
+                like_contains(area), escape='\\') for area in areas]
+            filter_clauses.append(or_(*area_clauses))
+
+    if filters['min_price_filter']:
+        filter_clauses.append(
+            Property.price >= filters['min_price_filter'])
+    if filters['max_price_filter']:
+        filter_clauses.append(
+            Property.price <= filters['max_price_filter'])
+
+    if filters['street_name_filter']:
+        filter_clauses.append(Property.street_name.ilike(
+            like_contains(filters['street_name_filter']), escape='\\'))
+
+    if filters['agent_filter']:
+        filter_clauses.append(Property.agent.ilike(
+            like_contains(filters['agent_filter']), escape='\\'))
+
+    if filters['complex_name_filter']:
+        complex_name_pattern = like_contains(filters['complex_name_filter'])
+        complex_name_clause = or_(
+            Property.complex_name.ilike(
+                complex_name_pattern, escape='\\'),
+            Property.street_name.ilike(
+                complex_name_pattern, escape='\\')
+        )
+        filter_clauses.append(complex_name_clause)
+
+    if filters['number_filter']:
+        number_clause = or_(
+            Property.street_number == filters['number_filter'],
+            Property.complex_number == filters['number_filter']
+        )
+        filter_clauses.append(number_clause)
+
+    if filters['bedroom_filter']:
+        bedroom_clause = apply_numeric_filter(
+            Property.bedrooms, filters['bedroom_filter'])
+        filter_clauses.append(bedroom_clause)
+
+    if filters['bathroom_filter']:
+        bathroom_clause = apply_numeric_filter(
+            Property.bathrooms, filters['bathroom_filter'])
+        filter_clauses.append(bathroom_clause)
+
+    if filters['garages_filter']:
+        garages_clause = apply_numeric_filter(
+            Property.garages, filters['garages_filter'])
+        filter_clauses.append(garages_clause)
+
+    if filters['carports_filter']:
+        carports_clause = apply_numeric_filter(
+            Property.carports, filters['carports_filter'])
+        filter_clauses.append(carports_clause)
+
+    if filters['floor_area_filter']:
+        floor_area_clause = apply_opertaions_filter(
+            Property.floor_area, filters['floor_area_filter'], filters['floor_area_select'])
+        filter_clauses.append(floor_area_clause)
+
+    if filters['stand_area_filter']:
+        stand_area_clause = apply_opertaions_filter(
+            Property.stand_area, filters['stand_area_filter'], filters['stand_area_select'])
+        filter_clauses.append(stand_area_clause)
+
+    if filters['swimming_pool_filter']:
+        filter_clauses.append(Property.swimming_pool == True)
+    if filters['garden_flat_filter']:
+        filter_clauses.append(Property.garden_flat == True)
+
+    if filters['study_filter']:
+        filter_clauses.append(Property.study ==
+                              boolean_filter_value(filters['study_filter']))
+    if filters['ground_floor_filter']:
+        filter_clauses.append(Property.ground_floor ==
+                              boolean_filter_value(filters['ground_floor_filter']))
+    if filters['pet_friendly_filter']:
+        filter_clauses.append(Property.pet_friendly ==
+                              boolean_filter_value(filters['pet_friendly_filter']))
+
+    if filters['prop_type_filter'] == 'Any':
+        # Do nothing for 'Any'
+        pass
+    else:
+        filter_clauses.append(Property.prop_type ==
+                              filters['prop_type_filter'])
+
+    if filters['prop_category_filter'] == 'Any':
+        # Do nothing for 'Any'
+        pass
+    else:
+        filter_clauses.append(Property.prop_category ==
+                              filters['prop_category_filter'])
+
+    # Combine all filter clauses using AND
+    if filter_clauses:
+        query = query.filter(and_(*filter_clauses))
+    slow_query_log.note_filters(filters)
+
+    return query
+
+
+# Page of properties from the columnar engine, or None when it can not answer and SQL should be used
+def columnar_search(filters, sort, descending, page, per_page):
+    try:
+        if get_search_engine().snapshot() is None:
+            get_search_engine().rebuild(db.session, if_missing=True)
+        ids, total = get_search_engine().search(
+            filters, sort, descending, page, per_page)
+    except (ValueError, LookupError, OSError) as e:
+        print('Columnar search failed, using SQL instead:', e)
+        return None
+
+    # The engine only selects and orders ids, the rows themselves are one primary key lookup
+    by_id = {row.id: row for row in Property.query.with_entities(*LIST_SELECT).filter(
+        Property.id.in_(ids))} if ids else {}
+    return [by_id[property_id] for property_id in ids if property_id in by_id], total
+
+
+# Called after properties are added, updated or deleted so nothing derived from the table goes stale
+def properties_changed(property_ids, stat_groups=None):
+    # property_ids is None after a bulk write that touched too many rows to list. stat_groups are the
+    # (area, prop_type, prop_category) groups of a set-based write to the listed ids, which the ORM trackers
+    # did not see either.
+    bulk = property_ids is None or stat_groups is not None
+    if bulk:
+        # Before the version bump, so a page revalidated after it already shows the new statistics
+        try:
+            area_statistics.refresh(None if property_ids is None else stat_groups)
+        except Exception as e:
+            print('Area statistics refresh failed:', e)
+    try:
+        properties_version.bump()
+    except Exception as e:
+        print('Properties data version bump failed:', e)
+    dashboard_cache.clear()
+    if bulk:
+        # Bulk writes bypass the ORM, so the facet counts never saw them
+        catalogue_facets.invalidate()
+
+    if app.config['SEARCH_BACKEND'] == 'columnar':
+        try:
+            if property_ids is None:
+                get_search_engine().rebuild(db.session)
+            else:
+                get_search_engine().refresh(db.session, property_ids)
+        except Exception as e:
+            # A snapshot that missed a write must not be served, rebuild it on the next search instead
+            print('Search snapshot refresh failed:', e)
+            get_search_engine().invalidate()
+
+
+# Query string that opens the dashboard on a saved filter set
+def saved_search_args(filters):
+    return {name: value for name, value in filters.items() if value not in (None, '')}
+
+
+def saved_searches_changed(saved=(), deleted=()):
+    # saved: (search id, filters) of searches just saved, deleted: ids of searches just deleted
+    for search_id, filters in saved:
+        saved_search_index.add(search_id, filters)
+    for search_id in deleted:
+        saved_search_index.remove(search_id)
+    try:
+        saved_searches_version.bump()
+    except Exception as e:
+        print('Saved searches data version bump failed:', e)
+
+
+# Records the saved searches each property now matches and queues one email per user about the new matches.
+# Pairs recorded before are skipped, so editing a listing that already matched does not notify again.
+# Needs a request context for the links in the email. Returns the number of new matches.
+def notify_saved_searches(property_ids):
+    saved_searches_version.current()
+    index = saved_search_index.get()
+    if not len(index) or not property_ids:
+        return 0
+
+    property_ids = list(property_ids)
+    recorded = 0
+    for start in range(0, len(property_ids), SAVED_SEARCH_BATCH):
+        with Session() as db_session:
+            rows = {row['id']: dict(row) for row in db_session.execute(
+                select(*[getattr(Property, column) for column in MATCH_COLUMNS]).where(
+                    Property.id.in_(property_ids[start:start + SAVED_SEARCH_BATCH]))).mappings()}
+            pairs = {(search_id, property_id) for property_id, row in rows.items() for search_id in index.match(row)}
+            if not pairs:
+                continue
+
+            # Searches deleted since the index was built drop out here
+            searches = {search.id: (search, user) for search, user in db_session.query(SavedSearch, User).join(
+                User, User.id == SavedSearch.user_id).filter(SavedSearch.id.in_({search_id for search_id, _ in pairs}))}
+            pairs = {pair for pair in pairs if pair[0] in searches}
+            for attempt in range(3):
+                pairs = unrecorded_matches(db_session, pairs)
+                if not pairs:
+                    break
+                now = datetime.utcnow()
+                db_session.add_all([SavedSearchMatch(search_id=search_id, property_id=property_id, matched_at=now)
+                                    for search_id, property_id in pairs])
+                try:
+                    db_session.commit()
+                except IntegrityError:
+                    # Another process recorded some of these matches at the same moment and notifies about those,
+                    # the rest are recorded on the next pass
+                    db_session.rollback()
+                    if attempt == 2:
+                        raise
+                    continue
+                recorded += len(pairs)
+                queue_saved_search_mail(db_session, searches, pairs, rows)
+                break
+    return recorded
+
+
+def unrecorded_matches(db_session, pairs):
+    # The (search id, property id) pairs without a saved_search_matches row yet
+    if not pairs:
+        return pairs
+    return pairs - {tuple(pair) for pair in db_session.query(SavedSearchMatch.search_id, SavedSearchMatch.property_id)
+                    .filter(SavedSearchMatch.property_id.in_({property_id for _, property_id in pairs}),
+                            SavedSearchMatch.search_id.in_({search_id for search_id, _ in pairs}))}
+
+
+def queue_saved_search_mail(db_session, searches, pairs, rows):
+    matches = {}
+    for search_id, property_id in sorted(pairs):
+        matches.setdefault(search_id, []).append(rows[property_id])
+
+    by_user = {}
+    for search_id, properties in matches.items():
+        search, user = searches[search_id]
+        if search.notify and user.has_access and user.email:
+            by_user.setdefault(user.id, (user, []))[1].append({
+                'name': search.name,
+                'url': url_for('dashboard', _external=True, **saved_search_args(json.loads(search.filters))),
+                'total': len(properties),
+                'properties': [dict(row, url=url_for('view_property', property_id=row['id'], _external=True))
+                               for row in properties[:SAVED_SEARCH_MAIL_LISTINGS]],
+            })
+
+    for user, user_matches in by_user.values():
+        content = render_mail('mail_saved_search.html', name=user.name, matches=user_matches,
+                              saved_searches_url=url_for('saved_searches', _external=True))
+        enqueue(db_session, 'New listings for your saved searches', user.email, content)
+    if by_user:
+        mail_sender.wake()
+
+
+# An import appends rows, so the properties it wrote are the ones past the highest id before it started
+def last_property_id():
+    with Session() as db_session:
+        return db_session.query(func.max(Property.id)).scalar() or 0
+
+
+def notify_imported_properties(last_id):
+    try:
+        with Session() as db_session:
+            property_ids = [property_id for (property_id,) in db_session.query(Property.id).filter(
+                Property.id > last_id).order_by(Property.id)]
+        notify_saved_searches(property_ids)
+    except Exception as e:
+        print('Saved search notification failed:', e)
+
+
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
 #                                                                       Routes Start
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
@@ -225,205 +993,98 @@ def index():
 @app.route('/dashboard', methods=['GET', 'POST'])
 @require_login()
 def dashboard():
-    def apply_numeric_filter(property_attr, filter_value):
-        if filter_value == '1':
-            return property_attr == 1
-        elif filter_value == '2':
-            return (property_attr == 2) & (property_attr.isnot(None))
-        elif filter_value == '2+':
-            return (property_attr >= 2) & (property_attr.isnot(None))
-        elif filter_value == '3':
-            return (property_attr == 3) & (property_attr.isnot(None))
-        elif filter_value == '3+':
-            return (property_attr >= 3) & (property_attr.isnot(None))
-        elif filter_value == '4+':
-            return (property_attr >= 4) & (property_attr.isnot(None))
-        return None
-
-    def apply_opertaions_filter(property_attr, filter_value, operation):
-        if operation == '=':
-            print('Equal to: ', filter_value)
-            return filter_value == property_attr
-        elif operation == '>':
-            print('Greater than: ', filter_value)
-            return filter_value < property_attr
-        elif operation == '<':
-            print('Less than: ', filter_value)
-            return filter_value > property_attr
-        return None
-
-    def build_filters_from_form(form_data):
-        filters = {
-            'area_filter': form_data.get('area_filter'),
-            'min_price_filter': form_data.get('min_price_filter'),
-            'max_price_filter': form_data.get('max_price_filter'),
-            'street_name_filter': form_data.get('street_name_filter'),
-            'complex_name_filter': form_data.get('complex_name_filter'),
-            'number_filter': form_data.get('number_filter'),
-            'bedroom_filter': form_data.get('bedroom_filter'),
-            'bathroom_filter': form_data.get('bathroom_filter'),
-            'garages_filter': form_data.get('garages_filter'),
-            'swimming_pool_filter': form_data.get('swimming_pool_filter'),
-            'garden_flat_filter': form_data.get('garden_flat_filter'),
-            'study_filter': form_data.get('study_filter'),
-            'ground_floor_filter': form_data.get('ground_floor_filter'),
-            'pet_friendly_filter': form_data.get('pet_friendly_filter'),
-            'prop_type_filter': form_data.get('prop_type_filter'),
-            'prop_category_filter': form_data.get('prop_category_filter'),
-            'carports_filter': form_data.get('carports_filter'),
-            'agent_filter': form_data.get('agent_filter'),
-            'floor_area_filter': form_data.get('floor_area_filter'),
-            'floor_area_select': form_data.get('floor_area_select'),
-            'stand_area_filter': form_data.get('stand_area_filter'),
-            'stand_area_select': form_data.get('stand_area_select'),
-            # Add other filters here...
-        }
-
-        return filters
-
-    def build_filters_from_request_args(args):
-        filters = {
-            'area_filter': args.get('area_filter'),
-            'min_price_filter': args.get('min_price_filter'),
-            'max_price_filter': args.get('max_price_filter'),
-            'street_name_filter': args.get('street_name_filter'),
-            'complex_name_filter': args.get('complex_name_filter'),
-            'number_filter': args.get('number_filter'),
-            'bedroom_filter': args.get('bedroom_filter'),
-            'bathroom_filter': args.get('bathroom_filter'),
-            'garages_filter': args.get('garages_filter'),
-            'swimming_pool_filter': args.get('swimming_pool_filter'),
-            'garden_flat_filter': args.get('garden_flat_filter'),
-            'study_filter': args.get('study_filter'),
-            'ground_floor_filter': args.get('ground_floor_filter'),
-            'pet_friendly_filter': args.get('pet_friendly_filter'),
-            'prop_type_filter': args.get('prop_type_filter'),
-            'prop_category_filter': args.get('prop_category_filter'),
-            'carports_filter': args.get('carports_filter'),
-            'agent_filter': args.get('agent_filter'),
-            'floor_area_filter': args.get('floor_area_filter'),
-            'floor_area_select': args.get('floor_area_select'),
-            'stand_area_filter': args.get('stand_area_filter'),
-            'stand_area_select': args.get('stand_area_select'),
-            # Add other filters here...
-        }
-        return filters
-
-    def apply_filters(query, filters):
-        filter_clauses = []
-
-        if filters['area_filter']:
-            areas = filters['area_filter'].split(
-                ',')  # Split areas into a list
-            area_clauses = [Property.area.ilike(
-                f"%{area.strip().lower()}%") for area in areas]
-            filter_clauses.append(or_(*area_clauses))
-
-        if filters['min_price_filter']:
-            filter_clauses.append(
-                Property.price >= filters['min_price_filter'])
-        if filters['max_price_filter']:
-            filter_clauses.append(
-                Property.price <= filters['max_price_filter'])
-
-        if filters['street_name_filter']:
-            filter_clauses.append(func.lower(Property.street_name).ilike(
-                f"%{filters['street_name_filter'].lower()}%"))
-
-        if filters['agent_filter']:
-            filter_clauses.append(func.lower(Property.agent).ilike(
-                f"%{filters['agent_filter'].lower()}%"))
-
-        if filters['complex_name_filter']:
-            complex_name_clause = or_(
-                func.lower(Property.complex_name).ilike(
-                    f"%{filters['complex_name_filter'].lower()}%"),
-                func.lower(Property.street_name).ilike(
-                    f"%{filters['complex_name_filter'].lower()}%")
-            )
-            filter_clauses.append(complex_name_clause)
-
-        if filters['number_filter']:
-            number_clause = or_(
-                Property.street_number == filters['number_filter'],
-                Property.complex_number == filters['number_filter']
-            )
-            filter_clauses.append(number_clause)
-
-        if filters['bedroom_filter']:
-            bedroom_clause = apply_numeric_filter(
-                Property.bedrooms, filters['bedroom_filter'])
-            filter_clauses.append(bedroom_clause)
-
-        if filters['bathroom_filter']:
-            bathroom_clause = apply_numeric_filter(
-                Property.bathrooms, filters['bathroom_filter'])
-            filter_clauses.append(bathroom_clause)
-
-        if filters['garages_filter']:
-            garages_clause = apply_numeric_filter(
-                Property.garages, filters['garages_filter'])
-            filter_clauses.append(garages_clause)
-
-        if filters['carports_filter']:
-            carports_clause = apply_numeric_filter(
-                Property.carports, filters['carports_filter'])
-            filter_clauses.append(carports_clause)
-
-        if filters['floor_area_filter']:
-            floor_area_clause = apply_opertaions_filter(
-                Property.floor_area, filters['floor_area_filter'], filters['floor_area_select'])
-            filter_clauses.append(floor_area_clause)
-
-        if filters['stand_area_filter']:
-            stand_area_clause = apply_opertaions_filter(
-                Property.stand_area, filters['stand_area_filter'], filters['stand_area_select'])
-            filter_clauses.append(stand_area_clause)
-
-        if filters['swimming_pool_filter']:
-            filter_clauses.append(Property.swimming_pool == True)
-        if filters['garden_flat_filter']:
-            filter_clauses.append(Property.garden_flat == True)
-
-        if filters['study_filter']:
-            filter_clauses.append(Property.study == filters['study_filter'])
-        if filters['ground_floor_filter']:
-            filter_clauses.append(Property.ground_floor ==
-                                  filters['ground_floor_filter'])
-        if filters['pet_friendly_filter']:
-            filter_clauses.append(Property.pet_friendly ==
-                                  filters['pet_friendly_filter'])
-
-        if filters['prop_type_filter'] == 'Any':
-            # Do nothing for 'Any'
-            pass
+    def get_filtered_params(args):
+        return {k: v for k, v in args.items() if k not in ('page', 'cursor')}
+
+    def seek_rows(query, sort_column, descending, value, row_id, backwards, limit):
+        # Rows strictly past the boundary row (value, row_id) in the (sort key NULLS LAST, id) ordering.
+        # Non-null and NULL sort keys are read as two index range scans, the second only tops up a short page.
+        ascending_scan = descending == backwards
+
+        def ordered(q):
+            if ascending_scan:
+                return q.order_by(sort_column.asc(), Property.id.asc())
+            return q.order_by(sort_column.desc(), Property.id.desc())
+
+        if value is None:
+            id_past = Property.id > row_id if ascending_scan else Property.id < row_id
+            first = ordered(query.filter(sort_column.is_(None), id_past))
+            rest = ordered(query.filter(sort_column.isnot(None))) if backwards else None
         else:
-            filter_clauses.append(Property.prop_type ==
-                                  filters['prop_type_filter'])
-
-        if filters['prop_category_filter'] == 'Any':
-            # Do nothing for 'Any'
-            pass
+            boundary = tuple_(value, row_id)
+            key_past = tuple_(sort_column, Property.id) > boundary if ascending_scan \
+                else tuple_(sort_column, Property.id) < boundary
+            first = ordered(query.filter(key_past))
+            rest = ordered(query.filter(sort_column.is_(None))) \
+                if not backwards and sort_column is not Property.id else None
+
+        rows = first.limit(limit).all()
+        if rest is not None and len(rows) < limit:
+            rows += rest.limit(limit - len(rows)).all()
+        return rows
+
+    def keyset_page(query, cursor, page, per_page, sort, descending):
+        # Seek pagination: filter past the boundary row of the cursor instead of using OFFSET,
+        # ordered on (sort key, id) so rows never shift between pages while properties are added.
+        sort_key = f"{sort}:{'desc' if descending else 'asc'}"
+        sort_column = SORT_COLUMNS[sort]
+        cursor_data = decode_cursor(cursor, sort_key) if cursor else None
+        # The total of the whole filtered set rides along on every row, so one statement returns page and count
+        page_query = query.add_columns(total_count_column(query))
+
+        if cursor_data is None:
+            # First request in cursor mode, a jump to page N falls back to a single OFFSET hop
+            page = max(page, 1)
+            rows = page_query.order_by(*property_ordering(sort, descending)).offset(
+                (page - 1) * per_page).limit(per_page + 1).all()
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            has_prev = page > 1
+        elif cursor_data['d'] == 'next':
+            page = cursor_data['p']
+            rows = seek_rows(page_query, sort_column, descending,
+                             cursor_data['v'], cursor_data['id'], False, per_page + 1)
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            has_prev = True
         else:
-            filter_clauses.append(Property.prop_category ==
-                                  filters['prop_category_filter'])
-
-        # Combine all filter clauses using AND
-        if filter_clauses:
-            query = query.filter(and_(*filter_clauses))
-            print('Query: ', query)
-
-        return query
-
-    def get_filtered_params(args):
-        return {k: v for k, v in args.items() if k != 'page'}
+            page = cursor_data['p']
+            rows = seek_rows(page_query, sort_column, descending,
+                             cursor_data['v'], cursor_data['id'], True, per_page + 1)
+            has_prev = len(rows) > per_page and page > 1
+            rows = list(reversed(rows[:per_page]))
+            has_next = True
+
+        # An empty page carries no total, only then (past the first page) is a separate COUNT needed
+        if rows:
+            total = rows[0].total_count
+        else:
+            total = 0 if page == 1 else query.order_by(None).count()
+        properties = rows
+        cursors = {
+            'prev': encode_cursor(sort_key, getattr(properties[0], sort), properties[0].id, 'prev', page - 1)
+            if properties and has_prev else None,
+            'next': encode_cursor(sort_key, getattr(properties[-1], sort), properties[-1].id, 'next', page + 1)
+            if properties and has_next else None,
+        }
+        return properties, total, page, cursors
 
     user = get_current_user_info()
     page = request.args.get('page', 1, type=int)
-    per_page = 20  # Number of properties per page
+    # Number of properties per page
+    per_page = min(max(request.values.get('per_page', 20, type=int), 1), app.config['DASHBOARD_MAX_PER_PAGE'])
+    pagination_mode = request.values.get(
+        'pagination', app.config['DASHBOARD_PAGINATION'])
+    if pagination_mode not in ('offset', 'cursor'):
+        pagination_mode = 'offset'
+    # Server-side ordering, unknown columns fall back to the id
+    sort = request.values.get('sort', 'id')
+    if sort not in SORT_COLUMNS:
+        sort = 'id'
+    descending = request.values.get('order') == 'desc'
 
     if user:
-        properties_query = Property.query
+        properties_query = Property.query.with_entities(*LIST_SELECT)
 
         # Handle filtering
         if request.method == 'POST':
@@ -433,35 +1094,85 @@ def dashboard():
             filters = build_filters_from_request_args(request.args)
             properties_query = apply_filters(properties_query, filters)
 
-        filtered_properties = properties_query.paginate(
-            page=page, per_page=per_page)
-        selected_areas = [area for area in properties_query.with_entities(
-            Property.area).distinct()]
+        # Repeated searches are served from the result cache, writes to properties clear it
+        cache_key = (normalize_filters(filters), pagination_mode, page, per_page, sort, descending,
+                     request.args.get('cursor') if pagination_mode == 'cursor' else None)
+        etag, updated_at = property_page_etag(request.method, cache_key)
+        unchanged = not_modified(etag, updated_at)
+        if unchanged is not None:
+            return unchanged
+        result = dashboard_cache.get(cache_key)
+
+        if result is None:
+            generation = dashboard_cache.generation
+            engine_result = None
+            if app.config['SEARCH_BACKEND'] == 'columnar' and pagination_mode == 'offset':
+                engine_result = columnar_search(
+                    filters, sort, descending, page, per_page)
+
+            if engine_result is not None:
+                properties, total = engine_result
+                if not properties and page != 1:
+                    abort(404)
+                current_page, cursors = page, None
+                total_pages = (total + per_page - 1) // per_page
+            elif pagination_mode == 'cursor':
+                properties, total, current_page, cursors = keyset_page(
+                    properties_query, request.args.get('cursor'), page, per_page, sort, descending)
+                total_pages = (total + per_page - 1) // per_page
+            else:
+                filtered_properties = PropertyPagination(
+                    query=properties_query.order_by(*property_ordering(sort, descending)), page=page, per_page=per_page)
+                properties, total, current_page, total_pages, cursors = filtered_properties.items, \
+                    filtered_properties.total, filtered_properties.page, filtered_properties.pages, None
+
+            result = {
+                'properties': serialize_rows(properties),
+                'total': total,
+                'current_page': current_page,
+                'total_pages': total_pages,
+                'cursors': cursors,
+            }
+            dashboard_cache.put(cache_key, result, generation)
+
+        properties, total, current_page, total_pages, cursors = result['properties'], result['total'], \
+            result['current_page'], result['total_pages'], result['cursors']
 
-        total_pages = properties_query.paginate(
-            page=page, per_page=per_page).total
-        current_page = page
-        pagination_html = generate_pagination_html(total_pages, current_page)
         paginationHTML = generate_pagination_html(
-            filtered_properties.pages, filtered_properties.page)
+            total_pages, current_page, cursors)
 
         if request.method == 'POST':
+            pagination_data = {
+                'mode': pagination_mode,
+                'sort': sort,
+                'order': 'desc' if descending else 'asc',
+                'total': total,
+                'per_page': per_page,
+                'current_page': current_page,
+                'pages': total_pages,
+                'paginationHTML': paginationHTML
+            }
+            if cursors is not None:
+                pagination_data['prev_cursor'] = cursors['prev']
+                pagination_data['next_cursor'] = cursors['next']
+
             properties_data = {
-                'properties': [property.serialize() for property in filtered_properties.items],
-                'pagination': {
-                    'total': filtered_properties.total,
-                    'per_page': filtered_properties.per_page,
-                    'current_page': filtered_properties.page,
-                    'pages': filtered_properties.pages,
-                    'paginationHTML': generate_pagination_html(
-                        filtered_properties.pages, filtered_properties.page)  # Update this line
-                }
+                'properties': properties,
+                'pagination': pagination_data
             }
-            return jsonify(properties_data)  # Return JSON for AJAX requests
+            # Return JSON for AJAX requests
+            return add_validators(jsonify(properties_data), etag, updated_at)
 
-        return render_template('dashboard.html',
+        facets = catalogue_facets.get()
+        html = render_template('dashboard.html',
                                user=user,
-                               properties=filtered_properties,
+                               facets=facets,
+                               area_stats=area_statistics_for(filters),
+                               bedroom_counts=bedroom_filter_counts(facets),
+                               price_bands=[label for label, _, _ in PRICE_BANDS],
+                               batch_columns=BATCH_COLUMNS,
+                               properties=properties,
+                               total_pages=total_pages,
                                selected_areas=[],
                                filters=filters,
                                min_price_filter=filters.get(
@@ -492,12 +1203,187 @@ def dashboard():
                                carports_filter=filters.get('carports_filter'),
                                agent_filter=filters.get('agent_filter'),
                                get_filtered_params=get_filtered_params,
+                               pagination_mode=pagination_mode,
+                               sort=sort,
+                               order='desc' if descending else 'asc',
+                               per_page=per_page,
                                pagination_html=paginationHTML)
+        return add_validators(make_response(html), etag, updated_at)
     else:
         flash('You need to login first.', 'error')
         return redirect(url_for('login_page'))
 
 
+# Facet counts for the filter form: the whole catalogue (kept in memory) and the properties matching the
+# current filters (one UNION ALL statement, cached with the dashboard results)
+@app.route('/dashboard/facets', methods=['GET', 'POST'])
+@require_login()
+def dashboard_facets():
+    if request.method == 'POST':
+        filters = build_filters_from_form(request.form)
+    else:
+        filters = build_filters_from_request_args(request.args)
+    cache_key = ('facets', normalize_filters(filters))
+    etag, updated_at = property_page_etag(cache_key)
+    unchanged = not_modified(etag, updated_at)
+    if unchanged is not None:
+        return unchanged
+
+    filtered = dashboard_cache.get(cache_key)
+    if filtered is None:
+        generation = dashboard_cache.generation
+        filtered = count_facets(apply_filters(Property.query, filters))
+        dashboard_cache.put(cache_key, filtered, generation)
+
+    catalogue = catalogue_facets.get()
+    return add_validators(jsonify({
+        'catalogue': catalogue,
+        'filtered': filtered,
+        'bedroom_counts': {'catalogue': bedroom_filter_counts(catalogue), 'filtered': bedroom_filter_counts(filtered)},
+    }), etag, updated_at)
+
+
+# Market statistics of the areas, type and category the dashboard is filtered on, read from area_statistics
+def area_statistics_for(filters, limit=12):
+    query = db.session.query(AreaStatistic)
+    if filters.get('area_filter'):
+        areas = [area.strip() for area in filters['area_filter'].split(',') if area.strip()]
+        if areas:
+            query = query.filter(or_(*[AreaStatistic.area.ilike(like_contains(area), escape='\\')
+                                       for area in areas]))
+    if filters.get('prop_type_filter') not in (None, '', 'Any'):
+        query = query.filter(AreaStatistic.prop_type == filters['prop_type_filter'])
+    if filters.get('prop_category_filter') not in (None, '', 'Any'):
+        query = query.filter(AreaStatistic.prop_category == filters['prop_category_filter'])
+    return query.order_by(AreaStatistic.listings.desc(), AreaStatistic.area).limit(limit).all()
+
+
+@app.route('/dashboard/area_statistics', methods=['GET', 'POST'])
+@require_login()
+def dashboard_area_statistics():
+    if request.method == 'POST':
+        filters = build_filters_from_form(request.form)
+    else:
+        filters = build_filters_from_request_args(request.args)
+    etag, updated_at = property_page_etag('area_statistics', normalize_filters(filters))
+    unchanged = not_modified(etag, updated_at)
+    if unchanged is not None:
+        return unchanged
+    html = render_template('area_statistics.html', area_stats=area_statistics_for(filters))
+    return add_validators(jsonify({'html': html}), etag, updated_at)
+
+
+# Saved searches of the current user. POST saves the dashboard filter form as posted (JSON for the dashboard's
+# AJAX call), new properties matching it are then mailed to the user by notify_saved_searches()
+@app.route('/saved_searches', methods=['GET', 'POST'])
+@require_login()
+def saved_searches():
+    user = get_current_user_info()
+    if request.method == 'POST':
+        name = (request.form.get('name') or '').strip()[:100]
+        filters = build_filters_from_form(request.form)
+        if not name:
+            return jsonify({'error': 'Please give the search a name.'}), 400
+        try:
+            compile_filters(filters)
+        except ValueError:
+            return jsonify({'error': 'Prices and areas must be numbers.'}), 400
+
+        with Session() as db_session:
+            if db_session.query(SavedSearch).filter_by(user_id=user.id).count() >= SAVED_SEARCHES_PER_USER:
+                return jsonify({'error': f'You can save up to {SAVED_SEARCHES_PER_USER} searches.'}), 400
+            search = SavedSearch(user_id=user.id, name=name, filters=json.dumps(filters), notify=True,
+                                 created_at=datetime.utcnow())
+            db_session.add(search)
+            db_session.commit()
+            search_id = search.id
+        saved_searches_changed(saved=[(search_id, filters)])
+        return jsonify({'id': search_id, 'name': name})
+
+    with Session() as db_session:
+        rows = db_session.query(SavedSearch, func.count(SavedSearchMatch.property_id),
+                                func.max(SavedSearchMatch.matched_at)).outerjoin(
+            SavedSearchMatch, SavedSearchMatch.search_id == SavedSearch.id).filter(
+            SavedSearch.user_id == user.id).group_by(SavedSearch.id).order_by(SavedSearch.created_at.desc()).all()
+        searches = []
+        for search, matches, last_match in rows:
+            filters = saved_search_args(json.loads(search.filters))
+            searches.append({
+                'id': search.id,
+                'name': search.name,
+                'notify': search.notify,
+                'created_at': search.created_at,
+                'matches': matches,
+                'last_match': last_match,
+                'filters': {name: value for name, value in filters.items() if value != 'Any'},
+                'url': url_for('dashboard', **filters),
+            })
+    return render_template('saved_searches.html', user=user, searches=searches)
+
+
+@app.route('/saved_searches/<int:search_id>/notify', methods=['POST'])
+@require_login()
+def toggle_saved_search_notify(search_id):
+    with Session() as db_session:
+        search = db_session.get(SavedSearch, search_id)
+        if search is None or search.user_id != session['user_id']:
+            abort(404)
+        search.notify = not search.notify
+        db_session.commit()
+        flash(f"Emails for '{search.name}' turned {'on' if search.notify else 'off'}.", 'success')
+    return redirect(url_for('saved_searches'))
+
+
+@app.route('/saved_searches/<int:search_id>/delete', methods=['POST'])
+@require_login()
+def delete_saved_search(search_id):
+    with Session() as db_session:
+        search = db_session.get(SavedSearch, search_id)
+        if search is None or search.user_id != session['user_id']:
+            abort(404)
+        db_session.query(SavedSearchMatch).filter_by(search_id=search_id).delete(synchronize_session=False)
+        db_session.delete(search)
+        db_session.commit()
+    saved_searches_changed(deleted=[search_id])
+    flash('Saved search deleted.', 'success')
+    return redirect(url_for('saved_searches'))
+
+
+# Downloads every property matching the dashboard filters (not just the current page) as CSV or XLSX.
+# The rows are streamed from a server-side cursor, so memory use does not grow with the size of the result.
+@app.route('/dashboard/export', methods=['GET', 'POST'])
+@require_login()
+def export_properties():
+    export_format = request.values.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        abort(400)
+    sort = request.values.get('sort', 'id')
+    if sort not in SORT_COLUMNS:
+        sort = 'id'
+    descending = request.values.get('order') == 'desc'
+
+    if request.method == 'POST':
+        filters = build_filters_from_form(request.form)
+    else:
+        filters = build_filters_from_request_args(request.args)
+    statement = apply_filters(Property.query.with_entities(
+        *[getattr(Property, column) for column in EXPORT_COLUMNS]), filters).order_by(
+        *property_ordering(sort, descending)).statement
+
+    filename = f"properties-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    if export_format == 'xlsx':
+        body = stream_xlsx(engine, statement, batch_size=EXPORT_BATCH_SIZE)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_csv(engine, statement, batch_size=EXPORT_BATCH_SIZE)
+        mimetype = 'text/csv'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
 #                                                                       Property Routes
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
@@ -505,6 +1391,11 @@ def dashboard():
 @app.route('/view_property/<int:property_id>')
 @require_login()
 def view_property(property_id):
+    etag, updated_at = property_page_etag('view_property', property_id)
+    unchanged = not_modified(etag, updated_at)
+    if unchanged is not None:
+        return unchanged
+
     with Session() as db_session:
         user = get_current_user_info()
         property = db_session.query(Property).get(property_id)
@@ -513,7 +1404,10 @@ def view_property(property_id):
             flash('Property not found.', 'error')
             return redirect(url_for('dashboard'))
 
-        return render_template('property_details.html', user=user, property=property)
+        market = db_session.get(AreaStatistic, group_of(
+            {'area': property.area, 'prop_type': property.prop_type, 'prop_category': property.prop_category}))
+        html = render_template('property_details.html', user=user, property=property, market=market)
+        return add_validators(make_response(html), etag, updated_at)
 
 
 @app.route('/update_property/<int:property_id>', methods=['POST'])
@@ -575,6 +1469,11 @@ def update_property(property_id):
                 # Update other attributes similarly
 
                 db_session.commit()
+                properties_changed([property_id])
+                try:
+                    notify_saved_searches([property_id])
+                except Exception as e:
+                    print('Saved search notification failed:', e)
                 flash('Property information updated successfully.', 'success')
     else:
         flash('You do not have permission to edit this property.', 'error')
@@ -595,6 +1494,7 @@ def delete_property(property_id):
 
             db_session.delete(property_to_delete)
             db_session.commit()
+            properties_changed([property_id])
 
             flash('Property deleted successfully.', 'success')
     else:
@@ -606,10 +1506,7 @@ def delete_property(property_id):
 @app.route('/add_property', methods=['GET', 'POST'])
 @require_login()
 def add_property():
-    user_id = session.get('user_id')
-    if user_id:
-        with Session() as db_session:
-            user = db_session.query(User).get(user_id)
+    user = get_current_user_info()
 
     # Check if the user is an admin
     if 'user_id' in session and session['is_admin']:
@@ -673,6 +1570,11 @@ def add_property():
             )
             db.session.add(new_property)
             db.session.commit()
+            properties_changed([new_property.id])
+            try:
+                notify_saved_searches([new_property.id])
+            except Exception as e:
+                print('Saved search notification failed:', e)
 
             flash('Property added successfully!', 'success')
             return redirect(url_for('dashboard'))
@@ -684,6 +1586,100 @@ def add_property():
         flash('You need to be logged in as an admin to access this page.', 'error')
         return redirect(url_for('login_page'))
 
+# Set-based edits of many listings at once from the dashboard's selection bar. The scope is either the posted ids
+# (comma separated) or every property matching the posted dashboard filters; a filter scope has to carry the
+# count the admin confirmed (expected), so a filter that matches more than was previewed is rolled back.
+# Fields to set are posted as set_<column>. dry_run only counts the scope.
+@app.route('/admin/properties/batch', methods=['POST'])
+@require_login()
+def admin_batch_properties():
+    action = request.form.get('action')
+    if action not in BATCH_ACTIONS:
+        return jsonify({'error': 'Choose update or delete.'}), 400
+    dry_run = boolean_filter_value(request.form.get('dry_run') or 'false')
+
+    if request.form.get('scope') == 'filters':
+        filters = build_filters_from_form(request.form)
+        where = apply_filters(Property.query, filters).whereclause
+        if where is None:
+            where = true()
+    else:
+        try:
+            ids = sorted({int(value) for value in (request.form.get('ids') or '').split(',') if value.strip()})
+        except ValueError:
+            return jsonify({'error': 'Property ids must be numbers.'}), 400
+        if not ids:
+            return jsonify({'error': 'No properties selected.'}), 400
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({'error': f'Select up to {MAX_BATCH_IDS} properties, or apply to the filters.'}), 400
+        where = Property.id.in_(ids)
+
+    values = None
+    if action == 'update':
+        try:
+            values = batch_values({name[4:]: value for name, value in request.form.items() if name.startswith('set_')})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    expected = request.form.get('expected')
+    if expected is not None and not expected.isdigit():
+        return jsonify({'error': 'expected must be a count.'}), 400
+    expected = int(expected) if expected is not None else None
+    if dry_run:
+        with engine.connect() as conn:
+            return jsonify({'action': action, 'matched': count_batch(conn, where)})
+    if request.form.get('scope') == 'filters' and expected is None:
+        return jsonify({'error': 'Preview the batch first, a filter batch needs the confirmed count.'}), 400
+
+    try:
+        with engine.begin() as conn:
+            result = run_batch(conn, action, where, values, expected)
+    except BatchConflict as e:
+        return jsonify({'error': f'{e} Nothing was changed, preview the batch again.'}), 409
+    except DBAPIError as e:
+        # A value the column rejects, e.g. a price beyond its range; the transaction rolled back
+        print('Batch failed:', e)
+        return jsonify({'error': 'The database rejected the change, nothing was changed.'}), 400
+
+    if result.ids:
+        properties_changed(result.ids, stat_groups=result.groups)
+        if action == 'update':
+            try:
+                notify_saved_searches(result.ids)
+            except Exception as e:
+                print('Saved search notification failed:', e)
+    return jsonify({'action': action, 'affected': result.affected})
+
+
+@app.route('/admin/import_properties', methods=['GET', 'POST'])
+@require_login()
+def admin_import_properties():
+    user = get_current_user_info()
+    report = None
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename.lower().endswith(('.csv', '.xlsx')):
+            flash('Please choose a .csv or .xlsx file.', 'error')
+            return redirect(url_for('admin_import_properties'))
+
+        last_id = last_property_id()
+        try:
+            report = import_properties(engine, read_rows(upload.stream, upload.filename),
+                                       chunk_size=IMPORT_CHUNK_SIZE, workers=IMPORT_WORKERS)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('admin_import_properties'))
+
+        if report.inserted:
+            properties_changed(None)
+            notify_imported_properties(last_id)
+        flash(f'Imported {report.inserted} of {report.rows} properties in {report.elapsed:.1f}s.',
+              'success' if not report.errors else 'warning')
+
+    return render_template('admin_import_properties.html', user=user, report=report, columns=IMPORT_COLUMNS)
+
+
 # <----------------------------------------------------------------------------------------------------------------------------------------------------------->
 #                                                                       Authentication Routes
 # <----------------------------------------------------------------------------------------------------------------------------------------------------------->
@@ -765,6 +1761,7 @@ def register_user():
         session.add(new_user)
         session.commit()
         session.close()
+        pending_users_counter.adjust(1)
 
         # Generate new user info and runs the mailer to inform admins that a new user is registered.
         new_user_info = {
@@ -806,24 +1803,102 @@ def logout():
 
 @app.context_processor
 def pending_approval():
-    with Session() as db_session:
-        pending_users = db_session.query(
-            User).filter_by(has_access=False).count()
-        return dict(pending_users=pending_users)
+    # Only admins see the badge, everyone else (and anonymous pages) skip the count entirely
+    current_user = get_current_user_info()
+    pending_users = pending_users_counter.get() if current_user and current_user.is_admin else 0
+    return dict(pending_users=pending_users, current_user=current_user)
 
 
 @app.route('/get_pending_users_count')
 def get_pending_users_count():
-    with Session() as db_session:
-        pending_users = db_session.query(
-            User).filter_by(has_access=False).count()
-        return jsonify(pending_users=pending_users)
+    current_user = get_current_user_info()
+    pending_users = pending_users_counter.get() if current_user and current_user.is_admin else 0
+
+    response = jsonify(pending_users=pending_users)
+    response.headers['Cache-Control'] = f'private, max-age={PENDING_USERS_MAX_AGE}'
+    response.headers['Vary'] = 'Cookie'
+    return response
 
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
 #                                                                      Administrator Routes
 # <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
 
 
+@app.route('/admin/pool_stats')
+@require_login()
+def admin_pool_stats():
+    # Connection pool checkouts, wait times and leaks since the process started
+    return jsonify(pool_monitor.stats())
+
+
+@app.route('/admin/slow_queries', methods=['GET', 'POST'])
+@require_login()
+def admin_slow_queries():
+    if request.method == 'POST':
+        slow_query_log.clear()
+        return redirect(url_for('admin_slow_queries'))
+    return render_template('admin_slow_queries.html', user=get_current_user_info(),
+                           entries=slow_query_log.snapshot(), log=slow_query_log)
+
+
+# Prometheus scrape target, open to admins and to scrapers on the same host
+@app.route('/metrics')
+def metrics():
+    if request.remote_addr not in ('127.0.0.1', '::1') and not is_admin(session.get('user_id')):
+        abort(403)
+    stats = pool_monitor.stats()
+    extra = [
+        ('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool.', stats['checkouts']),
+        ('db_pool_checkout_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.',
+         stats['wait_seconds_total']),
+        ('db_pool_timeouts_total', 'counter', 'Checkouts that timed out waiting for a connection.',
+         stats['timeouts']),
+        ('db_pool_leaks_total', 'counter', 'Connections a request never returned.', stats['leaks']),
+        ('db_pool_checked_out', 'gauge', 'Connections currently checked out.', stats['held']),
+    ]
+    if 'pool_size' in stats:
+        extra += [('db_pool_size', 'gauge', 'Configured pool size.', stats['pool_size']),
+                  ('db_pool_overflow', 'gauge', 'Connections open beyond the pool size.', stats['overflow'])]
+    stats = dashboard_cache.stats()
+    extra += [
+        ('dashboard_cache_hits_total', 'counter', 'Dashboard lookups served from the result cache.', stats['hits']),
+        ('dashboard_cache_misses_total', 'counter', 'Dashboard lookups that ran their queries.', stats['misses']),
+        ('dashboard_cache_evictions_total', 'counter', 'Results dropped to stay within the cache size.',
+         stats['evictions']),
+        ('dashboard_cache_entries', 'gauge', 'Results currently cached.', stats['size']),
+    ]
+    return Response(request_metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+
+# Liveness and readiness of the worker process answering, for load balancers and process supervisors.
+# Ready means it has started up and can reach the database.
+@app.route('/health')
+def health():
+    status = worker_board.current() or {'pid': os.getpid(), 'ready': False}
+    return jsonify(status)
+
+
+@app.route('/health/ready')
+def health_ready():
+    status = worker_board.current()
+    ready = status is not None and status['ready']
+    if ready:
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(1))
+        except Exception as e:
+            print('Readiness check could not reach the database:', e)
+            ready = False
+    return jsonify({'pid': os.getpid(), 'ready': ready}), 200 if ready else 503
+
+
+@app.route('/admin/workers')
+@require_login()
+def admin_workers():
+    # Every worker process on this host, as each last reported itself
+    return jsonify(worker_board.workers())
+
+
 @app.route('/admin_users')
 def admin_users():
     # Check if the user is an admin
@@ -861,9 +1936,21 @@ def admin_delete_user(user_id):
             login = db_session.query(Login).filter_by(
                 user_email=user.email).first()
             if login:
+                was_pending = not user.has_access
+                search_ids = [search_id for (search_id,) in db_session.query(SavedSearch.id).filter_by(user_id=user.id)]
+                if search_ids:
+                    db_session.query(SavedSearchMatch).filter(SavedSearchMatch.search_id.in_(search_ids)).delete(
+                        synchronize_session=False)
+                    db_session.query(SavedSearch).filter(SavedSearch.id.in_(search_ids)).delete(
+                        synchronize_session=False)
                 db_session.delete(user)
                 db_session.delete(login)
                 db_session.commit()
+                user_cache.clear()
+                if search_ids:
+                    saved_searches_changed(deleted=search_ids)
+                if was_pending:
+                    pending_users_counter.adjust(-1)
         # Delete the user
 
     flash('User deleted successfully.', 'success')
@@ -889,47 +1976,10 @@ def send_email_route():
             flash("User email not found in session.", "danger")
             return jsonify({"message": "error"})
 
-        # Generate the list of property details
-        properties_list = ""
-        for property in selected_properties:
-            property_id = property.get('id', 'N/A')
-            description = property.get('description', 'N/A')
-            price = property.get('price', 'N/A')
-            beds = property.get('beds', 'N/A')
-            baths = property.get('baths', 'N/A')
-            garages = property.get('garages', 'N/A')
-            link_display = property.get('link_display', 'N/A')
-            link = property.get('link', 'N/A')
-
-            property_item = """
-            <div class="column">
-                <div class="card">
-                    <h3>{description}</h3>
-                    <p><strong>Price:</strong> {price}</p>
-                    <p><strong>Beds:</strong> {beds}</p>
-                    <p><strong>Baths:</strong> {baths}</p>
-                    <p><strong>Garages:</strong> {garages}</p>
-                    <p><strong>Link:</strong> <a href="{link}">{link_display}</a></p>
-                </div>
-            </div>
-            """.format(
-                id=property_id,
-                description=description,
-                price=price,
-                beds=beds,
-                baths=baths,
-                garages=garages,
-                link_display=link_display,
-                link=link
-            )
-            properties_list += property_item
-
-        # Load the export template and format the content
-        template_path = os.path.join(os.path.dirname(
-            __file__), 'templates', 'export_template.html')
-        with open(template_path, 'r') as template_file:
-            email_content = template_file.read().replace(
-                '{properties}', properties_list)
+        # The property cards are rendered by the loop in the export template
+        properties = [[property.get(field, 'N/A') for field in EXPORT_FIELDS]
+                      for property in selected_properties]
+        email_content = render_mail('export_template.html', properties=properties)
 
         # Send the email
         send_email(
@@ -971,6 +2021,8 @@ def admin_edit_user(user_id):
                 flash('User not found.', 'error')
                 return redirect(url_for('admin_users'))
 
+            had_access = bool(user.has_access)
+
             # Update the user's admin status
             user.name = new_name
             user.email = new_email
@@ -978,6 +2030,9 @@ def admin_edit_user(user_id):
             user.is_admin = bool(is_admin_new)
             user.has_access = bool(has_access)
             db_session.commit()
+            user_cache.clear()
+            if had_access != user.has_access:
+                pending_users_counter.adjust(1 if had_access else -1)
 
             flash('User updated successfully.', 'success')
             return redirect(url_for('admin_users'))
@@ -1014,16 +2069,7 @@ def contact():
             subject = request.form.get('subject')
             message = request.form.get('message')
 
-            email_content = f'''
-            <html>
-            <head></head>
-            <body>
-                <p><strong>Email:</strong> {email}</p>
-                <p><strong>Subject:</strong> {subject}</p>
-                <p><strong>Message:</strong> {message}</p>
-            </body>
-            </html>
-            '''
+            email_content = render_mail('mail_contact.html', email=email, subject=subject, message=message)
             # Send the email
             send_email(
                 subject="Contact Form Submission",
@@ -1062,11 +2108,11 @@ def report_issue():
         email_subject = f'Issue Report: {subject}'
 
         # Render the email template with the provided data
-        email_content = render_template('mail_report.html',
-                                        name=name,
-                                        email=email,
-                                        subject=subject,
-                                        message=message)
+        email_content = render_mail('mail_report.html',
+                                    name=name,
+                                    email=email,
+                                    subject=subject,
+                                    message=message)
 
         # Send email to admins using your send_email function
         send_email(email_subject, [admin_emails], email_content)
@@ -1117,10 +2163,10 @@ def change_password():
 def account_settings():
     user_id = session.get('user_id')
     if user_id:
-        with Session() as db_session:
-            user = db_session.query(User).get(user_id)
+        if request.method == 'POST':
+            with Session() as db_session:
+                user = db_session.query(User).get(user_id)
 
-            if request.method == 'POST':
                 new_name = request.form.get('name')
                 new_surname = request.form.get('surname')
                 new_email = request.form.get('email')
@@ -1132,11 +2178,12 @@ def account_settings():
 
                 # Commit changes
                 db_session.commit()
+                user_cache.clear()
 
                 flash('User information updated successfully.', 'success')
                 return redirect(url_for('account_settings'))
 
-            return render_template('account_settings.html', user=user)
+        return render_template('account_settings.html', user=get_current_user_info())
 
     flash('You need to be logged in to access this page.', 'error')
     return redirect(url_for('login_page'))
@@ -1215,5 +2262,153 @@ def load_html_page(page_name):
     return render_template('pages/' + page_name + '.html', user=user)
 
 
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+#                                                                       CLI Commands
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+
+@app.cli.command('rebuild-search-snapshot')
+def rebuild_search_snapshot():
+    """Build the columnar search snapshot from the properties table."""
+    get_search_engine().rebuild(db.session)
+    snapshot = get_search_engine().snapshot()
+    print(f'Search snapshot {snapshot.version} written with {snapshot.rows} properties.')
+
+
+@app.cli.command('import-properties')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, help='Rows written per COPY.')
+@click.option('--workers', default=IMPORT_WORKERS or 0, help='Processes validating rows, 0 for one per CPU.')
+def import_properties_command(path, chunk_size, workers):
+    """Bulk import properties from a CSV or XLSX file, skipping (and listing) the rows that fail."""
+    last_id = last_property_id()
+    with open(path, 'rb') as upload:
+        try:
+            report = import_properties(engine, read_rows(upload, path), chunk_size=chunk_size,
+                                       workers=workers or None)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    if report.inserted:
+        properties_changed(None)
+        # The mailed links are built against SITE_URL, there is no request to take the host from
+        with app.test_request_context(base_url=app.config['SITE_URL']):
+            notify_imported_properties(last_id)
+    for row_number, message in report.errors:
+        print(f'Row {row_number}: {message}')
+    print(f'Imported {report.inserted} of {report.rows} properties in {report.elapsed:.1f}s '
+          f'({report.rows / max(report.elapsed, 0.001):,.0f} rows/s), {len(report.errors)} rows skipped.')
+
+
+@app.cli.command('refresh-area-statistics')
+def refresh_area_statistics():
+    """Recompute the area_statistics table from the properties table, e.g. after the migration that adds it."""
+    start = time.perf_counter()
+    rows = area_statistics.refresh()
+    print(f'{rows} area statistics rows written in {time.perf_counter() - start:.1f}s.')
+
+
+@app.cli.command('mail-worker')
+@click.option('--once', is_flag=True, help='Send whatever is due and exit instead of running the worker pool.')
+def mail_worker(once):
+    """Deliver queued mail from the mail_outbox table."""
+    if once:
+        sent, failed = mail_sender.drain()
+        print(f'{sent} messages sent, {failed} failed.')
+        return
+
+    if mail_sender.workers <= 0:
+        mail_sender.workers = 1
+    mail_sender.start()
+    print(f'Delivering queued mail with {mail_sender.workers} workers, press Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mail_sender.stop()
+
+
+@app.cli.command('reload-server')
+@click.option('--timeout', default=60, show_default=True, help='Seconds to wait for the new workers.')
+def reload_server_command(timeout):
+    """Restart gunicorn on the current code without dropping connections."""
+    workers = int(os.getenv("WEB_PROCESSES", 0)) or os.cpu_count()
+    try:
+        master = reload_server(app.config['WEB_PIDFILE'], worker_board, workers, timeout=timeout)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    print(f'Reloaded, {workers} new workers of master {master} are serving.')
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Write fingerprinted, precompressed copies of the static files for long-lived browser caching."""
+    start = time.perf_counter()
+    files, compressed, removed = build_assets(app.static_folder, app.config['STATIC_BUILD_DIR'])
+    print(f"{files} static files fingerprinted into {app.config['STATIC_BUILD_DIR']} with {compressed} compressed "
+          f"copies in {time.perf_counter() - start:.1f}s, {removed} files of older builds removed.")
+
+
+@app.cli.command('create-tables')
+def create_tables():
+    """Create any missing tables from the models, for a fresh development database (production uses alembic)."""
+    Base.metadata.create_all(engine)
+    db.create_all()
+    print('Tables created.')
+
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Compile every template into the Jinja bytecode cache, e.g. once per deploy."""
+    print(f"{compile_templates()} templates compiled into {app.config['JINJA_CACHE_DIR']}.")
+
+
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+#                                                                       Startup
+# <------------------------------------------------------------------------------------------------------------------------------------------------------------------------>
+
+def compile_templates():
+    # Loading a template compiles it (or reads it back from the bytecode cache) and keeps it in memory
+    compiled = 0
+    for template_name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(template_name)
+            compiled += 1
+        except Exception as e:
+            print(f'Template {template_name} failed to compile:', e)
+    return compiled
+
+
+# Serving entry point, used by my_waitress.py (and `flask --app app:create_app run`).
+# Importing app.py only configures the application; this does the work a serving process wants
+# done before its first request: templates loaded from the bytecode cache and the mail workers started.
+def create_app():
+    preload_app()
+    worker_started()
+    return app
+
+
+# The part of create_app() that is safe before fork: gunicorn.conf.py runs it once in the master, and every
+# worker shares the loaded templates copy-on-write instead of loading its own
+def preload_app():
+    compile_templates()
+    return app
+
+
+# Runs in each serving process before it takes requests. A forked worker (master_pid given) must not use the
+# pooled connections it inherited and has none of the master's threads, so it opens its own of both.
+def worker_started(master_pid=None):
+    if master_pid is not None:
+        engine.dispose(close=False)
+    mail_sender.start()
+    worker_board.register(os.getpid(), master=master_pid, threads=app.config['WAITRESS_THREADS'])
+    try:
+        # Opens the first pooled connection now rather than in the first request
+        with engine.connect() as conn:
+            conn.execute(select(1))
+    except Exception as e:
+        print('Worker warm-up could not reach the database:', e)
+    worker_board.set_ready()
+
+
 if __name__ == '__main__':
     app.run(debug=True)
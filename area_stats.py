@@ -0,0 +1,195 @@
+# area_stats.py
+
+from datetime import datetime
+
+from sqlalchemy import Float, and_, cast, delete, event, func, insert, literal_column, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from facets import current_values, old_values
+from models import AreaStatistic, Property
+
+# A statistics row covers one (area, prop_type, prop_category) group, '' standing for a missing value
+GROUP_COLUMNS = ['area', 'prop_type', 'prop_category']
+STATISTIC_COLUMNS = GROUP_COLUMNS + ['price', 'floor_area', 'stand_area', 'bedrooms']
+# A commit touching more groups than this refreshes the whole table in one statement instead
+MAX_GROUPS = 200
+
+
+def group_of(values):
+    return tuple(values[column] or '' for column in GROUP_COLUMNS)
+
+
+def group_clause(group):
+    # The properties of one group, an equality on area so the (area, id) index can serve it
+    clauses = []
+    for column, value in zip(GROUP_COLUMNS, group):
+        attribute = getattr(Property, column)
+        clauses.append(attribute == value if value else or_(attribute.is_(None), attribute == ''))
+    return and_(*clauses)
+
+
+def percentile(values, fraction):
+    # Linear interpolation between the closest ranks of sorted values, the same as PostgreSQL's percentile_cont
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def whole(value):
+    return None if value is None else int(round(value))
+
+
+def statistics_row(group, listings, priced, p25, median, p75, floor_per_m2, stand_per_m2, bedrooms):
+    area, prop_type, prop_category = group
+    return {
+        'area': area, 'prop_type': prop_type, 'prop_category': prop_category,
+        'listings': listings, 'priced': priced,
+        'price_p25': whole(p25), 'price_median': whole(median), 'price_p75': whole(p75),
+        'floor_price_per_m2': whole(floor_per_m2), 'stand_price_per_m2': whole(stand_per_m2),
+        'bedrooms_median': None if bedrooms is None else round(float(bedrooms), 1),
+    }
+
+
+def summarize(rows):
+    """Statistics rows from (area, prop_type, prop_category, price, floor_area, stand_area, bedrooms) rows.
+
+    Properties without a price (or priced at 0) are counted as listings but left out of every percentile.
+    """
+    samples = {}
+    for area, prop_type, prop_category, price, floor_area, stand_area, bedrooms in rows:
+        group = samples.setdefault((area or '', prop_type or '', prop_category or ''), [0, [], [], [], []])
+        group[0] += 1
+        if price:
+            group[1].append(price)
+            if floor_area:
+                group[2].append(price / floor_area)
+            if stand_area:
+                group[3].append(price / stand_area)
+        if bedrooms is not None:
+            group[4].append(bedrooms)
+
+    result = []
+    for group, (listings, prices, floor, stand, bedrooms) in samples.items():
+        for values in (prices, floor, stand, bedrooms):
+            values.sort()
+        result.append(statistics_row(group, listings, len(prices), percentile(prices, 0.25), percentile(prices, 0.5),
+                                     percentile(prices, 0.75), percentile(floor, 0.5), percentile(stand, 0.5),
+                                     percentile(bedrooms, 0.5)))
+    return result
+
+
+def aggregate_statement(groups):
+    # PostgreSQL computes the percentiles itself, one pass over the rows of the groups
+    # A literal '' rather than a bound parameter, GROUP BY has to repeat the select expressions exactly
+    keys = [func.coalesce(getattr(Property, column), literal_column("''")) for column in GROUP_COLUMNS]
+    price = func.nullif(Property.price, 0)
+    statement = select(
+        *keys, func.count(), func.count(price),
+        func.percentile_cont(0.25).within_group(price),
+        func.percentile_cont(0.5).within_group(price),
+        func.percentile_cont(0.75).within_group(price),
+        func.percentile_cont(0.5).within_group(cast(price, Float) / func.nullif(Property.floor_area, 0)),
+        func.percentile_cont(0.5).within_group(cast(price, Float) / func.nullif(Property.stand_area, 0)),
+        func.percentile_cont(0.5).within_group(Property.bedrooms),
+    ).group_by(*keys)
+    if groups is not None:
+        statement = statement.where(or_(*[group_clause(group) for group in groups]))
+    return statement
+
+
+class AreaStatistics:
+    """Count, price quartiles and median price per m² of every area, property type and category.
+
+    The results live in the area_statistics table, so pages read one small row instead of scanning
+    properties. track() follows ORM writes: a committed session recomputes just the groups its inserted,
+    updated or deleted properties were in before and after the change. Writes the ORM does not see
+    (COPY imports, bulk statements) call refresh() without groups to recompute everything.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def refresh(self, groups=None):
+        """Recompute the given (area, prop_type, prop_category) groups, or every group. Returns the rows written."""
+        if groups is not None:
+            groups = sorted(set(groups))
+            if not groups:
+                return 0
+            if len(groups) > MAX_GROUPS:
+                groups = None
+        for attempt in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    rows = self._compute(conn, groups)
+                    self._write(conn, groups, rows)
+                return len(rows)
+            except IntegrityError:
+                # Another process wrote the same group in between, its rows are deleted on the second pass
+                if attempt:
+                    raise
+
+    def _compute(self, conn, groups):
+        if conn.dialect.name == 'postgresql':
+            return [statistics_row(tuple(row[:3]), *row[3:]) for row in conn.execute(aggregate_statement(groups))]
+        statement = select(*[getattr(Property, column) for column in STATISTIC_COLUMNS])
+        if groups is not None:
+            statement = statement.where(or_(*[group_clause(group) for group in groups]))
+        return summarize(conn.execute(statement))
+
+    def _write(self, conn, groups, rows):
+        table = AreaStatistic.__table__
+        if groups is None:
+            conn.execute(delete(table))
+        else:
+            conn.execute(delete(table).where(
+                tuple_(*[table.c[column] for column in GROUP_COLUMNS]).in_(groups)))
+        if rows:
+            now = datetime.utcnow()
+            conn.execute(insert(table), [dict(row, updated_at=now) for row in rows])
+
+    def track(self, session_class=Session):
+        event.listen(session_class, 'before_flush', self._before_flush)
+        event.listen(session_class, 'after_commit', self._after_commit)
+        event.listen(session_class, 'after_rollback', self._after_rollback)
+
+    def _before_flush(self, session, flush_context, instances):
+        groups = session.info.setdefault('area_stat_groups', set())
+        for instance in session.new:
+            if isinstance(instance, Property):
+                groups.add(group_of(current_values(instance, GROUP_COLUMNS)))
+        for instance in session.deleted:
+            if isinstance(instance, Property):
+                old = old_values(instance, GROUP_COLUMNS)
+                if old is None:
+                    session.info['area_stat_stale'] = True
+                else:
+                    groups.add(group_of(old))
+        for instance in session.dirty:
+            if isinstance(instance, Property) and session.is_modified(instance):
+                old = old_values(instance, STATISTIC_COLUMNS)
+                if old is None:
+                    session.info['area_stat_stale'] = True
+                    continue
+                new = current_values(instance, STATISTIC_COLUMNS)
+                # Edits to the address, agent or notes leave the statistics as they are
+                if old != new:
+                    groups.add(group_of(old))
+                    groups.add(group_of(new))
+
+    def _after_commit(self, session):
+        groups = session.info.pop('area_stat_groups', None)
+        stale = session.info.pop('area_stat_stale', False)
+        if not groups and not stale:
+            return
+        try:
+            self.refresh(None if stale else groups)
+        except Exception as e:
+            print('Area statistics refresh failed:', e)
+
+    def _after_rollback(self, session):
+        session.info.pop('area_stat_groups', None)
+        session.info.pop('area_stat_stale', None)
@@ -0,0 +1,217 @@
+"""Latency and queries per request of the main endpoints on synthetic data, saved as JSON to diff runs.
+
+Loads benchmarks/synthetic_data.py listings and users at the chosen scale into a scratch database, logs in
+through the Flask test client and replays each scenario, recording p50/p95/p99 latency and how many SQL
+statements a request ran. On PostgreSQL the data goes into a scratch schema that is dropped afterwards,
+without DATABASE_URL a temporary SQLite file is used. The dashboard result cache is off unless
+--with-cache is given, so every request reaches the database.
+
+Results are written to benchmarks/results/<time>-<commit>.json, --compare prints the change against an
+earlier run:
+    DATABASE_URL=postgresql://... python benchmarks/endpoints.py --scale 100k
+    python benchmarks/endpoints.py --scale 10k --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import PASSWORD, SCALES, create_schema, generate  # noqa: E402
+
+load_dotenv(os.path.join(ROOT, '.env'))
+
+SCHEMA = 'bench_endpoints'
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+# The dashboard form always sends these, a request without them only matches listings with no type
+ANY = {'prop_type_filter': 'Any', 'prop_category_filter': 'Any'}
+ANY_ARGS = 'prop_type_filter=Any&prop_category_filter=Any'
+
+
+def scenarios(property_count, rng):
+    # (name, method, path, form data, signed in), the view_property ids are drawn per request
+    last_page = max(property_count // 20, 1)
+    return [
+        ('dashboard', 'GET', lambda: f'/dashboard?{ANY_ARGS}', None, True),
+        ('dashboard_area_filter', 'POST', lambda: '/dashboard', dict(ANY, area_filter='Baillie Park'), True),
+        ('dashboard_price_beds_filter', 'POST', lambda: '/dashboard',
+         dict(ANY, min_price_filter='1000000', max_price_filter='3000000', bedroom_filter='3'), True),
+        ('dashboard_sort_price', 'GET', lambda: f'/dashboard?{ANY_ARGS}&sort=price&order=desc', None, True),
+        ('dashboard_deep_page', 'GET', lambda: f'/dashboard?{ANY_ARGS}&page={max(last_page // 2, 1)}',
+         None, True),
+        ('dashboard_cursor', 'GET', lambda: f'/dashboard?{ANY_ARGS}&pagination=cursor&sort=price', None, True),
+        ('view_property', 'GET', lambda: f'/view_property/{rng.randint(1, property_count)}', None, True),
+        ('login', 'POST', lambda: '/login', {'username': 'user0@example.com', 'password': PASSWORD}, False),
+        ('export_csv', 'GET', lambda: f'/dashboard/export?{ANY_ARGS}&format=csv&area_filter=Tuscany+Ridge',
+         None, True),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_scenario(client, statements, method, path, data, requests, warmup):
+    timings, counts = [], []
+    for number in range(warmup + requests):
+        before = statements[0]
+        start = time.perf_counter()
+        # Whatever the app prints is not part of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.open(path(), method=method, data=data)
+            response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path()} returned {response.status_code}')
+        if number >= warmup:
+            timings.append(elapsed * 1000)
+            counts.append(statements[0] - before)
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries_per_request': round(sum(counts) / len(counts), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = json.load(f)
+    print(f"\nChange against {previous['meta']['commit']} ({os.path.basename(path)}):")
+    print(f"{'scenario':<30}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>10}")
+    for name, current in results['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if before is None:
+            print(f'{name:<30}{"new":>10}')
+            continue
+        row = ''.join(f"{(current[key] - before[key]) / before[key] * 100 if before[key] else 0:>+9.1f}%"
+                      for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{name:<30}{row}{current['queries_per_request'] - before['queries_per_request']:>+10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--with-cache', action='store_true', help='Leave the dashboard result cache on.')
+    parser.add_argument('--output', help='Result file, defaults to benchmarks/results/<time>-<commit>.json.')
+    parser.add_argument('--compare', help='Earlier result file to compare against.')
+    args = parser.parse_args()
+
+    # app.py reads its configuration at import, so the scratch database is set up before importing it
+    database_url = os.getenv("DATABASE_URL")
+    scratch = tempfile.mkdtemp()
+    admin_engine = None
+    if database_url and database_url.startswith('postgresql'):
+        admin_engine = create_engine(database_url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        separator = '&' if '?' in database_url else '?'
+        os.environ['DATABASE_URL'] = f'{database_url}{separator}options=-csearch_path%3D{SCHEMA}'
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ['JINJA_CACHE_DIR'] = os.path.join(scratch, 'jinja_cache')
+    os.environ['MAIL_WORKERS'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'endpoint-benchmark')
+    if not args.with_cache:
+        os.environ['DASHBOARD_CACHE_SIZE'] = '0'
+
+    import app as app_module
+
+    engine = app_module.engine
+    try:
+        create_schema(engine)
+        print(f'Generating {args.scale} synthetic properties ({engine.dialect.name})...')
+        start = time.perf_counter()
+        properties, users = generate(engine, SCALES[args.scale], seed=args.seed)
+        if engine.dialect.name == 'postgresql':
+            with engine.begin() as conn:
+                conn.execute(text('ANALYZE'))
+        print(f'{properties} properties and {users} users in {time.perf_counter() - start:.1f}s\n')
+
+        statements = [0]
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements[0] += 1
+
+        event.listen(engine, 'before_cursor_execute', count_statement)
+
+        app = app_module.create_app()
+        client = app.test_client()
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.post('/login', data={'username': 'user0@example.com', 'password': PASSWORD})
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'scale': args.scale,
+                'properties': properties,
+                'users': users,
+                'dialect': engine.dialect.name,
+                'dashboard_cache': args.with_cache,
+                'requests': args.requests,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'scenarios': {},
+        }
+        print(f"{'scenario':<30}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        # Signing in is measured without a session cookie, a signed in client is redirected before the check
+        anonymous = app.test_client(use_cookies=False)
+        for name, method, path, data, signed_in in scenarios(properties, random.Random(args.seed)):
+            result = run_scenario(client if signed_in else anonymous, statements, method, path, data,
+                                  args.requests, args.warmup)
+            results['scenarios'][name] = result
+            print(f"{name:<30}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                  f"{result['queries_per_request']:>10.2f}")
+    finally:
+        engine.dispose()
+        if admin_engine is not None:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {SCHEMA} CASCADE'))
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nSaved {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
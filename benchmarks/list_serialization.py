@@ -0,0 +1,108 @@
+"""Throughput of the dashboard list: ORM objects with Property.serialize() against projected plain rows.
+
+Both paths run the same filtered page query in the default id order and build the JSON the dashboard returns, for page
+sizes from the default 20 up to DASHBOARD_MAX_PER_PAGE. The ORM path loads full Property instances
+(every column, identity map, attribute instrumentation) and serializes them one by one, the lean path
+selects LIST_SELECT and turns the whole page into dicts in one pass. On PostgreSQL the rows go into a
+scratch schema that is dropped afterwards, without DATABASE_URL a temporary SQLite file is used.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/list_serialization.py [--scale 100k] [--seconds 2]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import SCALES, create_schema, generate  # noqa: E402
+
+load_dotenv(os.path.join(ROOT, '.env'))
+
+SCHEMA = 'bench_list'
+PAGE_SIZES = [20, 100, 500]
+
+
+def rate(function, seconds):
+    # Pages per second, after one untimed call
+    function()
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        function()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time spent on each measurement.')
+    args = parser.parse_args()
+
+    # app.py reads its configuration at import, so the scratch database is set up before importing it
+    database_url = os.getenv("DATABASE_URL")
+    scratch = tempfile.mkdtemp()
+    admin_engine = None
+    if database_url and database_url.startswith('postgresql'):
+        admin_engine = create_engine(database_url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        separator = '&' if '?' in database_url else '?'
+        os.environ['DATABASE_URL'] = f'{database_url}{separator}options=-csearch_path%3D{SCHEMA}'
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ['JINJA_CACHE_DIR'] = os.path.join(scratch, 'jinja_cache')
+    os.environ['MAIL_WORKERS'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'list-benchmark')
+
+    import app as app_module
+    from models import Property
+
+    engine = app_module.engine
+    try:
+        create_schema(engine)
+        print(f'Generating {args.scale} synthetic properties ({engine.dialect.name})...')
+        generate(engine, SCALES[args.scale])
+        filters = app_module.build_filters_from_form({'prop_type_filter': 'Residential', 'prop_category_filter': 'Any'})
+        ordering = app_module.property_ordering('id')
+
+        sizes = PAGE_SIZES + [app_module.app.config['DASHBOARD_MAX_PER_PAGE']]
+        print(f"\n{'rows/page':>10}{'ORM pages/s':>14}{'lean pages/s':>14}{'speedup':>10}"
+              f"{'ORM rows/s':>14}{'lean rows/s':>14}")
+        with app_module.app.test_request_context():
+            def orm_page(size):
+                query = app_module.apply_filters(Property.query, filters).order_by(*ordering)
+                properties = query.limit(size).all()
+                app_module.jsonify({'properties': [property.serialize() for property in properties]})
+                app_module.db.session.remove()
+
+            def lean_page(size):
+                query = app_module.apply_filters(Property.query.with_entities(*app_module.LIST_SELECT), filters)
+                rows = query.order_by(*ordering).limit(size).all()
+                app_module.jsonify({'properties': app_module.serialize_rows(rows)})
+                app_module.db.session.remove()
+
+            for size in sorted(set(sizes)):
+                orm = rate(lambda: orm_page(size), args.seconds)
+                lean = rate(lambda: lean_page(size), args.seconds)
+                print(f'{size:>10}{orm:>14.1f}{lean:>14.1f}{lean / orm:>9.2f}x{orm * size:>14,.0f}{lean * size:>14,.0f}')
+    finally:
+        engine.dispose()
+        if admin_engine is not None:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {SCHEMA} CASCADE'))
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Per-message render cost of the property export email, before and after moving it onto Jinja.
+
+"before" repeats what send_email_route() used to do for every export: read export_template.html from
+disk, build the property cards with str.format in a Python loop, splice them in and run the result through
+string.Template.substitute() in send_email(). "after" renders the cached, precompiled Jinja template with
+the card loop inside it, the way render_mail() in app.py does. "after, unescaped" is the same template with
+autoescaping off, to show how much of the cost is the HTML escaping of the property fields, which the
+old str.format path never did.
+
+Usage:
+    python benchmarks/mail_render.py [--properties 200] [--repeat 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from string import Template
+
+from flask import Flask
+from jinja2 import Environment, FileSystemLoader
+
+# Same as EXPORT_FIELDS in app.py
+EXPORT_FIELDS = ['description', 'price', 'beds', 'baths', 'garages', 'link_display', 'link']
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+PROPERTY_ITEM = """
+            <div class="column">
+                <div class="card">
+                    <h3>{description}</h3>
+                    <p><strong>Price:</strong> {price}</p>
+                    <p><strong>Beds:</strong> {beds}</p>
+                    <p><strong>Baths:</strong> {baths}</p>
+                    <p><strong>Garages:</strong> {garages}</p>
+                    <p><strong>Link:</strong> <a href="{link}">{link_display}</a></p>
+                </div>
+            </div>
+            """
+
+
+def synthetic_properties(count):
+    rng = random.Random(7)
+    return [{
+        'id': number,
+        'description': f'{rng.randint(1, 200)} Street {rng.randint(1, 20000)}, Area {rng.randint(1, 21)}',
+        'price': f'R {rng.randint(300000, 5000000):,.2f}',
+        'beds': rng.randint(1, 5),
+        'baths': rng.choice([1, 1.5, 2, 2.5, 3]),
+        'garages': rng.randint(0, 3),
+        'link_display': f'Listing {number}',
+        'link': f'https://example.com/listing/{number}',
+    } for number in range(count)]
+
+
+def render_before(properties):
+    properties_list = ""
+    for property in properties:
+        properties_list += PROPERTY_ITEM.format(
+            description=property.get('description', 'N/A'),
+            price=property.get('price', 'N/A'),
+            beds=property.get('beds', 'N/A'),
+            baths=property.get('baths', 'N/A'),
+            garages=property.get('garages', 'N/A'),
+            link_display=property.get('link_display', 'N/A'),
+            link=property.get('link', 'N/A'),
+        )
+    with open(os.path.join(TEMPLATES, 'export_template_before.html'), 'r') as template_file:
+        email_content = template_file.read().replace('{properties}', properties_list)
+    return Template(email_content).substitute()
+
+
+def time_render(render, properties, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(properties)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), sorted(timings)[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    # Same Jinja environment settings as the app (autoescape for .html, compiled template cache)
+    app = Flask(__name__, template_folder=TEMPLATES)
+    template = app.jinja_env.get_template('export_template.html')
+    unescaped = Environment(loader=FileSystemLoader(TEMPLATES), autoescape=False).get_template('export_template.html')
+
+    # The old export template only differed in the {properties} placeholder where the loop now is
+    source = open(os.path.join(TEMPLATES, 'export_template.html')).read()
+    loop_start = source.index('{% for ')
+    loop_end = source.index('{% endfor %}') + len('{% endfor %}')
+    before_path = os.path.join(TEMPLATES, 'export_template_before.html')
+    with open(before_path, 'w') as before_file:
+        before_file.write(source[:loop_start] + '{properties}' + source[loop_end:])
+
+    properties = synthetic_properties(args.properties)
+    try:
+        before = time_render(render_before, properties, args.repeat)
+        after = time_render(lambda items: template.render(properties=[
+            [item.get(field, 'N/A') for field in EXPORT_FIELDS] for item in items]), properties, args.repeat)
+        after_unescaped = time_render(lambda items: unescaped.render(properties=[
+            [item.get(field, 'N/A') for field in EXPORT_FIELDS] for item in items]), properties, args.repeat)
+    finally:
+        os.remove(before_path)
+
+    print(f'Export email with {args.properties} properties, {args.repeat} renders each')
+    print(f"{'':<20}{'median (ms)':>14}{'p95 (ms)':>12}{'vs before':>12}")
+    for name, (median, p95) in [('before', before), ('after', after), ('after, unescaped', after_unescaped)]:
+        print(f"{name:<20}{median:>14.3f}{p95:>12.3f}{median / before[0]:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
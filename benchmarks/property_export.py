@@ -0,0 +1,107 @@
+"""Memory and throughput of the streaming CSV/XLSX export for small and large results.
+
+Fills a scratch properties table with synthetic rows, then consumes property_export.stream_csv() and
+stream_xlsx() for result sizes from 50 rows up to the full table, recording the peak Python heap
+(tracemalloc) and rows per second. A flat peak across sizes is what the server-side cursor buys.
+On PostgreSQL the rows go into a scratch schema that is dropped afterwards, without DATABASE_URL a
+temporary SQLite file is used.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/property_export.py [--rows 500000] [--xlsx-rows 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Property  # noqa: E402
+from property_export import stream_csv, stream_xlsx  # noqa: E402
+
+load_dotenv()
+
+SCHEMA = 'bench_export'
+AREAS = ['Baillie Park', 'Bult', 'Central', 'Dassierand', 'Miederpark', 'Oewersig', 'Tuscany Ridge']
+
+
+def populate(engine, rows):
+    rng = random.Random(5)
+    table = Property.__table__
+    with engine.begin() as conn:
+        for start in range(0, rows, 10000):
+            conn.execute(table.insert(), [{
+                'street_name': f'Street {rng.randint(1, 20000)}',
+                'street_number': str(rng.randint(1, 300)),
+                'area': rng.choice(AREAS),
+                'price': rng.randint(300, 5000) * 1000,
+                'bedrooms': rng.randint(1, 5),
+                'bathrooms': rng.choice([1, 1.5, 2, 2.5]),
+                'swimming_pool': rng.random() < 0.3,
+                'agent': f'Agent {rng.randint(1, 60)}',
+                'prop_type': 'Residential',
+                'floor_area': rng.randint(40, 600),
+                'stand_area': rng.randint(100, 3000),
+            } for _ in range(start, min(start + 10000, rows))])
+
+
+def measure(stream, engine, limit):
+    # Timed without tracemalloc (it slows every allocation down), then run again to record the peak heap
+    statement = select(*Property.__table__.columns).order_by(Property.id).limit(limit)
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in stream(engine, statement))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in stream(engine, statement):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--xlsx-rows', type=int, default=50000, help='Largest result exported as XLSX.')
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    scratch = tempfile.mkdtemp()
+    if database_url and database_url.startswith('postgresql'):
+        admin_engine = create_engine(database_url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        engine = create_engine(database_url, connect_args={'options': f'-csearch_path={SCHEMA}'})
+    else:
+        admin_engine = None
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    Property.__table__.create(engine)
+
+    try:
+        print(f'Populating {args.rows} synthetic properties ({engine.dialect.name})...')
+        populate(engine, args.rows)
+
+        print(f"\n{'format':<8}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'peak heap (MB)':>17}{'output (MB)':>14}")
+        sizes = sorted({50, 5000, 50000, args.rows})
+        for name, stream, largest in [('csv', stream_csv, args.rows), ('xlsx', stream_xlsx, args.xlsx_rows)]:
+            for limit in [size for size in sizes if size <= largest] or [largest]:
+                elapsed, peak, size = measure(stream, engine, limit)
+                print(f'{name:<8}{limit:>10}{elapsed:>10.2f}{limit / elapsed:>12,.0f}'
+                      f'{peak / 1e6:>17.2f}{size / 1e6:>14.2f}')
+    finally:
+        engine.dispose()
+        if admin_engine is not None:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {SCHEMA} CASCADE'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Throughput of the bulk property import (validation in worker processes, COPY in chunks).
+
+Writes a synthetic CSV (about 1% of the rows deliberately invalid) and imports it with
+property_import.import_properties(). On PostgreSQL the rows go into a scratch schema that is dropped
+afterwards, without DATABASE_URL a temporary SQLite file is used (INSERT instead of COPY).
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/property_import.py [--rows 100000] [--workers 4]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Property  # noqa: E402
+from property_import import IMPORT_COLUMNS, import_properties, read_rows  # noqa: E402
+
+load_dotenv()
+
+SCHEMA = 'bench_import'
+AREAS = ['Baillie Park', 'Bult', 'Central', 'Dassierand', 'Grimbeek Park', 'Miederpark', 'Oewersig',
+         'Promosa', 'Tuscany Ridge', 'Van der Hoff Park', 'Wilgeboom']
+
+
+def write_csv(path, rows):
+    rng = random.Random(11)
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow([column.replace('_', ' ').title() for column in IMPORT_COLUMNS])
+        for number in range(rows):
+            row = {
+                'street_name': f'Street {rng.randint(1, 20000)}',
+                'street_number': str(rng.randint(1, 300)),
+                'complex_name': rng.choice(['', f'Complex {rng.randint(1, 2000)}']),
+                'area': rng.choice(AREAS),
+                'price': f'{rng.randint(300, 5000) * 1000:,}',
+                'bedrooms': rng.choice(['', '1', '2', '3', '4', '5']),
+                'bathrooms': rng.choice(['1', '1.5', '2', '2.5', '3']),
+                'garages': rng.choice(['', '0', '1', '2']),
+                'swimming_pool': rng.choice(['yes', 'no', '']),
+                'study': rng.choice(['x', '']),
+                'agent': f'Agent {rng.randint(1, 60)}',
+                'prop_type': rng.choice(['Residential', 'Commercial']),
+                'prop_category': rng.choice(['Full Title', 'Apartment', 'Townhouse']),
+                'floor_area': str(rng.randint(40, 600)),
+                'stand_area': str(rng.randint(100, 3000)),
+            }
+            if rng.random() < 0.01:
+                row[rng.choice(['bedrooms', 'price', 'bathrooms'])] = 'n/a'
+            writer.writerow([row.get(column, '') for column in IMPORT_COLUMNS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=0, help='0 for one per CPU')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    csv_path = os.path.join(scratch, 'properties.csv')
+    write_csv(csv_path, args.rows)
+    print(f'Wrote {args.rows} synthetic rows ({os.path.getsize(csv_path) / 1e6:.1f} MB)')
+
+    database_url = os.getenv("DATABASE_URL")
+    if database_url and database_url.startswith('postgresql'):
+        admin_engine = create_engine(database_url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        engine = create_engine(database_url, connect_args={'options': f'-csearch_path={SCHEMA}'})
+    else:
+        admin_engine = None
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    Property.__table__.create(engine)
+
+    try:
+        with open(csv_path, 'rb') as upload:
+            report = import_properties(engine, read_rows(upload, csv_path), chunk_size=args.chunk_size,
+                                       workers=args.workers or None)
+        with engine.connect() as conn:
+            stored = conn.execute(text('SELECT count(*) FROM properties')).scalar()
+    finally:
+        engine.dispose()
+        if admin_engine is not None:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {SCHEMA} CASCADE'))
+
+    print(f'{engine.dialect.name}: imported {report.inserted} of {report.rows} rows '
+          f'({len(report.errors)} rejected, {stored} in the table) in {report.elapsed:.2f}s, '
+          f'{report.rows / report.elapsed:,.0f} rows/s')
+    print('First rejected rows:', report.errors[:3])
+
+
+if __name__ == '__main__':
+    main()
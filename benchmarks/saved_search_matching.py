@@ -0,0 +1,102 @@
+"""Matching new properties against saved searches: the inverted SearchIndex against checking every saved search.
+
+Saved searches are drawn the way users fill in the dashboard form (one or two areas, a price range, a
+bedroom bucket, the odd flag, type and category), properties come from synthetic_data. For each number of
+saved searches the index is built, then both paths match the same properties and must agree exactly;
+the table shows properties matched per second, the candidates the index checked per property and the
+matches found. Runs in memory, no database needed.
+
+Usage:
+    python benchmarks/saved_search_matching.py [--searches 1000,10000,50000] [--properties 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import AREAS, IMPORT_COLUMNS, PROP_CATEGORIES, PROP_TYPES, property_rows  # noqa: E402
+from saved_searches import SearchIndex, compile_filters  # noqa: E402
+
+
+def random_filters(rng):
+    # A filter set as build_filters_from_form() returns it
+    filters = {name: None for name in [
+        'area_filter', 'min_price_filter', 'max_price_filter', 'street_name_filter', 'complex_name_filter',
+        'number_filter', 'bedroom_filter', 'bathroom_filter', 'garages_filter', 'swimming_pool_filter',
+        'garden_flat_filter', 'study_filter', 'ground_floor_filter', 'pet_friendly_filter', 'carports_filter',
+        'agent_filter', 'floor_area_filter', 'floor_area_select', 'stand_area_filter', 'stand_area_select']}
+    if rng.random() < 0.7:
+        filters['area_filter'] = ','.join(rng.sample([area for area, _ in AREAS], rng.choice([1, 1, 2, 3])))
+    if rng.random() < 0.6:
+        low = rng.choice([500000, 800000, 1000000, 1500000, 2000000])
+        filters['min_price_filter'] = str(low)
+        if rng.random() < 0.8:
+            filters['max_price_filter'] = str(low + rng.choice([500000, 1000000, 2000000]))
+    if rng.random() < 0.5:
+        filters['bedroom_filter'] = rng.choice(['1', '2', '3', '2+', '3+', '4+'])
+    if rng.random() < 0.2:
+        filters['bathroom_filter'] = rng.choice(['2', '2+'])
+    for flag, share in [('swimming_pool_filter', 0.15), ('garden_flat_filter', 0.05), ('study_filter', 0.1),
+                        ('pet_friendly_filter', 0.1)]:
+        if rng.random() < share:
+            filters[flag] = 'on'
+    filters['prop_type_filter'] = rng.choice(['Any', 'Residential', 'Residential', [name for name, _ in PROP_TYPES][1]])
+    filters['prop_category_filter'] = rng.choice(['Any', 'Any'] + [name for name, _ in PROP_CATEGORIES][:3])
+    return filters
+
+
+def property_dicts(count):
+    rows = []
+    for row_number, values in property_rows(count, seed=7):
+        row = dict(zip(IMPORT_COLUMNS, values))
+        row['id'] = row_number
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--searches', default='1000,10000,50000', help='Comma separated saved search counts.')
+    parser.add_argument('--properties', type=int, default=2000, help='Properties matched per measurement.')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    properties = property_dicts(args.properties)
+    print(f"{'searches':>10}{'build s':>10}{'index props/s':>15}{'scan props/s':>14}{'speedup':>10}"
+          f"{'candidates':>12}{'matches':>10}")
+    for count in [int(value) for value in args.searches.split(',')]:
+        searches = [random_filters(rng) for _ in range(count)]
+
+        start = time.perf_counter()
+        index = SearchIndex()
+        for search_id, filters in enumerate(searches):
+            index.add(search_id, filters)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [sorted(index.match(row)) for row in properties]
+        index_rate = len(properties) / (time.perf_counter() - start)
+
+        # Checking every saved search is slow at the larger counts, time it on a sample of the properties
+        compiled = [compile_filters(filters) for filters in searches]
+        sample = properties[:max(len(properties) * 1000 // count, 20)]
+        start = time.perf_counter()
+        scanned = [[search_id for search_id, checks in enumerate(compiled) if all(check(row) for check in checks)]
+                   for row in sample]
+        scan_rate = len(sample) / (time.perf_counter() - start)
+        if scanned != indexed[:len(sample)]:
+            sys.exit(f'The index and the full scan disagree with {count} saved searches.')
+
+        candidates = sum(len(index.candidates(row)) for row in properties) / len(properties)
+        matches = sum(len(found) for found in indexed) / len(properties)
+        print(f'{count:>10}{build:>10.2f}{index_rate:>15,.0f}{scan_rate:>14,.0f}{index_rate / scan_rate:>9.1f}x'
+              f'{candidates:>12.0f}{matches:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Throughput of the gunicorn server (gunicorn.conf.py) with 1, 2, 4... worker processes under the same load.
+
+Loads benchmarks/synthetic_data.py listings into a scratch database (a schema on PostgreSQL with DATABASE_URL,
+a temporary SQLite file otherwise), then for each worker count starts gunicorn on a free local port, waits
+until every worker reports ready and drives it with concurrent keep-alive clients for a fixed time. The
+clients sign in and cycle through the dashboard, a filtered search and property pages with the result cache
+off, so each request renders and queries. The table shows requests per second, latency percentiles and the
+speedup over the first worker count. The clients run on the same machine: throughput stops scaling once the
+workers and the clients together use every CPU (the table prints how many there are).
+
+Usage:
+    python benchmarks/server_scaling.py [--workers 1,2,4] [--threads 4] [--clients 16] [--seconds 10]
+    DATABASE_URL=postgresql://... python benchmarks/server_scaling.py --scale 100k
+"""
+import argparse
+import http.client
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import PASSWORD, SCALES, create_schema, generate  # noqa: E402
+from web_workers import WorkerBoard  # noqa: E402
+
+SCHEMA = 'bench_server'
+ANY = {'prop_type_filter': 'Any', 'prop_category_filter': 'Any'}
+
+
+def requests_for(property_count):
+    # (method, path, form body), cycled through by every client
+    return [
+        ('GET', '/dashboard?' + urlencode(ANY), None),
+        ('POST', '/dashboard', urlencode(dict(ANY, min_price_filter='1000000', max_price_filter='3000000'))),
+        ('GET', '/dashboard?' + urlencode(dict(ANY, sort='price', order='desc', page=3)), None),
+    ] + [('GET', f'/view_property/{property_id}', None)
+         for property_id in range(1, property_count + 1, max(property_count // 20, 1))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def sign_in(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('POST', '/login', urlencode({'username': 'user0@example.com', 'password': PASSWORD}),
+                 {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if response.status != 302 or not cookie:
+        sys.exit(f'Signing in failed with {response.status}')
+    return cookie.split(';', 1)[0]
+
+
+def client(port, cookie, requests, offset, deadline, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Cookie': cookie}
+    form_headers = dict(headers, **{'Content-Type': 'application/x-www-form-urlencoded'})
+    number = offset
+    while time.perf_counter() < deadline:
+        method, path, body = requests[number % len(requests)]
+        number += 1
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body, form_headers if body else headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                raise RuntimeError(f'{method} {path} returned {response.status}')
+        except (OSError, http.client.HTTPException, RuntimeError):
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def measure(env, workers, args, requests):
+    port = free_port()
+    board_dir = tempfile.mkdtemp()
+    server_env = dict(env, WEB_PROCESSES=str(workers), WAITRESS_THREADS=str(args.threads),
+                      WEB_BIND=f'127.0.0.1:{port}', WORKER_STATUS_DIR=board_dir,
+                      WEB_PIDFILE=os.path.join(board_dir, 'gunicorn.pid'), WEB_MAX_REQUESTS='0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'], cwd=ROOT,
+                              env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        board = WorkerBoard(board_dir)
+        deadline = time.monotonic() + 60
+        while sum(status['ready'] for status in board.workers(master=server.pid)) < workers:
+            if server.poll() is not None or time.monotonic() > deadline:
+                sys.exit(f'gunicorn with {workers} workers did not start')
+            time.sleep(0.2)
+
+        cookie = sign_in(port)
+        latencies, errors = [], []
+        # A short warm-up so every worker has its connections open and its pages rendered once
+        for phase, seconds in (('warmup', 2), ('measure', args.seconds)):
+            latencies.clear()
+            errors.clear()
+            start = time.perf_counter()
+            threads = [threading.Thread(target=client, args=(port, cookie, requests, number * 7, start + seconds,
+                                                             latencies, errors))
+                       for number in range(args.clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        return {'rate': len(latencies) / elapsed, 'p50': percentile(latencies, 0.5) * 1000,
+                'p95': percentile(latencies, 0.95) * 1000, 'errors': len(errors)}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+        shutil.rmtree(board_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--workers', default='1,2,4', help='Comma separated worker process counts.')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker process.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients.')
+    parser.add_argument('--seconds', type=float, default=10, help='Measured seconds per worker count.')
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    scratch = tempfile.mkdtemp()
+    admin_engine = None
+    if database_url and database_url.startswith('postgresql'):
+        admin_engine = create_engine(database_url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        separator = '&' if '?' in database_url else '?'
+        database_url = f'{database_url}{separator}options=-csearch_path%3D{SCHEMA}'
+    else:
+        database_url = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, JINJA_CACHE_DIR=os.path.join(scratch, 'jinja_cache'),
+               MAIL_WORKERS='0', DASHBOARD_CACHE_SIZE='0', SECRET_KEY=os.getenv('SECRET_KEY', 'server-benchmark'))
+
+    try:
+        engine = create_engine(database_url)
+        create_schema(engine)
+        print(f'Generating {args.scale} synthetic properties ({engine.dialect.name})...')
+        properties, _ = generate(engine, SCALES[args.scale])
+        if engine.dialect.name == 'postgresql':
+            with engine.begin() as conn:
+                conn.execute(text('ANALYZE'))
+        engine.dispose()
+        requests = requests_for(properties)
+
+        print(f'{os.cpu_count()} CPUs, {args.threads} threads per worker, {args.clients} clients\n')
+        print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}{'errors':>8}")
+        baseline = None
+        for workers in [int(value) for value in args.workers.split(',')]:
+            result = measure(env, workers, args, requests)
+            baseline = baseline or result['rate']
+            print(f"{workers:>8}{result['rate']:>10.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                  f"{result['rate'] / baseline:>9.2f}x{result['errors']:>8}")
+    finally:
+        if admin_engine is not None:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+            admin_engine.dispose()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Worker startup time: from `import app` to the first served request.
+
+Each run starts a fresh interpreter that imports app.py, calls create_app() and serves GET /login through
+the test client, timing each step. Runs are made with an empty Jinja bytecode cache (a first deploy) and
+with a warm one (every later worker boot). The script fails if importing app.py touched the database,
+which is how a regression of the lazy startup shows up.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+checkouts_after_import = app_module.pool_monitor.checkouts
+app = app_module.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/login')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'first_request': served - created,
+                  'total': served - start, 'checkouts_after_import': checkouts_after_import}))
+'''
+
+
+def run_once(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    env = dict(os.environ, JINJA_CACHE_DIR=cache_dir, MAIL_WORKERS='0')
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(cache_dir, 'startup.db'))
+    env.setdefault('SECRET_KEY', 'startup-benchmark')
+
+    results = {'cold': [], 'warm': []}
+    try:
+        for _ in range(args.runs):
+            shutil.rmtree(cache_dir)
+            os.makedirs(cache_dir)
+            results['cold'].append(run_once(env))
+        run_once(env)
+        for _ in range(args.runs):
+            results['warm'].append(run_once(env))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    steps = ['import', 'create_app', 'first_request', 'total']
+    print(f"median of {args.runs} runs (ms){'':<4}" + ''.join(f'{step:>15}' for step in steps))
+    for cache, runs in results.items():
+        print(f'{cache + " template cache":<32}' +
+              ''.join(f'{statistics.median(run[step] for run in runs) * 1000:>15.1f}' for step in steps))
+
+    touched = max(run['checkouts_after_import'] for runs in results.values() for run in runs)
+    if touched:
+        print(f'FAIL: importing app.py checked out {touched} database connection(s).')
+        sys.exit(1)
+    print('Importing app.py made no database connection.')
+
+
+if __name__ == '__main__':
+    main()
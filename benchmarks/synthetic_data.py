@@ -0,0 +1,148 @@
+"""Synthetic listings and users shaped like the real data, for the benchmarks.
+
+Areas, agents and property types are skewed the way real listings cluster: a handful of popular areas
+and busy agents hold most of the stock, most listings are residential full title houses,
+prices follow the area and the number of bedrooms, and optional fields are often left empty.
+The output only depends on the seed, so two runs at the same scale load identical data.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/synthetic_data.py --scale 100k
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Base, Login, User, db  # noqa: E402
+from property_import import IMPORT_COLUMNS, copy_chunk  # noqa: E402
+
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+# (area, price multiplier), listed roughly from most to least listings
+AREAS = [('Van der Hoff Park', 1.1), ('Baillie Park', 1.3), ('Miederpark', 1.0), ('Dassierand', 0.9),
+         ('Central', 0.7), ('Grimbeek Park', 1.2), ('Bult', 0.8), ('Oewersig', 1.0), ('Mooivallei Park', 1.2),
+         ('Tuscany Ridge', 1.6), ('Heilige akker', 1.0), ('Kannonierspark', 0.8), ('Promosa', 0.5),
+         ('Wilgeboom', 1.4), ('Dam', 1.1), ('de Land', 0.9), ('Lifestyle', 1.5), ('Industrial', 1.3),
+         ('Mohadin', 0.6), ('Lekwena', 0.7), ('Rural', 0.9)]
+# Same values as the add_property form
+PROP_TYPES = [('Residential', 0.86), ('Commercial', 0.08), ('Farms', 0.03), ('Stands', 0.03)]
+PROP_CATEGORIES = [('Full Title', 0.58), ('Townhouse', 0.22), ('Apartment', 0.14), ('Farm', 0.03),
+                   ('Smallholding', 0.03)]
+STREET_WORDS = ['Church', 'Molen', 'Kruis', 'Tom', 'Nelson Mandela', 'Borcherd', 'Hoffman', 'Potgieter',
+                'Steyn', 'Louw', 'Retief', 'Botha', 'Du Plessis', 'Kock', 'Wolmarans', 'Beyers', 'Mooi']
+STREET_KINDS = ['Street', 'Avenue', 'Road', 'Crescent', 'Lane', 'Drive']
+
+PASSWORD = 'benchmark-password'
+
+
+def zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def property_rows(count, seed=1):
+    """Yield (row number, values) tuples in IMPORT_COLUMNS order, as property_import.copy_chunk() takes."""
+    rng = random.Random(seed)
+    area_weights = zipf_weights(len(AREAS))
+    agents = [f'Agent {number:03d}' for number in range(1, max(count // 400, 20) + 1)]
+    agent_weights = zipf_weights(len(agents), 0.9)
+    streets = [f'{rng.choice(STREET_WORDS)} {rng.choice(STREET_KINDS)}' for _ in range(max(count // 50, 100))]
+    complexes = [f'{rng.choice(STREET_WORDS)} {rng.choice(["Villas", "Estate", "Gardens", "Court"])}'
+                 for _ in range(max(count // 200, 20))]
+
+    batch = 10000
+    for start in range(0, count, batch):
+        areas = rng.choices(AREAS, area_weights, k=min(batch, count - start))
+        for offset, (area, multiplier) in enumerate(areas):
+            prop_type = rng.choices([name for name, _ in PROP_TYPES], [w for _, w in PROP_TYPES])[0]
+            category = rng.choices([name for name, _ in PROP_CATEGORIES], [w for _, w in PROP_CATEGORIES])[0]
+            sectional = category in ('Townhouse', 'Apartment')
+            bedrooms = None if prop_type == 'Stands' or rng.random() < 0.04 else \
+                rng.choices([1, 2, 3, 4, 5, 6], [8, 25, 38, 20, 6, 3])[0]
+            floor_area = None if bedrooms is None else int(rng.gauss(45 + bedrooms * 38, 20))
+            price = int(math.exp(rng.gauss(14.0, 0.35)) * multiplier * (1 + 0.25 * (bedrooms or 1)) / 1000) * 1000
+            values = {
+                'street_name': rng.choice(streets),
+                'street_number': str(rng.randint(1, 250)),
+                'complex_name': rng.choice(complexes) if sectional else None,
+                'complex_number': str(rng.randint(1, 120)) if sectional else None,
+                'area': area,
+                'price': None if rng.random() < 0.02 else price,
+                'bedrooms': bedrooms,
+                'bathrooms': None if bedrooms is None else max(1, bedrooms - rng.choice([0, 0.5, 1, 1.5])),
+                'garages': None if rng.random() < 0.3 else rng.choices([0, 1, 2, 3], [10, 35, 45, 10])[0],
+                'swimming_pool': rng.random() < (0.1 if sectional else 0.35),
+                'garden_flat': rng.random() < 0.08,
+                'study': rng.random() < 0.2,
+                'ground_floor': sectional and rng.random() < 0.4,
+                'pet_friendly': None if rng.random() < 0.5 else rng.random() < 0.6,
+                'link': f'https://listings.example/{start + offset}',
+                'link_display': 'View listing',
+                'note': None if rng.random() < 0.9 else 'Motivated seller',
+                'prop_type': prop_type,
+                'agent': rng.choices(agents, agent_weights)[0],
+                'stand_area': None if sectional else int(rng.gauss(900, 350)) if rng.random() > 0.1 else None,
+                'floor_area': floor_area if floor_area is None or floor_area > 20 else 20,
+                'prop_category': category,
+                'carports': None if rng.random() < 0.6 else rng.randint(0, 2),
+            }
+            yield start + offset + 2, tuple(values.get(column) for column in IMPORT_COLUMNS)
+
+
+def user_rows(count, seed=1):
+    """Yield (user, login) column dicts: mostly approved agents, some waiting for approval, a few admins."""
+    rng = random.Random(seed)
+    # One hash for everyone, hashing a password per user would dominate generating large scales
+    password_hash = generate_password_hash(PASSWORD)
+    joined = datetime(2023, 1, 1)
+    for number in range(count):
+        email = f'user{number}@example.com'
+        yield ({'name': f'User{number}', 'surname': rng.choice(STREET_WORDS), 'email': email,
+                'joined': joined + timedelta(minutes=rng.randint(0, 600000)),
+                'has_access': number == 0 or rng.random() < 0.93, 'is_admin': number == 0 or rng.random() < 0.01},
+               {'hash': password_hash, 'user_email': email})
+
+
+def create_schema(engine):
+    Base.metadata.create_all(engine)
+    db.metadata.create_all(engine)
+
+
+def generate(engine, properties, users=None, seed=1):
+    users = users if users is not None else max(properties // 100, 10)
+    chunk = []
+    for row in property_rows(properties, seed):
+        chunk.append(row)
+        if len(chunk) >= 5000:
+            copy_chunk(engine, chunk)
+            chunk = []
+    if chunk:
+        copy_chunk(engine, chunk)
+
+    rows = list(user_rows(users, seed))
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [user for user, _ in rows])
+        connection.execute(Login.__table__.insert(), [login for _, login in rows])
+    return properties, users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    create_schema(engine)
+    properties, users = generate(engine, SCALES[args.scale], seed=args.seed)
+    print(f'Generated {properties} properties and {users} users.')
+
+
+if __name__ == '__main__':
+    main()
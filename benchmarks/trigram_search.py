@@ -0,0 +1,121 @@
+"""Before/after latency of the dashboard text filters with the pg_trgm GIN indexes.
+
+Builds a scratch copy of the properties table filled with synthetic rows, times the
+ILIKE searches that apply_filters() generates, adds the trigram indexes from
+alembic revision 2c2f269828fd and times them again. The scratch table is dropped afterwards.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/trigram_search.py [--rows 500000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+TABLE = 'bench_trgm_properties'
+TRIGRAM_COLUMNS = ['area', 'street_name', 'complex_name', 'agent']
+
+AREAS = ['Baillie Park', 'Bult', 'Central', 'Dam', 'Dassierand', 'Grimbeek Park', 'Heilige akker',
+         'de Land', 'Industrial', 'Kannonierspark', 'Lekwena', 'Lifestyle', 'Miederpark', 'Mohadin',
+         'Mooivallei Park', 'Oewersig', 'Promosa', 'Rural', 'Tuscany Ridge', 'Van der Hoff Park', 'Wilgeboom']
+
+# Same shape of WHERE clause as apply_filters() builds for each text filter.
+QUERIES = {
+    'single area': ("area ILIKE :a1", {'a1': '%miederpark%'}),
+    'multi area (OR)': ("area ILIKE :a1 OR area ILIKE :a2 OR area ILIKE :a3",
+                        {'a1': '%baillie%', 'a2': '%tuscany%', 'a3': '%oewersig%'}),
+    'street name': ("street_name ILIKE :s", {'s': '%street 4711%'}),
+    'complex or street': ("complex_name ILIKE :c OR street_name ILIKE :c", {'c': '%complex 813%'}),
+    'agent': ("agent ILIKE :g", {'g': '%agent 17%'}),
+}
+
+
+def populate(conn, rows):
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(text(f"""
+        CREATE TABLE {TABLE} (
+            id serial PRIMARY KEY,
+            street_name varchar(100),
+            complex_name varchar(100),
+            area varchar(30),
+            agent varchar(255),
+            price bigint
+        )
+    """))
+    # Areas are skewed (power curve over the list) the same way real listings cluster.
+    conn.execute(text(f"""
+        INSERT INTO {TABLE} (street_name, complex_name, area, agent, price)
+        SELECT 'Street ' || (random() * 20000)::int,
+               CASE WHEN random() < 0.4 THEN 'Complex ' || (random() * 2000)::int END,
+               (:areas)[1 + floor(power(random(), 2) * :area_count)::int],
+               'Agent ' || (random() * 60)::int,
+               (300000 + random() * 5000000)::bigint
+        FROM generate_series(1, :rows)
+    """), {'areas': AREAS, 'area_count': len(AREAS), 'rows': rows})
+    conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def plan_summary(plan):
+    # The scan nodes of an EXPLAIN, e.g. 'Parallel Seq Scan on t' or 'Bitmap Index Scan on t_area_trgm'.
+    # The top node alone is the count's Aggregate whichever way the rows are found.
+    nodes = [line.strip().lstrip('->').strip().split('  (cost')[0] for (line,) in plan]
+    return '; '.join(node for node in nodes if 'Scan' in node) or nodes[0]
+
+
+def time_queries(conn, repeat):
+    results = {}
+    for name, (where, params) in QUERIES.items():
+        sql = text(f"SELECT id FROM {TABLE} WHERE {where} ORDER BY id LIMIT 20")
+        count_sql = text(f"SELECT count(*) FROM {TABLE} WHERE {where}")
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            conn.execute(count_sql, params).scalar()
+            timings.append((time.perf_counter() - start) * 1000)
+        plan = conn.execute(text(f"EXPLAIN {count_sql.text}"), params).fetchall()
+        results[name] = (statistics.median(timings), plan_summary(plan))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        print(f'Populating {args.rows} synthetic properties...')
+        populate(conn, args.rows)
+        conn.commit()
+
+        before = time_queries(conn, args.repeat)
+
+        for column in TRIGRAM_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX {TABLE}_{column}_trgm ON {TABLE} USING gin ({column} gin_trgm_ops)"))
+        conn.execute(text(f"ANALYZE {TABLE}"))
+        conn.commit()
+
+        after = time_queries(conn, args.repeat)
+
+        print(f"\n{'filter':<20}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+        for name in QUERIES:
+            before_ms, after_ms = before[name][0], after[name][0]
+            print(f'{name:<20}{before_ms:>14.2f}{after_ms:>14.2f}{before_ms / after_ms:>9.1f}x')
+            print(f'    before: {before[name][1]}')
+            print(f'    after:  {after[name][1]}')
+
+        conn.execute(text(f"DROP TABLE {TABLE}"))
+        conn.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+# facets.py
+
+import threading
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import String, case, cast, event, func, inspect, literal, select, true, union_all
+from sqlalchemy.orm import Session
+
+from models import Property
+
+# Facets counted on a column value as it is
+VALUE_FACETS = ['area', 'prop_type', 'prop_category', 'agent']
+# Facets counting the properties that have the flag set
+FLAG_FACETS = ['swimming_pool', 'garden_flat', 'study', 'ground_floor', 'pet_friendly']
+# (label, lower bound, upper bound) in rand, the upper bound is exclusive
+PRICE_BANDS = [('Under R1m', 0, 1000000), ('R1m - R1.5m', 1000000, 1500000), ('R1.5m - R2m', 1500000, 2000000),
+               ('R2m - R3m', 2000000, 3000000), ('R3m - R5m', 3000000, 5000000), ('R5m+', 5000000, None)]
+BEDROOM_BUCKETS = ['1', '2', '3', '4', '5+']
+FACET_COLUMNS = VALUE_FACETS + FLAG_FACETS + ['price', 'bedrooms']
+UNKNOWN = 'Unknown'
+
+
+def number(value):
+    # Form posts leave strings on the model until the flush, count them the way the database stores them
+    if value is None or value == '':
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def price_band(price):
+    price = number(price)
+    if price is None:
+        return UNKNOWN
+    for label, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return label
+    return UNKNOWN
+
+
+def bedroom_bucket(bedrooms):
+    bedrooms = number(bedrooms)
+    if bedrooms is None or bedrooms < 1:
+        return UNKNOWN
+    return str(int(bedrooms)) if bedrooms < 5 else '5+'
+
+
+def property_facets(values):
+    """The (facet, value) pairs a property with these column values is counted under."""
+    pairs = [(facet, values[facet] if values[facet] not in (None, '') else UNKNOWN) for facet in VALUE_FACETS]
+    pairs.append(('price_band', price_band(values['price'])))
+    pairs.append(('bedrooms', bedroom_bucket(values['bedrooms'])))
+    pairs += [(facet, 'true') for facet in FLAG_FACETS if values[facet]]
+    return pairs
+
+
+def facet_statement(query):
+    """One statement counting every facet over the rows of a (filtered) property query.
+
+    Returns (facet, value, count) rows, a UNION ALL of one GROUP BY per facet over the same subquery.
+    """
+    rows = query.order_by(None).with_entities(*[getattr(Property, column) for column in FACET_COLUMNS]).subquery()
+    price_expression = case(
+        *[((rows.c.price >= low) & (rows.c.price < high) if high is not None else rows.c.price >= low, label)
+          for label, low, high in PRICE_BANDS], else_=UNKNOWN)
+    bedroom_expression = case(
+        *[(rows.c.bedrooms == int(bucket), bucket) for bucket in BEDROOM_BUCKETS[:-1]],
+        (rows.c.bedrooms >= 5, '5+'), else_=UNKNOWN)
+
+    parts = []
+    for facet in VALUE_FACETS:
+        value = func.coalesce(func.nullif(rows.c[facet], ''), UNKNOWN)
+        parts.append(select(literal(facet).label('facet'), cast(value, String).label('value'),
+                            func.count().label('count')).group_by(value))
+    for facet, expression in [('price_band', price_expression), ('bedrooms', bedroom_expression)]:
+        parts.append(select(literal(facet), cast(expression, String), func.count()).group_by(expression))
+    for facet in FLAG_FACETS:
+        parts.append(select(literal(facet), literal('true'), func.count()).where(rows.c[facet] == true()))
+    return union_all(*parts)
+
+
+def collect(rows):
+    # {facet: {value: count}}, flags without any property are left out
+    facets = {}
+    for facet, value, count in rows:
+        if count:
+            facets.setdefault(facet, {})[value] = count
+    return facets
+
+
+def bedroom_filter_counts(facets):
+    # Counts for the options of the bedroom filter, '3+' is three bedrooms or more
+    buckets = facets.get('bedrooms', {})
+    counts = {bucket: buckets.get(bucket, 0) for bucket in BEDROOM_BUCKETS}
+    for minimum in (2, 3, 4):
+        counts[f'{minimum}+'] = sum(buckets.get(bucket, 0) for bucket in BEDROOM_BUCKETS[minimum - 1:])
+    return counts
+
+
+class FacetCounts:
+    """Facet counts of the whole catalogue, kept in memory and adjusted by every ORM write to a property.
+
+    The first read counts everything with facet_statement(). After that each committed session applies
+    the difference between the old and new values of the properties it inserted, updated or deleted, so
+    page views never run a GROUP BY. Writes the ORM does not see (COPY imports, set-based bulk statements,
+    other processes) call invalidate() and the next read counts again.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._counts = None
+        # Bumped by every write, a count that raced with one is returned but not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._counts is not None:
+                return {facet: dict(values) for facet, values in self._counts.items()}
+            generation = self._generation
+        counts = self.loader()
+        with self._lock:
+            if self._generation == generation:
+                self._counts = counts
+            return {facet: dict(values) for facet, values in counts.items()}
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._counts = None
+
+    def apply(self, deltas):
+        with self._lock:
+            self._generation += 1
+            if self._counts is None:
+                return
+            for (facet, value), delta in deltas.items():
+                values = self._counts.setdefault(facet, {})
+                count = values.get(value, 0) + delta
+                if count > 0:
+                    values[value] = count
+                else:
+                    values.pop(value, None)
+                    if not values:
+                        del self._counts[facet]
+
+    def track(self, session_class=Session):
+        event.listen(session_class, 'before_flush', self._before_flush)
+        event.listen(session_class, 'after_commit', self._after_commit)
+        event.listen(session_class, 'after_rollback', self._after_rollback)
+
+    def _before_flush(self, session, flush_context, instances):
+        deltas = session.info.setdefault('facet_deltas', {})
+        for instance in session.new:
+            if isinstance(instance, Property):
+                add_pairs(deltas, property_facets(current_values(instance)), 1)
+        for instance in session.deleted:
+            if isinstance(instance, Property):
+                old = old_values(instance)
+                if old is None:
+                    session.info['facet_stale'] = True
+                else:
+                    add_pairs(deltas, property_facets(old), -1)
+        for instance in session.dirty:
+            if isinstance(instance, Property) and session.is_modified(instance):
+                old = old_values(instance)
+                if old is None:
+                    session.info['facet_stale'] = True
+                    continue
+                add_pairs(deltas, property_facets(old), -1)
+                add_pairs(deltas, property_facets(current_values(instance)), 1)
+
+    def _after_commit(self, session):
+        deltas = session.info.pop('facet_deltas', None)
+        if session.info.pop('facet_stale', False):
+            self.invalidate()
+        elif deltas:
+            self.apply(deltas)
+
+    def _after_rollback(self, session):
+        session.info.pop('facet_deltas', None)
+        session.info.pop('facet_stale', None)
+
+
+def add_pairs(deltas, pairs, delta):
+    for pair in pairs:
+        deltas[pair] = deltas.get(pair, 0) + delta
+
+
+def current_values(instance, columns=FACET_COLUMNS):
+    return {column: getattr(instance, column) for column in columns}
+
+
+def old_values(instance, columns=FACET_COLUMNS):
+    # Column values as last loaded from the database, None when one of them was never loaded
+    state = inspect(instance)
+    values = {}
+    for column in columns:
+        history = state.attrs[column].history
+        if history.deleted:
+            values[column] = history.deleted[0]
+        elif history.unchanged:
+            values[column] = history.unchanged[0]
+        elif not history.added and column not in state.unloaded:
+            values[column] = None
+        else:
+            return None
+    return values
@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+# Production server: several worker processes with WAITRESS_THREADS threads each, so one CPU-bound request (a large
+# export, a password hash) holds up only its own thread. Started from the repository root with
+#     gunicorn
+# which reads this file. my_waitress.py remains the single-process server for Windows and development.
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_PROCESSES", 0)) or os.cpu_count()
+# gunicorn's threaded worker, except that a stopping worker answers the connections it has already accepted
+worker_class = 'server_worker.DrainingThreadWorker'
+threads = int(os.getenv("WAITRESS_THREADS", 4))
+
+# The app is imported and its templates loaded once in the master, the workers share that memory copy-on-write.
+# Because of this a HUP does not load new code, use `flask --app app reload-server` to deploy.
+wsgi_app = 'app:preload_app()'
+preload_app = True
+
+# Each worker is replaced after about this many requests, the jitter keeps them from restarting together
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", max_requests // 10))
+# Seconds a stopping worker gets to finish the requests it has, and a silent worker is given before it is killed
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+keepalive = 5
+
+# Same default as app.config['WEB_PIDFILE'], the instance folder next to app.py
+pidfile = os.getenv("WEB_PIDFILE",
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'gunicorn.pid'))
+
+
+def post_fork(server, worker):
+    import app
+    app.worker_started(master_pid=worker.ppid)
+
+
+def post_request(worker, req, environ, resp):
+    import app
+    app.worker_board.served(worker.nr)
+
+
+def child_exit(server, worker):
+    import app
+    app.worker_board.remove(worker.pid)
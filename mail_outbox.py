@@ -0,0 +1,272 @@
+# mail_outbox.py
+
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import or_, and_
+
+from models import OutboxMessage
+
+
+# SMTP errors the server answered with a reply code: 5xx will not go away by retrying the same message,
+# 4xx (greylisting, rate limits, a busy server) are retried with the backoff
+SMTP_REPLY_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# Errors that mean the connection itself is gone, the rest of the batch waits for the next round
+CONNECTION_ERRORS = (OSError, smtplib.SMTPServerDisconnected, smtplib.SMTPAuthenticationError,
+                     smtplib.SMTPConnectError, smtplib.SMTPHeloError)
+
+
+def address_list(addresses):
+    # Callers pass a single address, a list, or a list holding the list of admin emails
+    if not addresses:
+        return []
+    if isinstance(addresses, str):
+        return [addresses]
+    flattened = []
+    for address in addresses:
+        flattened.extend(address_list(address))
+    return flattened
+
+
+def enqueue(db_session, subject, recipients, html, cc=None):
+    message = OutboxMessage(
+        subject=subject,
+        recipients=','.join(address_list(recipients)),
+        cc=','.join(address_list(cc)) or None,
+        html=html,
+    )
+    db_session.add(message)
+    db_session.commit()
+    return message.id
+
+
+class SmtpConnection:
+    """An authenticated SMTP connection opened on first use and kept open for the following messages."""
+
+    def __init__(self, host, port, username=None, password=None, starttls=True, timeout=30, idle_timeout=120):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _open(self):
+        smtp = smtplib.SMTP(host=self.host, port=self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connects += 1
+
+    def ensure_open(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > 10:
+            # Idle for a while, the server may have dropped us
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except CONNECTION_ERRORS:
+                self.close()
+        if self._smtp is None:
+            self._open()
+
+    def send(self, message):
+        self.ensure_open()
+        self._smtp.send_message(message, from_addr=self.username or None)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+
+def permanent_smtp_error(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Raised when every recipient was refused, each with its own code; a retry can reach the 4xx ones
+        return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+    return error.smtp_code >= 500
+
+
+class OutboxSender:
+    """Pool of background threads delivering the mail_outbox table.
+
+    Each worker claims a batch of due messages, sends them over its own reused SMTP connection and
+    schedules failures for a retry with exponential backoff. Claims are taken with SKIP LOCKED so several
+    workers (or processes running `flask mail-worker`) never pick up the same message, and a claim left
+    behind by a crashed process is picked up again after `claim_timeout` seconds.
+    """
+
+    def __init__(self, session_factory, smtp_settings, workers=2, batch_size=20, max_attempts=5,
+                 backoff=30, poll_interval=5, claim_timeout=600, sender_name='Click & Buy - Mailer', metrics=None):
+        self.session_factory = session_factory
+        self.smtp_settings = smtp_settings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.sender_name = sender_name
+        # Anything with observe_mail(outcome, seconds), request_metrics.RequestMetrics in the app
+        self.metrics = metrics
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._stopping.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-outbox-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain(self):
+        # Send everything that is due in the calling thread, used by `flask mail-worker --once`
+        connection = SmtpConnection(**self.smtp_settings)
+        sent = failed = 0
+        try:
+            while True:
+                batch_sent, batch_failed, claimed = self.process_batch(connection)
+                sent += batch_sent
+                failed += batch_failed
+                if not claimed:
+                    return sent, failed
+        finally:
+            connection.close()
+
+    def _run(self):
+        connection = SmtpConnection(**self.smtp_settings)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    sent, failed, claimed = self.process_batch(connection)
+                except Exception as e:
+                    print('Mail outbox worker error:', e)
+                    claimed = 0
+                if not claimed:
+                    connection.close_if_idle()
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+        finally:
+            connection.close()
+
+    def claim(self):
+        now = datetime.utcnow()
+        with self.session_factory() as db_session:
+            messages = db_session.query(OutboxMessage).filter(or_(
+                and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now),
+                and_(OutboxMessage.status == 'sending',
+                     OutboxMessage.claimed_at < now - timedelta(seconds=self.claim_timeout)),
+            )).order_by(OutboxMessage.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            for message in messages:
+                message.status = 'sending'
+                message.claimed_at = now
+            batch = [(message.id, message.subject, message.recipients, message.cc, message.html)
+                     for message in messages]
+            db_session.commit()
+        return batch
+
+    def build_message(self, subject, recipients, cc, html):
+        message = EmailMessage()
+        message['from'] = self.sender_name
+        message['subject'] = subject
+        message['to'] = recipients
+        if cc:
+            message['cc'] = cc
+        message.set_content(html, 'html')
+        return message
+
+    def process_batch(self, connection):
+        batch = self.claim()
+        sent, failed = [], {}
+        connection_lost = None
+
+        for position, (message_id, subject, recipients, cc, html) in enumerate(batch):
+            if not recipients and not cc:
+                failed[message_id] = ('No recipients', True)
+                continue
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                connection.send(self.build_message(subject, recipients, cc, html))
+                sent.append(message_id)
+                outcome = 'sent'
+            except SMTP_REPLY_ERRORS as e:
+                permanent = permanent_smtp_error(e)
+                failed[message_id] = (repr(e), permanent)
+                if permanent:
+                    outcome = 'rejected'
+            except CONNECTION_ERRORS as e:
+                connection.close()
+                failed[message_id] = (repr(e), False)
+                connection_lost = [item[0] for item in batch[position + 1:]]
+                break
+            except Exception as e:
+                failed[message_id] = (repr(e), False)
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe_mail(outcome, time.perf_counter() - start)
+
+        self.record(sent, failed, connection_lost or [])
+        return len(sent), len(failed), len(batch)
+
+    def record(self, sent, failed, released):
+        now = datetime.utcnow()
+        with self.session_factory() as db_session:
+            if sent:
+                db_session.query(OutboxMessage).filter(OutboxMessage.id.in_(sent)).update(
+                    {'status': 'sent', 'sent_at': now, 'last_error': None}, synchronize_session=False)
+            if released:
+                # Never attempted because the connection went away, back in the queue without counting a try
+                db_session.query(OutboxMessage).filter(OutboxMessage.id.in_(released)).update(
+                    {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=self.backoff)},
+                    synchronize_session=False)
+            for message in db_session.query(OutboxMessage).filter(OutboxMessage.id.in_(list(failed))):
+                error, permanent = failed[message.id]
+                message.attempts = (message.attempts or 0) + 1
+                message.last_error = error
+                if permanent or message.attempts >= self.max_attempts:
+                    message.status = 'failed'
+                else:
+                    message.status = 'pending'
+                    delay = min(self.backoff * 2 ** (message.attempts - 1), 3600)
+                    message.next_attempt_at = now + timedelta(seconds=delay)
+            db_session.commit()
@@ -35,6 +35,68 @@ class Login(Base):
     user = relationship('User', back_populates='login')  # Add this line
 
 
+class OutboxMessage(Base):
+    """An outgoing email, written by the request that sends it and delivered by the mail_outbox sender pool."""
+    __tablename__ = 'mail_outbox'
+    id = Column(Integer, primary_key=True)
+    subject = Column(String(255))
+    recipients = Column(Text)  # Comma separated
+    cc = Column(Text)  # Comma separated
+    html = Column(Text)
+    status = Column(String(20), default='pending', index=True)  # pending, sending, sent or failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+
+class DataVersion(Base):
+    """Counter bumped on every write to a table, so caches in every process can tell their copy is stale."""
+    __tablename__ = 'data_versions'
+    name = Column(String(50), primary_key=True)  # The table it versions, e.g. 'properties'
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+
+class SavedSearch(Base):
+    """A dashboard filter set a user saved, matched against every property that is added, updated or imported."""
+    __tablename__ = 'saved_searches'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    name = Column(String(100))
+    filters = Column(Text)  # JSON of build_filters_from_form()
+    notify = Column(Boolean, default=True)  # Email the user about new matches
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SavedSearchMatch(Base):
+    """A property a saved search matched, recorded once so later edits to the property do not notify again."""
+    __tablename__ = 'saved_search_matches'
+    search_id = Column(Integer, ForeignKey('saved_searches.id', ondelete='CASCADE'), primary_key=True)
+    property_id = Column(Integer, primary_key=True, index=True)
+    matched_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AreaStatistic(Base):
+    """Price statistics of one area, property type and category, kept up to date by area_stats.AreaStatistics."""
+    __tablename__ = 'area_statistics'
+    # '' stands for a property without an area, type or category
+    area = Column(String(30), primary_key=True)
+    prop_type = Column(String(255), primary_key=True)
+    prop_category = Column(String(255), primary_key=True)
+    listings = Column(Integer, nullable=False, default=0)
+    priced = Column(Integer, nullable=False, default=0)  # Listings with a price, the ones the percentiles are over
+    price_p25 = Column(BigInteger)
+    price_median = Column(BigInteger)
+    price_p75 = Column(BigInteger)
+    floor_price_per_m2 = Column(Integer)  # Median of price / floor_area
+    stand_price_per_m2 = Column(Integer)  # Median of price / stand_area
+    bedrooms_median = Column(Numeric(precision=3, scale=1))
+    updated_at = Column(DateTime)
+
+
 class Property(db.Model):
     __tablename__ = 'properties'
     id = db.Column(db.Integer, primary_key=True)
@@ -1,5 +1,7 @@
+# Single-process server for Windows and development, production runs gunicorn (see gunicorn.conf.py)
 from waitress import serve
-from app import app
+from app import create_app
 
 if __name__ == "__main__":
-    serve(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    app = create_app()
+    serve(app, host="0.0.0.0", port=8000, threads=app.config['WAITRESS_THREADS'])
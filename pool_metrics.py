@@ -0,0 +1,121 @@
+# pool_metrics.py
+
+import threading
+import time
+import traceback
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMonitor:
+    """Checkout statistics and leak detection for the application's connection pool.
+
+    Every checkout is timed (waiting for a free connection, opening a new one and the pre-ping all count)
+    and remembered until it is checked back in. A connection still checked out by a thread when that
+    thread's request has finished was never returned, it is reported as a leak together with the stack
+    that checked it out when `trace` is on.
+    """
+
+    def __init__(self, leak_seconds=60, trace=False):
+        self.leak_seconds = leak_seconds
+        self.trace = trace
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.leaks = 0
+        self._held = {}
+        self._lock = threading.Lock()
+        self.pool = None
+
+    def pool_class(self):
+        # QueuePool that reports how long each checkout took, bound to this monitor (pool.recreate() after
+        # a dispose builds the same class again, so the binding survives)
+        monitor = self
+
+        class MonitoredQueuePool(QueuePool):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    return super().connect()
+                except exc.TimeoutError:
+                    with monitor._lock:
+                        monitor.timeouts += 1
+                    raise
+                finally:
+                    monitor.record_wait(time.perf_counter() - start)
+
+        return MonitoredQueuePool
+
+    def attach(self, engine):
+        self.pool = engine.pool
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'engine_disposed', self._on_disposed)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        stack = None
+        if self.trace:
+            # Only the application's own frames, the SQLAlchemy / Flask ones say nothing about who leaked
+            frames = [frame for frame in traceback.extract_stack()[:-1]
+                      if 'site-packages' not in frame.filename and frame.filename != '<string>'
+                      and not frame.filename.endswith('pool_metrics.py')]
+            stack = ''.join(traceback.format_list(frames[-8:]))
+        with self._lock:
+            self._held[id(connection_record)] = (time.monotonic(), threading.get_ident(), stack)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._held.pop(id(connection_record), None)
+
+    def _on_disposed(self, engine):
+        self.pool = engine.pool
+
+    def check_thread(self, context):
+        # Called once a request is over: anything this thread still holds leaked from it
+        thread = threading.get_ident()
+        with self._lock:
+            leaked = [(record, stack) for record, (_, holder, stack) in self._held.items() if holder == thread]
+            for record, _ in leaked:
+                # Reported once, it stays checked out until the garbage collector returns it
+                self._held.pop(record)
+            self.leaks += len(leaked)
+        for _, stack in leaked:
+            print(f'Connection pool leak: a connection checked out during {context} was not returned.')
+            if stack:
+                print(stack)
+        return len(leaked)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            held_for = [now - started for started, _, _ in self._held.values()]
+            stats = {
+                'checkouts': self.checkouts,
+                'wait_seconds_total': round(self.wait_total, 6),
+                'wait_seconds_avg': round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+                'wait_seconds_max': round(self.wait_max, 6),
+                'timeouts': self.timeouts,
+                'leaks': self.leaks,
+                'held': len(held_for),
+                'held_longest_seconds': round(max(held_for, default=0.0), 3),
+                'held_over_leak_threshold': sum(1 for seconds in held_for if seconds > self.leak_seconds),
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+                'timeout': pool.timeout(),
+            })
+        return stats
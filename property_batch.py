@@ -0,0 +1,71 @@
+# property_batch.py
+
+from sqlalchemy import delete, func, select, update
+
+from models import Property
+from property_import import coerce_value
+
+# Columns a batch update may set. Addresses and links belong to one listing and are edited one at a time.
+BATCH_COLUMNS = ['agent', 'area', 'prop_type', 'prop_category', 'price', 'bedrooms', 'bathrooms', 'garages',
+                 'carports', 'floor_area', 'stand_area', 'swimming_pool', 'garden_flat', 'study', 'ground_floor',
+                 'pet_friendly', 'note']
+BATCH_ACTIONS = ('update', 'delete')
+# Longest id list one request may name, larger cleanups select by filter instead
+MAX_BATCH_IDS = 10000
+
+
+class BatchConflict(Exception):
+    """Raised when a batch matched a different number of properties than the caller confirmed."""
+
+
+class BatchResult:
+    """Outcome of a batch: the ids written and the (area, prop_type, prop_category) groups they were in."""
+
+    def __init__(self, action, ids, groups):
+        self.action = action
+        self.ids = ids
+        self.groups = groups
+
+    @property
+    def affected(self):
+        return len(self.ids)
+
+
+def batch_values(raw):
+    # {column: value} to SET from the posted {column: text}, with the import's conversion rules.
+    # A blank number clears the column, a blank flag sets it to false. Raises ValueError.
+    if not raw:
+        raise ValueError('Choose at least one field to change.')
+    unknown = sorted(set(raw) - set(BATCH_COLUMNS))
+    if unknown:
+        raise ValueError('These fields can not be changed in a batch: ' + ', '.join(unknown))
+    return {name: coerce_value(Property.__table__.c[name], value) for name, value in raw.items()}
+
+
+def count_batch(connection, where):
+    return connection.execute(select(func.count()).select_from(Property.__table__).where(where)).scalar()
+
+
+def run_batch(connection, action, where, values=None, expected=None):
+    """One set-based UPDATE or DELETE of the properties matching `where`, on the caller's transaction.
+
+    The written ids come back through RETURNING, together with the statistics groups the rows were in
+    before and after an update. Raises BatchConflict when `expected` is given and another number of rows
+    matched (the data changed since the caller counted it), the caller then rolls back.
+    """
+    table = Property.__table__
+    group_columns = [table.c.area, table.c.prop_type, table.c.prop_category]
+    groups = {tuple(row) for row in connection.execute(select(*group_columns).where(where).distinct())}
+
+    if action == 'delete':
+        ids = connection.execute(delete(table).where(where).returning(table.c.id)).scalars().all()
+    elif action == 'update':
+        rows = connection.execute(update(table).where(where).values(values).returning(table.c.id, *group_columns)).all()
+        ids = [row[0] for row in rows]
+        groups |= {tuple(row[1:]) for row in rows}
+    else:
+        raise ValueError(f'Unknown batch action {action!r}')
+
+    if expected is not None and len(ids) != expected:
+        raise BatchConflict(f'{len(ids)} properties match now, {expected} were confirmed.')
+    return BatchResult(action, ids, {tuple(value or '' for value in group) for group in groups})
@@ -0,0 +1,61 @@
+# property_export.py
+
+import csv
+import io
+import tempfile
+
+from models import Property
+
+
+# Every Property column, the id first. property_import reads the others back and rejects rows that carry an id.
+EXPORT_COLUMNS = [column.name for column in Property.__table__.columns]
+
+
+def _fetch_batches(engine, statement, batch_size):
+    # Server-side cursor (a named cursor on PostgreSQL) read batch_size rows at a time, so only one batch
+    # is ever held in memory however many rows match
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(statement)
+        for batch in result.partitions():
+            yield batch
+
+
+def stream_csv(engine, statement, batch_size=2000):
+    """Yield the rows selected by `statement` as CSV text, one chunk per fetched batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _fetch_batches(engine, statement, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_xlsx(engine, statement, batch_size=2000, chunk_size=64 * 1024):
+    """Yield an XLSX workbook of the rows selected by `statement`.
+
+    openpyxl's write-only mode streams the rows into a temporary file rather than building the sheet
+    in memory, but the zip container can only be finished once every row is written, so the bytes
+    are sent after the query has been read.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Properties')
+    worksheet.append(EXPORT_COLUMNS)
+    for batch in _fetch_batches(engine, statement, batch_size):
+        for row in batch:
+            worksheet.append(list(row))
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,256 @@
+# property_import.py
+
+import collections
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import BigInteger, Boolean, Integer, Numeric, String
+
+from models import Property
+
+
+# Every Property column apart from the primary key, in the order rows are written to COPY
+IMPORT_COLUMNS = [column.name for column in Property.__table__.columns if not column.primary_key]
+
+# Spreadsheet values read as true / false for the checkbox columns
+TRUE_LITERALS = ('t', 'true', 'y', 'yes', 'on', '1', 'x')
+FALSE_LITERALS = ('f', 'false', 'n', 'no', 'off', '0')
+
+INTEGER_LIMITS = {Integer: 2 ** 31, BigInteger: 2 ** 63}
+
+
+class ImportReport:
+    """Outcome of a bulk import: rows written plus the (row number, message) of every row that was skipped."""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def normalize_header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def check_header(header):
+    if not set(header) & set(IMPORT_COLUMNS):
+        raise ValueError('The first row must name the property columns, e.g. ' + ', '.join(IMPORT_COLUMNS[:6]))
+    return header
+
+
+def read_rows(stream, filename):
+    # Yields (row number, {column: raw value}) for a CSV or XLSX upload, row numbers as the user sees them.
+    # Raises ValueError when the header row does not name any property column.
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = check_header([normalize_header(name) for name in next(rows, [])])
+            for row_number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield row_number, dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(stream)
+    header = check_header([normalize_header(name) for name in next(reader, [])])
+    for row_number, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield row_number, dict(zip(header, values))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def coerce_value(column, value):
+    # Same rules as add_property: blank numbers become NULL, whole numbers for the integer columns,
+    # Decimal for bathrooms and unchecked (blank) flags are False
+    column_type = column.type
+    text = _text(value)
+
+    if isinstance(column_type, Boolean):
+        if text.lower() in TRUE_LITERALS:
+            return True
+        if text.lower() in FALSE_LITERALS or (not text and column.default is not None):
+            return False
+        if not text:
+            return None
+        raise ValueError(f'{column.name}: expected yes/no, got {text!r}')
+
+    if not text:
+        return None
+
+    if isinstance(column_type, (Integer, BigInteger)):
+        cleaned = text.replace(',', '').replace(' ', '').lstrip('R')
+        try:
+            number = Decimal(cleaned)
+        except InvalidOperation:
+            raise ValueError(f'{column.name}: expected a whole number, got {text!r}')
+        if number != number.to_integral_value():
+            raise ValueError(f'{column.name}: expected a whole number, got {text!r}')
+        limit = INTEGER_LIMITS[type(column_type)]
+        if not -limit <= number < limit:
+            raise ValueError(f'{column.name}: {text} is out of range')
+        return int(number)
+
+    if isinstance(column_type, Numeric):
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f'{column.name}: expected a number, got {text!r}')
+        number = number.quantize(Decimal(1).scaleb(-column_type.scale))
+        if abs(number) >= Decimal(10) ** (column_type.precision - column_type.scale):
+            raise ValueError(f'{column.name}: {text} is out of range')
+        return number
+
+    if isinstance(column_type, String) and column_type.length and len(text) > column_type.length:
+        raise ValueError(f'{column.name}: longer than {column_type.length} characters')
+    return text
+
+
+def coerce_chunk(rows):
+    # Runs in the worker processes: returns the coerced value tuples and the errors of one chunk
+    columns = [Property.__table__.columns[name] for name in IMPORT_COLUMNS]
+    valid, errors = [], []
+    for row_number, raw in rows:
+        if _text(raw.get('id')):
+            # An exported listing: inserting it again would list the property twice
+            errors.append((row_number, 'id: only new listings are imported, clear the id to add this one as a copy'))
+            continue
+        try:
+            valid.append((row_number, tuple(coerce_value(column, raw.get(column.name)) for column in columns)))
+        except ValueError as e:
+            errors.append((row_number, str(e)))
+    return valid, errors
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bounded_map(executor, function, items, window):
+    # Like executor.map(), which submits every item before yielding the first result and so would read the whole
+    # upload into memory, but with at most `window` items submitted and not yet yielded
+    pending = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _copy_value(value):
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return value
+
+
+def copy_chunk(engine, chunk):
+    # COPY ... FROM STDIN on PostgreSQL, a plain executemany INSERT on anything else (SQLite in development)
+    if engine.dialect.name != 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(Property.__table__.insert(),
+                               [dict(zip(IMPORT_COLUMNS, values)) for _, values in chunk])
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for _, values in chunk:
+        # Unquoted empty fields are NULL in COPY's csv format
+        writer.writerow(['' if value is None else _copy_value(value) for value in values])
+    buffer.seek(0)
+
+    raw_connection = engine.raw_connection()
+    try:
+        with raw_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY properties ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        raw_connection.commit()
+    finally:
+        # Back to the pool, which rolls back whatever a failed COPY left open
+        raw_connection.close()
+
+
+def insert_rows_individually(engine, chunk, report):
+    # A chunk the database rejected as a whole: retry its rows one by one so only the bad ones are skipped
+    table = Property.__table__
+    with engine.connect() as connection:
+        for row_number, values in chunk:
+            savepoint = connection.begin_nested()
+            try:
+                connection.execute(table.insert(), dict(zip(IMPORT_COLUMNS, values)))
+                savepoint.commit()
+                report.inserted += 1
+            except Exception as e:
+                savepoint.rollback()
+                report.add_error(row_number, str(getattr(e, 'orig', e)).strip().splitlines()[0])
+        connection.commit()
+
+
+def import_properties(engine, rows, chunk_size=5000, workers=None):
+    """Validate rows in parallel and write them to the properties table in COPY chunks.
+
+    `rows` is an iterable of (row number, {column: raw value}) as yielded by read_rows(), read as the
+    chunks are written so memory stays flat however large the file. Rows that fail validation, or that
+    the database rejects, are reported in the returned ImportReport and skipped; every other row is
+    written as a new listing, a row carrying an id (as exported) is rejected.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+
+    def ingest(results):
+        for valid, errors in results:
+            report.rows += len(valid) + len(errors)
+            report.errors.extend(errors)
+            if not valid:
+                continue
+            try:
+                copy_chunk(engine, valid)
+                report.inserted += len(valid)
+            except Exception:
+                insert_rows_individually(engine, valid, report)
+
+    if workers > 1:
+        # Spawned rather than forked, the web server calling this has threads and open database connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Results come in chunk order, so rows reach the table in file order while the next few chunks are
+            # being coerced in the other processes
+            ingest(_bounded_map(executor, coerce_chunk, _chunks(rows, chunk_size), workers * 2))
+    else:
+        ingest(map(coerce_chunk, _chunks(rows, chunk_size)))
+
+    report.errors.sort()
+    report.elapsed = time.perf_counter() - start
+    return report
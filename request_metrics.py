@@ -0,0 +1,182 @@
+# request_metrics.py
+
+import bisect
+import threading
+import time
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+from werkzeug.wsgi import ClosingIterator
+
+# Upper bounds in seconds, from a cached page up to a slow export
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per label set."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            label_text = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f'{{{label_text}}}' if label_text else ''
+            lines.append(f'{self.name}_sum{suffix} {total:.6f}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """Latency of requests, SQL statements, template renders and outgoing mail, in Prometheus text format.
+
+    Requests are labelled by endpoint (never by path, so the number of series stays bounded) and timed by
+    WSGI middleware from the moment the server calls the app until it closes the response body, so a
+    streamed response counts until its last chunk and a request that raised is recorded as a 500. SQL
+    statements are timed with engine events and also summed per request on the thread serving it, which
+    gives the statements and SQL time each endpoint spends. Observing is a bisect and a short lock.
+    """
+
+    def __init__(self, prefix='clickbuy'):
+        self.requests = Histogram(f'{prefix}_http_request_duration_seconds', 'Time to handle a request.',
+                                  ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.request_queries = Histogram(f'{prefix}_http_request_sql_queries', 'SQL statements run by a request.',
+                                         ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.request_sql = Histogram(f'{prefix}_http_request_sql_duration_seconds',
+                                     'Time a request spent in SQL statements.', ('endpoint',), LATENCY_BUCKETS)
+        self.statements = Histogram(f'{prefix}_sql_statement_duration_seconds', 'Time to execute a SQL statement.',
+                                    ('kind',), SQL_BUCKETS)
+        self.templates = Histogram(f'{prefix}_template_render_duration_seconds', 'Time to render a template.',
+                                   ('template',), LATENCY_BUCKETS)
+        self.mail = Histogram(f'{prefix}_mail_send_duration_seconds', 'Time to hand a message to the SMTP server.',
+                              ('outcome',), LATENCY_BUCKETS)
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def init_app(self, app):
+        app.before_request(self._note_endpoint)
+        app.wsgi_app = self._timed(app.wsgi_app)
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._finish_template, app)
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._start_statement)
+        event.listen(engine, 'after_cursor_execute', self._finish_statement)
+        event.listen(engine, 'handle_error', self._statement_failed)
+
+    def _note_endpoint(self):
+        # The middleware only sees the WSGI environ, the endpoint is known once the URL has been matched
+        request.environ['request_metrics.endpoint'] = request.endpoint
+
+    def _timed(self, wsgi_app):
+        def timed_app(environ, start_response):
+            self._local.request_start = time.perf_counter()
+            self._local.queries = 0
+            self._local.sql_seconds = 0.0
+            status = ['500']
+
+            def timed_start_response(status_line, headers, exc_info=None):
+                status[0] = status_line.split(' ', 1)[0]
+                return start_response(status_line, headers, exc_info)
+
+            try:
+                body = wsgi_app(environ, timed_start_response)
+            except BaseException:
+                self._finish_request(environ, status[0])
+                raise
+            file_wrapper = environ.get('wsgi.file_wrapper')
+            if isinstance(file_wrapper, type) and isinstance(body, file_wrapper):
+                # Wrapping it would stop the server from sending the file with sendfile(), and sending a file
+                # runs no more of the app
+                self._finish_request(environ, status[0])
+                return body
+            return ClosingIterator(body, lambda: self._finish_request(environ, status[0]))
+        return timed_app
+
+    def _finish_request(self, environ, status):
+        start = getattr(self._local, 'request_start', None)
+        if start is not None:
+            self._local.request_start = None
+            endpoint = environ.get('request_metrics.endpoint') or 'unmatched'
+            self.requests.observe((endpoint, environ.get('REQUEST_METHOD', ''), status),
+                                  time.perf_counter() - start)
+            self.request_queries.observe((endpoint,), self._local.queries)
+            self.request_sql.observe((endpoint,), self._local.sql_seconds)
+
+    def _start_statement(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_statement_start', []).append(time.perf_counter())
+
+    def _finish_statement(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_statement_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        kind = statement.lstrip()[:6].upper()
+        self.statements.observe((kind if kind in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER',), elapsed)
+        if getattr(self._local, 'request_start', None) is not None:
+            self._local.queries += 1
+            self._local.sql_seconds += elapsed
+
+    def _statement_failed(self, context):
+        # A failed statement never reaches after_cursor_execute, drop its start so the stack stays paired
+        # execution_context rather than cursor, SQLAlchemy 2.0 leaves ExceptionContext.cursor unset
+        if context.execution_context is not None and context.connection is not None:
+            starts = context.connection.info.get('metrics_statement_start')
+            if starts:
+                starts.pop()
+
+    def _start_template(self, sender, template, context, **extra):
+        self._local.template_start = time.perf_counter()
+
+    def _finish_template(self, sender, template, context, **extra):
+        start = getattr(self._local, 'template_start', None)
+        if start is not None:
+            self._local.template_start = None
+            self.observe_template(template.name, time.perf_counter() - start)
+
+    def observe_template(self, name, seconds):
+        self.templates.observe((name or 'string',), seconds)
+
+    def observe_mail(self, outcome, seconds):
+        self.mail.observe((outcome,), seconds)
+
+    def render(self, extra=()):
+        # extra: (name, type, help, value) samples owned by someone else, such as the pool statistics
+        lines = []
+        for histogram in (self.requests, self.request_queries, self.request_sql, self.statements,
+                          self.templates, self.mail):
+            lines += histogram.render()
+        for name, kind, help_text, value in extra:
+            lines += [f'# HELP {self.prefix}_{name} {help_text}', f'# TYPE {self.prefix}_{name} {kind}',
+                      f'{self.prefix}_{name} {value}']
+        return '\n'.join(lines) + '\n'
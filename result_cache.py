@@ -0,0 +1,146 @@
+# result_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Bounded in-process cache with LRU eviction and a time-to-live per entry.
+
+    Used in front of the dashboard search so repeated filter/page/sort combinations skip the database.
+    Writers call clear(), which also bumps the generation so a result computed from data read before
+    the write is never stored afterwards (see put()).
+    """
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation):
+        with self._lock:
+            # The data changed while this value was being computed, it may already be stale
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'generation': self.generation,
+            }
+
+
+class CachedCounter:
+    """A count kept in memory and adjusted by the code paths that change it.
+
+    The first read loads it with the loader, after that writers call adjust() so reads cost nothing.
+    Every `reconcile_interval` seconds it is reloaded, which corrects drift from writes made by other
+    processes or directly in the database.
+    """
+
+    def __init__(self, loader, reconcile_interval=300):
+        self.loader = loader
+        self.reconcile_interval = reconcile_interval
+        self._value = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._loaded_at < self.reconcile_interval:
+                return self._value
+        value = self.loader()
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+            return value
+
+    def adjust(self, delta):
+        with self._lock:
+            # Not loaded yet, the next get() reads the current value anyway
+            if self._value is not None:
+                self._value = max(self._value + delta, 0)
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+class SharedVersion:
+    """A data version stored in the database, shared by every process and re-read every `max_age` seconds.
+
+    loader() returns the stored (version, updated_at) and bumper() increments it and returns the new pair.
+    A newer version this process did not write itself means another process changed the data, on_change
+    is then called so the caches of this process can be dropped.
+    """
+
+    def __init__(self, loader, bumper, max_age=1.0, on_change=None):
+        self.loader = loader
+        self.bumper = bumper
+        self.max_age = max_age
+        self.on_change = on_change
+        self._value = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._loaded_at < self.max_age:
+                return self._value
+        value = self.loader()
+        with self._lock:
+            changed = self._value is not None and value[0] > self._value[0]
+            if self._value is None or value[0] >= self._value[0]:
+                self._value = value
+            self._loaded_at = time.monotonic()
+            value = self._value
+        if changed and self.on_change is not None:
+            self.on_change()
+        return value
+
+    def bump(self):
+        value = self.bumper()
+        with self._lock:
+            # More than one past the version held: another process bumped it in between, unseen by current()
+            changed = self._value is not None and value[0] > self._value[0] + 1
+            if self._value is None or value[0] > self._value[0]:
+                self._value = value
+                self._loaded_at = time.monotonic()
+        if changed and self.on_change is not None:
+            self.on_change()
+        return value
@@ -0,0 +1,276 @@
+# saved_searches.py
+
+import itertools
+import threading
+
+# Columns a saved search can filter on, loaded for every property that is matched
+MATCH_COLUMNS = ['id', 'area', 'price', 'street_name', 'street_number', 'complex_name', 'complex_number', 'agent',
+                 'bedrooms', 'bathrooms', 'garages', 'carports', 'floor_area', 'stand_area', 'swimming_pool',
+                 'garden_flat', 'study', 'ground_floor', 'pet_friendly', 'prop_type', 'prop_category']
+# Checkbox values read as true, same as boolean_filter_value() in app.py
+TRUE_LITERALS = ('t', 'true', 'y', 'yes', 'on', '1')
+NUMERIC_BUCKETS = ['1', '2', '3', '2+', '3+', '4+']
+# Searches are filed under the price buckets their range overlaps, R250k wide up to R10m
+PRICE_BUCKET_WIDTH = 250000
+PRICE_BUCKETS = 40
+# A price range spanning more buckets than this is a weak key, the search is filed under something else if it can
+NARROW_PRICE_BUCKETS = 8
+
+
+def number(value):
+    # The float of a filter value, raises ValueError the way the database rejects a non-numeric filter
+    return float(str(value).strip())
+
+
+def numeric_bucket_matches(value, bucket):
+    # Same buckets as apply_numeric_filter() in app.py
+    if value is None:
+        return False
+    if bucket in ('1', '2', '3'):
+        return value == int(bucket)
+    if bucket in ('2+', '3+', '4+'):
+        return value >= int(bucket[0])
+    return False
+
+
+def operation_matches(value, filter_value, operation):
+    # Same operations as apply_opertaions_filter() in app.py
+    if value is None:
+        return False
+    if operation == '=':
+        return value == filter_value
+    if operation == '>':
+        return value > filter_value
+    if operation == '<':
+        return value < filter_value
+    return False
+
+
+def contains(value, needle):
+    # ILIKE '%needle%'
+    return value is not None and needle.lower() in value.lower()
+
+
+def compile_filters(filters):
+    """A list of checks on a property row (a dict of MATCH_COLUMNS), all true when the row matches the filters.
+
+    Same semantics as apply_filters() in app.py, clause by clause. Raises ValueError for a filter value
+    the database would reject, such as a non-numeric price.
+    """
+    checks = []
+
+    if filters.get('area_filter'):
+        areas = [area.strip() for area in filters['area_filter'].split(',') if area.strip()]
+        if areas:
+            checks.append(lambda row: any(contains(row['area'], area) for area in areas))
+
+    if filters.get('min_price_filter'):
+        low = number(filters['min_price_filter'])
+        checks.append(lambda row: row['price'] is not None and row['price'] >= low)
+    if filters.get('max_price_filter'):
+        high = number(filters['max_price_filter'])
+        checks.append(lambda row: row['price'] is not None and row['price'] <= high)
+
+    for column, filter_name in [('street_name', 'street_name_filter'), ('agent', 'agent_filter')]:
+        if filters.get(filter_name):
+            checks.append(lambda row, column=column, needle=filters[filter_name]: contains(row[column], needle))
+    if filters.get('complex_name_filter'):
+        needle = filters['complex_name_filter']
+        checks.append(lambda row: contains(row['complex_name'], needle) or contains(row['street_name'], needle))
+    if filters.get('number_filter'):
+        checks.append(lambda row, value=filters['number_filter']:
+                      row['street_number'] == value or row['complex_number'] == value)
+
+    for column, filter_name in [('bedrooms', 'bedroom_filter'), ('bathrooms', 'bathroom_filter'),
+                                ('garages', 'garages_filter'), ('carports', 'carports_filter')]:
+        if filters.get(filter_name):
+            checks.append(lambda row, column=column, bucket=filters[filter_name]:
+                          numeric_bucket_matches(row[column], bucket))
+
+    for column, filter_name, select_name in [('floor_area', 'floor_area_filter', 'floor_area_select'),
+                                             ('stand_area', 'stand_area_filter', 'stand_area_select')]:
+        if filters.get(filter_name):
+            checks.append(lambda row, column=column, value=number(filters[filter_name]),
+                          operation=filters.get(select_name): operation_matches(row[column], value, operation))
+
+    for column in ['swimming_pool', 'garden_flat']:
+        if filters.get(f'{column}_filter'):
+            checks.append(lambda row, column=column: row[column] is True)
+    for column in ['study', 'ground_floor', 'pet_friendly']:
+        if filters.get(f'{column}_filter'):
+            flag = filters[f'{column}_filter'].strip().lower() in TRUE_LITERALS
+            checks.append(lambda row, column=column, flag=flag: row[column] is not None and row[column] == flag)
+
+    for column in ['prop_type', 'prop_category']:
+        value = filters.get(f'{column}_filter')
+        if value != 'Any':
+            # None compares as IS NULL, like the == in apply_filters()
+            checks.append(lambda row, column=column, value=value: row[column] == value)
+
+    return checks
+
+
+def price_bucket(price):
+    return min(max(int(price // PRICE_BUCKET_WIDTH), 0), PRICE_BUCKETS)
+
+
+def search_dimensions(filters):
+    """The indexed predicates of a filter set: {dimension: values}, any one of the values satisfies it.
+
+    A dimension is left out when the filters do not constrain it, or when its range is too wide to narrow
+    the candidates (a price range over more than NARROW_PRICE_BUCKETS buckets); the compiled checks still
+    enforce it.
+    """
+    dimensions = {}
+    areas = [area.strip().lower() for area in (filters.get('area_filter') or '').split(',') if area.strip()]
+    if areas:
+        dimensions['area'] = areas
+
+    low = number(filters['min_price_filter']) if filters.get('min_price_filter') else None
+    high = number(filters['max_price_filter']) if filters.get('max_price_filter') else None
+    if low is not None or high is not None:
+        first = price_bucket(low) if low is not None else 0
+        last = price_bucket(high) if high is not None else PRICE_BUCKETS
+        if last - first < NARROW_PRICE_BUCKETS:
+            dimensions['price'] = list(range(first, last + 1))
+
+    if filters.get('bedroom_filter') in NUMERIC_BUCKETS:
+        dimensions['bedrooms'] = [filters['bedroom_filter']]
+    for column in ['prop_type', 'prop_category']:
+        if filters.get(f'{column}_filter') != 'Any':
+            dimensions[column] = [filters.get(f'{column}_filter')]
+    return dimensions
+
+
+def property_dimensions(row, area_terms, area_lengths):
+    # The values of each dimension a property satisfies, e.g. every bedroom bucket it falls in
+    area = (row['area'] or '').lower()
+    # An area term matches when it is a substring of the area, so look up each substring of a filed length
+    terms = [area[start:start + length] for length in area_lengths for start in range(len(area) - length + 1)]
+    return {
+        'area': [term for term in set(terms) if term in area_terms],
+        'price': [price_bucket(row['price'])] if row['price'] is not None else [],
+        'bedrooms': [bucket for bucket in NUMERIC_BUCKETS if numeric_bucket_matches(row['bedrooms'], bucket)],
+        'prop_type': [row['prop_type']],
+        'prop_category': [row['prop_category']],
+    }
+
+
+def residual_filters(filters, dimensions):
+    # The filters a candidate still has to be checked against: a posting already guarantees the area, bedroom,
+    # type and category predicates, the price only up to its bucket
+    residual = dict(filters)
+    if 'area' in dimensions:
+        residual['area_filter'] = None
+    if 'bedrooms' in dimensions:
+        residual['bedroom_filter'] = None
+    for column in ['prop_type', 'prop_category']:
+        if column in dimensions:
+            residual[f'{column}_filter'] = 'Any'
+    return residual
+
+
+class SearchIndex:
+    """Inverted index from property attributes to the saved searches that could match them.
+
+    A search is filed under the combination of its indexed predicates (see search_dimensions()): the
+    signature says which dimensions it constrains, and it gets one posting per combination of their
+    values, e.g. ('area', 'price') -> ('bult', 6) and ('bult', 7) for Bult between R1.5m and R1.9m.
+    Matching a property builds, for each signature in use, the combinations its own values satisfy and
+    reads those postings, then checks the candidates against the rest of their filters only. The
+    candidates agree with the property on every indexed predicate, so the cost follows the number of
+    searches that plausibly match rather than the number of saved searches.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.signatures = {}
+        self.searches = {}
+        self.area_terms = set()
+        self.area_lengths = set()
+
+    def add(self, search_id, filters):
+        try:
+            dimensions = search_dimensions(filters)
+            checks = compile_filters(residual_filters(filters, dimensions))
+        except ValueError:
+            # Saved before its values were validated, it can never match
+            return
+        self.searches[search_id] = checks
+        signature = tuple(sorted(dimensions))
+        self.signatures[signature] = self.signatures.get(signature, 0) + 1
+        for key in itertools.product(*[dimensions[dimension] for dimension in signature]):
+            self.postings.setdefault((signature, key), []).append(search_id)
+        for term in dimensions.get('area', ()):
+            self.area_terms.add(term)
+            self.area_lengths.add(len(term))
+
+    def remove(self, search_id):
+        # Its postings stay behind until the next rebuild, match() skips ids that are gone
+        self.searches.pop(search_id, None)
+
+    def candidates(self, row):
+        values = property_dimensions(row, self.area_terms, self.area_lengths)
+        found = set()
+        for signature in self.signatures:
+            for key in itertools.product(*[values[dimension] for dimension in signature]):
+                found.update(self.postings.get((signature, key), ()))
+        return found
+
+    def match(self, row):
+        """Ids of the saved searches the property row matches."""
+        matched = []
+        for search_id in self.candidates(row):
+            checks = self.searches.get(search_id)
+            if checks is not None and all(check(row) for check in checks):
+                matched.append(search_id)
+        return matched
+
+    def __len__(self):
+        return len(self.searches)
+
+
+class SavedSearchIndex:
+    """SearchIndex of every saved search, built on first use.
+
+    Searches saved or deleted in this process are applied with add() and remove(), invalidate() drops
+    the index so the next get() builds it again, e.g. after another process changed the saved searches.
+    """
+
+    def __init__(self, loader):
+        # loader returns (search id, filters) pairs
+        self.loader = loader
+        self._index = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            generation = self._generation
+        index = SearchIndex()
+        for search_id, filters in self.loader():
+            index.add(search_id, filters)
+        with self._lock:
+            # A search saved while this one was building is missing from it, use it once and build again next time
+            if self._generation == generation:
+                self._index = index
+        return index
+
+    def add(self, search_id, filters):
+        with self._lock:
+            self._generation += 1
+            if self._index is not None:
+                self._index.add(search_id, filters)
+
+    def remove(self, search_id):
+        with self._lock:
+            self._generation += 1
+            if self._index is not None:
+                self._index.remove(search_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._index = None
@@ -0,0 +1,501 @@
+# search_engine.py
+
+import bisect
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from models import Property
+
+try:
+    import fcntl  # Cross-process lock for snapshot writers, not available on Windows
+except ImportError:
+    fcntl = None
+
+
+# Plain numeric columns, stored as float64 with NaN for NULL so comparisons leave NULLs out like SQL does
+NUMERIC_COLUMNS = ['price', 'bedrooms', 'bathrooms', 'garages', 'carports', 'floor_area', 'stand_area']
+# Boolean flags, stored as int8 with -1 for NULL
+FLAG_COLUMNS = ['swimming_pool', 'garden_flat', 'study', 'ground_floor', 'pet_friendly']
+# Dictionary-encoded text columns: int32 codes into a sorted dictionary, -1 for NULL.
+# The dictionary is sorted so code order is also string order when sorting by area.
+DICTIONARY_COLUMNS = ['area', 'agent', 'prop_type', 'prop_category',
+                      'street_name', 'complex_name', 'street_number', 'complex_number']
+# Sort keys with a precomputed permutation in the snapshot, the id needs none as rows are kept in id order
+SORT_KEYS = ['price', 'bedrooms', 'floor_area', 'stand_area', 'area']
+
+# Checkbox values read as true, same as boolean_filter_value() in app.py
+TRUE_LITERALS = ('t', 'true', 'y', 'yes', 'on', '1')
+
+# Property ids a delta may hold before refresh() merges it into a new snapshot. Every search filters the delta rows
+# as well, and writing the delta costs its size rather than the table's.
+MAX_DELTA_ROWS = 5000
+
+
+class _Columns:
+    def lowered(self, column):
+        # Case-folded dictionary for the ILIKE substring filters, built on first use
+        if column not in self._lowered:
+            self._lowered[column] = np.array([value.lower() for value in self.dictionaries[column]], dtype=str)
+        return self._lowered[column]
+
+
+class Snapshot(_Columns):
+    """One generation of the column arrays, memory-mapped read-only from the snapshot directory."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        self.version = meta['version']
+        self.rows = meta['rows']
+        self.dictionaries = meta['dictionaries']
+        self.non_null = meta['non_null']
+        self.columns = {}
+        for name in ['id'] + NUMERIC_COLUMNS + FLAG_COLUMNS + DICTIONARY_COLUMNS + [f'order_{key}' for key in SORT_KEYS]:
+            self.columns[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        self._lowered = {}
+
+
+class Delta(_Columns):
+    """The rows written since a snapshot was built, small enough to be read whole.
+
+    `replaced` holds every id added, updated or deleted since then: the snapshot's rows for them are left out of
+    searches and the current rows (none for a deleted id) are in the delta's own columns, encoded the same way.
+    """
+
+    def __init__(self, path, snapshot):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        self.number = meta['number']
+        self.rows = meta['rows']
+        self.dictionaries = meta['dictionaries']
+        # Collation ranks of the snapshot's and the delta's dictionary entries for the text sort keys, numbered
+        # together so rows of both can be ordered against each other. The extra -1 is looked up by NULL codes.
+        self.ranks = {key: {part: np.array(ranks + [-1], dtype=np.int32) for part, ranks in parts.items()}
+                      for key, parts in meta['ranks'].items()}
+        self.columns = {name: np.load(os.path.join(path, f'{name}.npy'))
+                        for name in ['id'] + NUMERIC_COLUMNS + FLAG_COLUMNS + DICTIONARY_COLUMNS}
+        self.replaced = np.load(os.path.join(path, 'replaced.npy'))
+        # Snapshot rows still current
+        self.keep = ~np.isin(snapshot.columns['id'], self.replaced)
+        self._lowered = {}
+
+
+class ColumnarSearchEngine:
+    """Evaluates the dashboard filters of apply_filters() as vectorized NumPy masks.
+
+    The Property table is held as column arrays written to a snapshot directory and memory-mapped,
+    so every server worker process shares one copy through the page cache. Writes to the table since
+    the snapshot was built are kept in a small delta next to it. A CURRENT file names the live
+    generation (the snapshot and its delta, if any), readers reload when it changes and writers
+    publish a new generation atomically.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._generation = None
+        self._lock = threading.Lock()
+
+    # <------------------------------------------------------------------ Snapshot files ------------------------------------------------------------------>
+
+    def _current_names(self):
+        # The live snapshot's directory name, followed by its delta's when there is one
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as current_file:
+                return current_file.read().split() or None
+        except FileNotFoundError:
+            return None
+
+    def generation(self):
+        # (snapshot, delta or None) currently live, None before the first build
+        names = self._current_names()
+        if names is None:
+            return None
+        generation = self._generation
+        if generation is None or generation[0] != names:
+            with self._lock:
+                if self._generation is None or self._generation[0] != names:
+                    # A new delta on the same snapshot keeps the mapped snapshot
+                    snapshot = self._generation[1] if self._generation is not None and \
+                        os.path.basename(self._generation[1].path) == names[0] else \
+                        Snapshot(os.path.join(self.directory, names[0]))
+                    delta = Delta(os.path.join(self.directory, names[1]), snapshot) if len(names) > 1 else None
+                    self._generation = (names, snapshot, delta)
+                generation = self._generation
+        return generation[1], generation[2]
+
+    def snapshot(self):
+        generation = self.generation()
+        return generation[0] if generation is not None else None
+
+    def _write_snapshot(self, db_session, columns, dictionaries, version):
+        name = f'snapshot-{version}'
+        path = os.path.join(self.directory, name)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        ids = columns['id']
+        non_null = {}
+        for key in SORT_KEYS:
+            values = columns[key]
+            if key in DICTIONARY_COLUMNS:
+                ranks = np.array(_collation_ranks(db_session, key, dictionaries[key]) + [-1], dtype=np.int32)
+                values = ranks[values]
+            order, non_null[key] = _sort_permutation(values, ids)
+            columns[f'order_{key}'] = order
+        for column_name, values in columns.items():
+            np.save(os.path.join(tmp_path, f'{column_name}.npy'), values)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as meta_file:
+            json.dump({'version': version, 'rows': len(ids), 'dictionaries': dictionaries,
+                       'non_null': non_null}, meta_file)
+        os.replace(tmp_path, path)
+        self._publish([name])
+
+    def _write_delta(self, db_session, snapshot, columns, dictionaries, replaced, number):
+        name = f'delta-{snapshot.version}-{number}'
+        path = os.path.join(self.directory, name)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        ranks = {}
+        for key in SORT_KEYS:
+            if key in DICTIONARY_COLUMNS:
+                ranks[key] = {part: _collation_ranks(db_session, key, part_dictionaries[key])
+                              for part, part_dictionaries in (('snapshot', snapshot.dictionaries),
+                                                              ('delta', dictionaries))}
+        for column_name, values in columns.items():
+            np.save(os.path.join(tmp_path, f'{column_name}.npy'), values)
+        np.save(os.path.join(tmp_path, 'replaced.npy'), replaced)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as meta_file:
+            json.dump({'number': number, 'rows': len(columns['id']), 'dictionaries': dictionaries,
+                       'ranks': ranks}, meta_file)
+        os.replace(tmp_path, path)
+        self._publish([os.path.basename(snapshot.path), name])
+
+    def _publish(self, names):
+        # Make names the live generation, then drop all but it and the previous one (a worker may still be reading it)
+        previous = self._current_names() or []
+        current_tmp = os.path.join(self.directory, 'CURRENT.tmp')
+        with open(current_tmp, 'w') as current_file:
+            current_file.write(' '.join(names))
+        os.replace(current_tmp, os.path.join(self.directory, 'CURRENT'))
+        for entry in os.listdir(self.directory):
+            if entry.startswith(('snapshot-', 'delta-')) and entry not in names and entry not in previous:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def _next_version(self):
+        # One past the highest snapshot on disk, CURRENT may be gone (invalidate()) while its snapshot is still there
+        versions = [int(entry[len('snapshot-'):]) for entry in os.listdir(self.directory)
+                    if entry.startswith('snapshot-') and entry[len('snapshot-'):].isdigit()]
+        return max(versions, default=0) + 1
+
+    def invalidate(self):
+        # Drop the live generation, the next search rebuilds the snapshot from the database
+        try:
+            os.remove(os.path.join(self.directory, 'CURRENT'))
+        except FileNotFoundError:
+            pass
+
+    def _writer_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return _FileLock(os.path.join(self.directory, 'LOCK'))
+
+    # <------------------------------------------------------------------ Building ------------------------------------------------------------------>
+
+    def rebuild(self, db_session, if_missing=False):
+        # Full load of the properties table into a new snapshot generation. With if_missing nothing is done when a
+        # snapshot is live by the time the lock is held, another process built it while this one waited.
+        with self._writer_lock():
+            if if_missing and self.snapshot() is not None:
+                return
+            rows = _load_rows(db_session)
+            columns, dictionaries = _encode(rows)
+            self._write_snapshot(db_session, columns, dictionaries, self._next_version())
+
+    def refresh(self, db_session, property_ids):
+        # Incremental refresh after property writes: only the given ids are read from the database, and written
+        # to the delta with the rows of the earlier delta. The snapshot itself is only rewritten (from the arrays,
+        # without reading the table) once the delta reaches MAX_DELTA_ROWS ids.
+        with self._writer_lock():
+            generation = self.generation()
+            if generation is None:
+                rows = _load_rows(db_session)
+                columns, dictionaries = _encode(rows)
+                self._write_snapshot(db_session, columns, dictionaries, self._next_version())
+                return
+
+            snapshot, delta = generation
+            property_ids = np.unique(np.asarray(list(property_ids), dtype=np.int64))
+            columns, dictionaries = _encode(_load_rows(db_session, property_ids.tolist()))
+            replaced = property_ids
+            if delta is not None:
+                carried = ~np.isin(delta.columns['id'], property_ids)
+                columns, dictionaries = _merge(delta.columns, delta.dictionaries, carried, columns, dictionaries)
+                replaced = np.union1d(delta.replaced, property_ids)
+
+            if len(replaced) >= MAX_DELTA_ROWS:
+                keep = ~np.isin(snapshot.columns['id'], replaced)
+                columns, dictionaries = _merge(snapshot.columns, snapshot.dictionaries, keep, columns, dictionaries)
+                self._write_snapshot(db_session, columns, dictionaries, self._next_version())
+            else:
+                self._write_delta(db_session, snapshot, columns, dictionaries, replaced,
+                                  delta.number + 1 if delta is not None else 1)
+
+    # <------------------------------------------------------------------ Searching ------------------------------------------------------------------>
+
+    def search(self, filters, sort='id', descending=False, page=1, per_page=20):
+        # Returns the property ids on the requested page, in dashboard order, and the total number of matches
+        generation = self.generation()
+        if generation is None:
+            raise LookupError('No search snapshot has been built yet.')
+        snapshot, delta = generation
+
+        mask = self.filter_mask(snapshot, filters)
+        start, stop = (page - 1) * per_page, page * per_page
+        if delta is None:
+            positions = self._ordered(snapshot, mask, sort, descending)
+            return snapshot.columns['id'][positions[start:stop]].tolist(), int(np.count_nonzero(mask))
+
+        mask &= delta.keep
+        delta_mask = self.filter_mask(delta, filters)
+        total = int(np.count_nonzero(mask)) + int(np.count_nonzero(delta_mask))
+
+        # The page is within the first `stop` snapshot rows in order and the matching delta rows, ordered together
+        # by the same (NULLs last, value, id) key as SQL
+        positions = self._ordered(snapshot, mask, sort, descending)[:stop]
+        delta_positions = np.flatnonzero(delta_mask)
+        ids = np.concatenate([snapshot.columns['id'][positions], delta.columns['id'][delta_positions]])
+        sign = -1 if descending else 1
+        if sort == 'id':
+            order = np.argsort(sign * ids, kind='stable')
+        else:
+            ranks = delta.ranks.get(sort, {})
+            values = np.concatenate([_sort_values(snapshot, positions, sort, ranks.get('snapshot')),
+                                     _sort_values(delta, delta_positions, sort, ranks.get('delta'))])
+            nulls = np.isnan(values)
+            order = np.lexsort((sign * ids, sign * np.where(nulls, 0, values), nulls))
+        return ids[order[start:stop]].tolist(), total
+
+    def _ordered(self, snapshot, mask, sort, descending):
+        # Positions of the matching snapshot rows in dashboard order
+        if sort == 'id':
+            positions = np.flatnonzero(mask)
+            return positions[::-1] if descending else positions
+        order = snapshot.columns[f'order_{sort}']
+        non_null = snapshot.non_null[sort]
+        ordered_values, ordered_nulls = order[:non_null], order[non_null:]
+        values = ordered_values[mask[ordered_values]]
+        nulls = ordered_nulls[mask[ordered_nulls]]
+        if descending:
+            # NULLs stay last, each part is reversed so the id tie-break is descending as in SQL
+            values, nulls = values[::-1], nulls[::-1]
+        return np.concatenate([values, nulls])
+
+    def filter_mask(self, snapshot, filters):
+        # Same semantics as apply_filters() in app.py, clause by clause
+        columns = snapshot.columns
+        mask = np.ones(snapshot.rows, dtype=bool)
+
+        if filters.get('area_filter'):
+            areas = [area.strip() for area in filters['area_filter'].split(',') if area.strip()]
+            if areas:
+                mask &= self._contains_any(snapshot, 'area', areas)
+
+        if filters.get('min_price_filter'):
+            mask &= columns['price'] >= float(filters['min_price_filter'])
+        if filters.get('max_price_filter'):
+            mask &= columns['price'] <= float(filters['max_price_filter'])
+
+        if filters.get('street_name_filter'):
+            mask &= self._contains_any(snapshot, 'street_name', [filters['street_name_filter']])
+        if filters.get('agent_filter'):
+            mask &= self._contains_any(snapshot, 'agent', [filters['agent_filter']])
+        if filters.get('complex_name_filter'):
+            needle = [filters['complex_name_filter']]
+            mask &= self._contains_any(snapshot, 'complex_name', needle) | \
+                self._contains_any(snapshot, 'street_name', needle)
+
+        if filters.get('number_filter'):
+            mask &= self._equals(snapshot, 'street_number', filters['number_filter']) | \
+                self._equals(snapshot, 'complex_number', filters['number_filter'])
+
+        for column, filter_name in [('bedrooms', 'bedroom_filter'), ('bathrooms', 'bathroom_filter'),
+                                    ('garages', 'garages_filter'), ('carports', 'carports_filter')]:
+            if filters.get(filter_name):
+                clause = _numeric_mask(columns[column], filters[filter_name])
+                # An unknown bucket makes apply_filters() AND a NULL clause, which matches nothing
+                mask &= clause if clause is not None else False
+
+        for column, filter_name, select_name in [('floor_area', 'floor_area_filter', 'floor_area_select'),
+                                                 ('stand_area', 'stand_area_filter', 'stand_area_select')]:
+            if filters.get(filter_name):
+                clause = _operation_mask(columns[column], float(filters[filter_name]), filters.get(select_name))
+                mask &= clause if clause is not None else False
+
+        if filters.get('swimming_pool_filter'):
+            mask &= columns['swimming_pool'] == 1
+        if filters.get('garden_flat_filter'):
+            mask &= columns['garden_flat'] == 1
+        for column in ['study', 'ground_floor', 'pet_friendly']:
+            if filters.get(f'{column}_filter'):
+                flag = 1 if filters[f'{column}_filter'].strip().lower() in TRUE_LITERALS else 0
+                mask &= columns[column] == flag
+
+        for column in ['prop_type', 'prop_category']:
+            value = filters.get(f'{column}_filter')
+            if value != 'Any':
+                mask &= self._equals(snapshot, column, value)
+
+        return mask
+
+    def _contains_any(self, snapshot, column, needles):
+        # ILIKE '%needle%' for any of the needles, evaluated once per dictionary entry then gathered by code
+        lowered = snapshot.lowered(column)
+        hits = np.zeros(len(lowered) + 1, dtype=bool)  # The extra slot is indexed by the NULL code (-1)
+        for needle in needles:
+            if len(lowered):
+                hits[:-1] |= np.char.find(lowered, needle.lower()) >= 0
+        return hits[snapshot.columns[column]]
+
+    def _equals(self, snapshot, column, value):
+        codes = snapshot.columns[column]
+        if value is None:
+            return codes == -1
+        dictionary = snapshot.dictionaries[column]
+        index = bisect.bisect_left(dictionary, value)
+        if index < len(dictionary) and dictionary[index] == value:
+            return codes == index
+        return np.zeros(snapshot.rows, dtype=bool)
+
+
+# <------------------------------------------------------------------ Helpers ------------------------------------------------------------------>
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _load_rows(db_session, property_ids=None):
+    query = db_session.query(
+        Property.id,
+        *[getattr(Property, name) for name in NUMERIC_COLUMNS + FLAG_COLUMNS + DICTIONARY_COLUMNS]
+    ).order_by(Property.id)
+    if property_ids is not None:
+        query = query.filter(Property.id.in_(property_ids))
+    return query.yield_per(10000)
+
+
+def _encode(rows):
+    names = ['id'] + NUMERIC_COLUMNS + FLAG_COLUMNS + DICTIONARY_COLUMNS
+    raw = {name: [] for name in names}
+    for row in rows:
+        for name, value in zip(names, row):
+            raw[name].append(value)
+
+    columns = {'id': np.array(raw['id'], dtype=np.int64)}
+    for name in NUMERIC_COLUMNS:
+        columns[name] = np.array([np.nan if value is None else float(value) for value in raw[name]],
+                                 dtype=np.float64)
+    for name in FLAG_COLUMNS:
+        columns[name] = np.array([-1 if value is None else int(value) for value in raw[name]], dtype=np.int8)
+
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS:
+        dictionary = sorted({value for value in raw[name] if value is not None})
+        lookup = {value: code for code, value in enumerate(dictionary)}
+        columns[name] = np.array([-1 if value is None else lookup[value] for value in raw[name]], dtype=np.int32)
+        dictionaries[name] = dictionary
+    return columns, dictionaries
+
+
+def _merge(columns, dictionaries, keep, new_columns, new_dictionaries):
+    # The kept rows of columns together with new_columns, on merged (still sorted) dictionaries and in id order
+    merged_columns = {}
+    merged_dictionaries = {}
+    for name in ['id'] + NUMERIC_COLUMNS + FLAG_COLUMNS:
+        merged_columns[name] = np.concatenate([columns[name][keep], new_columns[name]])
+    for name in DICTIONARY_COLUMNS:
+        merged = sorted(set(dictionaries[name]) | set(new_dictionaries[name]))
+        old_codes = _remap_codes(columns[name][keep], dictionaries[name], merged)
+        added_codes = _remap_codes(new_columns[name], new_dictionaries[name], merged)
+        merged_columns[name] = np.concatenate([old_codes, added_codes])
+        merged_dictionaries[name] = merged
+
+    # Keep rows in id order, the id sort and the sort tie-breaks rely on it
+    order = np.argsort(merged_columns['id'], kind='stable')
+    return {name: values[order] for name, values in merged_columns.items()}, merged_dictionaries
+
+
+def _collation_ranks(db_session, key, dictionary):
+    # Text keys sort in the database collation, not Python code point order, so the rank of each dictionary entry
+    # comes from an ORDER BY on the (indexed) column itself
+    column = getattr(Property, key)
+    collated = [value for (value,) in db_session.query(column).filter(column.isnot(None)).distinct().order_by(column)]
+    rank = {value: position for position, value in enumerate(collated)}
+    return [rank.get(value, len(collated)) for value in dictionary]
+
+
+def _sort_values(columns, positions, key, ranks):
+    # The sort key of the rows at positions as float64 with NaN for NULL, text keys by their collation rank
+    values = columns.columns[key][positions]
+    if ranks is None:
+        return np.asarray(values, dtype=np.float64)
+    values = ranks[values]
+    return np.where(values == -1, np.nan, values.astype(np.float64))
+
+
+def _remap_codes(codes, dictionary, merged):
+    if not len(dictionary):
+        return np.asarray(codes, dtype=np.int32).copy()
+    mapping = np.append(np.searchsorted(merged, dictionary), -1).astype(np.int32)
+    return mapping[codes]
+
+
+def _sort_permutation(values, ids):
+    # Row positions ordered by (value, id) with NULLs last, and how many rows have a value
+    if values.dtype == np.float64:
+        nulls = np.isnan(values)
+    else:
+        nulls = values == -1
+    order = np.lexsort((ids, values, nulls)).astype(np.int32)
+    return order, int(np.count_nonzero(~nulls))
+
+
+def _numeric_mask(values, filter_value):
+    # Same buckets as apply_numeric_filter() in app.py
+    if filter_value in ('1', '2', '3'):
+        return values == int(filter_value)
+    if filter_value in ('2+', '3+', '4+'):
+        return values >= int(filter_value[0])
+    return None
+
+
+def _operation_mask(values, filter_value, operation):
+    # Same operations as apply_opertaions_filter() in app.py
+    if operation == '=':
+        return values == filter_value
+    elif operation == '>':
+        return values > filter_value
+    elif operation == '<':
+        return values < filter_value
+    return None
+
@@ -0,0 +1,93 @@
+# server_worker.py
+# Imported by gunicorn only (see gunicorn.conf.py), gunicorn does not run on Windows
+
+import selectors
+import time
+from concurrent import futures
+from functools import partial
+
+from gunicorn.workers.gthread import ThreadWorker
+
+# A client that connected sends its request at once, a connection still silent after this is an idle preconnect
+DRAIN_SECONDS = 1.0
+
+
+class DrainingThreadWorker(ThreadWorker):
+    """gunicorn's gthread worker, except that a stopping worker still answers the connections it accepted.
+
+    The stock worker waits in its poller for an accepted connection to become readable before handing it to a
+    thread, and drops the ones still waiting when it stops (recycled after max_requests, or a reload): their
+    clients get a connection reset. This one stops accepting, then keeps polling for up to DRAIN_SECONDS until
+    every accepted connection has sent its request and been handed to a thread. Connections still reach a
+    thread only once readable, so idle or slow clients never hold one.
+
+    run() is gunicorn 21.2's with drain() called between the main loop and the shutdown.
+    """
+
+    def run(self):
+        # init listeners, add them to the event loop
+        for sock in self.sockets:
+            sock.setblocking(False)
+            # a race condition during graceful shutdown may make the listener
+            # name unavailable in the request handler so capture it once here
+            server = sock.getsockname()
+            acceptor = partial(self.accept, server)
+            self.poller.register(sock, selectors.EVENT_READ, acceptor)
+
+        while self.alive:
+            # notify the arbiter we are alive
+            self.notify()
+
+            # can we accept more connections?
+            if self.nr_conns < self.worker_connections:
+                # wait for an event
+                events = self.poller.select(1.0)
+                for key, _ in events:
+                    callback = key.data
+                    callback(key.fileobj)
+
+                # check (but do not wait) for finished requests
+                result = futures.wait(self.futures, timeout=0,
+                                      return_when=futures.FIRST_COMPLETED)
+            else:
+                # wait for a request to finish
+                result = futures.wait(self.futures, timeout=1.0,
+                                      return_when=futures.FIRST_COMPLETED)
+
+            # clean up finished requests
+            for fut in result.done:
+                self.futures.remove(fut)
+
+            if not self.is_parent_alive():
+                break
+
+            # handle keepalive timeouts
+            self.murder_keepalived()
+
+        self.drain()
+
+        self.tpool.shutdown(False)
+        self.poller.close()
+
+        for s in self.sockets:
+            s.close()
+
+        futures.wait(self.futures, timeout=self.cfg.graceful_timeout)
+
+    def drain(self):
+        # The listening sockets stay open in the master and the other workers, this one only stops accepting
+        for sock in self.sockets:
+            with self._lock:
+                self.poller.unregister(sock)
+        deadline = time.monotonic() + DRAIN_SECONDS
+        while time.monotonic() < deadline and self.waiting_connections():
+            self.notify()
+            for key, _ in self.poller.select(0.1):
+                key.data(key.fileobj)
+
+    def waiting_connections(self):
+        # Accepted connections whose request has not arrived yet; idle keep-alive connections are not waited for
+        with self._lock:
+            keys = list(self.poller.get_map().values())
+        return sum(1 for key in keys if not key.data.args[0].initialized)
+
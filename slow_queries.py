@@ -0,0 +1,178 @@
+# slow_queries.py
+
+import collections
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# Bound parameters longer than this are cut in the log
+MAX_PARAMETER_LENGTH = 200
+# Row locking clause of a SELECT: FOR UPDATE, FOR NO KEY UPDATE, FOR SHARE, FOR KEY SHARE
+LOCKING_CLAUSE = re.compile(r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+
+
+class SlowQueryLog:
+    """Ring buffer of statements that ran longer than `threshold_ms`, with their query plans.
+
+    Each entry keeps the SQL, its bound parameters, the endpoint that ran it and the dashboard filters
+    the request had applied (see note_filters()). The plan of a slow SELECT is taken afterwards on a
+    single background thread with EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL (EXPLAIN QUERY PLAN on
+    SQLite), at most once per statement text every `explain_interval` seconds, since ANALYZE runs the
+    query again. A SELECT that locks rows only gets a plain EXPLAIN: run again it would take the locks
+    and wait behind, or block, the transactions holding them.
+    """
+
+    def __init__(self, threshold_ms=500, size=100, explain=True, explain_interval=600, explain_timeout_ms=30000):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.explain_timeout_ms = explain_timeout_ms
+        self.entries = collections.deque(maxlen=size)
+        self.recorded = 0
+        self.engine = None
+        self._explained = {}
+        self._executor = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+
+    def attach(self, engine):
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self._start_statement)
+        event.listen(engine, 'after_cursor_execute', self._finish_statement)
+        event.listen(engine, 'handle_error', self._statement_failed)
+
+    def note_filters(self, filters):
+        # The filters of the search this thread is running, shown next to its slow statements
+        self._local.filters = {key: value for key, value in filters.items() if value not in (None, '', 'Any')}
+
+    def _start_request(self):
+        self._local.filters = None
+
+    def _start_statement(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def _statement_failed(self, context):
+        # execution_context rather than cursor, SQLAlchemy 2.0 leaves ExceptionContext.cursor unset
+        if context.execution_context is not None and context.connection is not None:
+            starts = context.connection.info.get('slow_query_start')
+            if starts:
+                starts.pop()
+
+    def _finish_statement(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('slow_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if elapsed < self.threshold or getattr(self._local, 'explaining', False):
+            return
+
+        entry = {
+            'time': datetime.now(),
+            'duration_ms': round(elapsed * 1000, 1),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'method': request.method if has_request_context() else None,
+            'filters': getattr(self._local, 'filters', None) if has_request_context() else None,
+            'statement': statement,
+            'parameters': format_parameters(parameters, executemany),
+            'plan': None,
+            'seq_scans': [],
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.recorded += 1
+        if self.explain and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            self._queue_explain(entry, statement, parameters)
+
+    def _queue_explain(self, entry, statement, parameters):
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(statement)
+            if last is not None and now - last < self.explain_interval:
+                entry['plan'] = f'Explained less than {self.explain_interval} seconds ago, see an earlier entry.'
+                return
+            self._explained[statement] = now
+            if len(self._explained) > 1000:
+                self._explained = {text: at for text, at in self._explained.items()
+                                   if now - at < self.explain_interval}
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        entry['plan'] = 'Explaining...'
+        self._executor.submit(self._explain, entry, statement, parameters)
+
+    def _explain(self, entry, statement, parameters):
+        self._local.explaining = True
+        try:
+            with self.engine.connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    # ANALYZE runs the statement again, never let it hold a connection for long
+                    conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}')
+                    if locks_rows(statement):
+                        rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters)
+                        plan = 'Estimated plan only, the statement locks rows.\n' + '\n'.join(row[0] for row in rows)
+                    else:
+                        rows = conn.exec_driver_sql('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+                        plan = '\n'.join(row[0] for row in rows)
+                elif conn.dialect.name == 'sqlite':
+                    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+                    plan = '\n'.join(str(row[-1]) for row in rows)
+                else:
+                    plan = f'No plan capture for {conn.dialect.name}.'
+                conn.rollback()
+        except Exception as e:
+            plan = f'EXPLAIN failed: {e}'
+        finally:
+            self._local.explaining = False
+        entry['seq_scans'] = sequential_scans(plan)
+        entry['plan'] = plan
+
+    def snapshot(self):
+        with self._lock:
+            return list(reversed(self.entries))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._explained.clear()
+
+
+def locks_rows(statement):
+    return LOCKING_CLAUSE.search(statement) is not None
+
+
+def format_parameters(parameters, executemany):
+    if executemany:
+        return f'{len(parameters)} parameter sets'
+    if isinstance(parameters, dict):
+        items = parameters.items()
+    else:
+        items = enumerate(parameters or ())
+    return {str(key): shorten(value) for key, value in items}
+
+
+def shorten(value):
+    text = repr(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + '...'
+
+
+def sequential_scans(plan):
+    # Tables read front to back: 'Seq Scan on property' in PostgreSQL, 'SCAN property' in SQLite
+    tables = []
+    for line in plan.splitlines():
+        line = line.strip().lstrip('->').strip()
+        if line.startswith('Seq Scan on '):
+            table = line[len('Seq Scan on '):].split()[0]
+        elif line.startswith('SCAN ') and ' USING ' not in line:
+            table = line[len('SCAN '):].split()[0]
+        else:
+            continue
+        if table not in tables:
+            tables.append(table)
+    return tables
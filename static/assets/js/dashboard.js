@@ -1,4 +1,11 @@
 var total_pages;
+// "offset" or "cursor", set by dashboard.html from the server configuration
+var paginationMode = window.paginationMode || "offset";
+// Server-side ordering of the whole result set, set by dashboard.html and changed by the sortable headers
+var sortColumn = window.sortColumn || "id";
+var sortOrder = window.sortOrder || "asc";
+// Rows per page, set by dashboard.html from ?per_page=
+var perPage = window.perPage || 20;
 
 $(document).ready(function () {
   // Initialize an array to store the selected property IDs
@@ -25,6 +32,22 @@ $(document).ready(function () {
     $("#toggleFilters, #toggleFilters1").text(buttonText);
   });
 
+  // Event handler for downloading every property matching the current filters
+  $(".download-link").on("click", function (event) {
+    event.preventDefault();
+
+    // Multi-select filters (areas) are sent comma separated, the same way the filter form posts them
+    var params = {};
+    $.each($("#filter-form").serializeArray(), function (_, field) {
+      params[field.name] = params[field.name] ? params[field.name] + "," + field.value : field.value;
+    });
+    params.format = $(this).data("format");
+    params.sort = sortColumn;
+    params.order = sortOrder;
+
+    window.location.href = "/dashboard/export?" + $.param(params);
+  });
+
   // Event handler for sending selected properties via email
   $(".send-email-link").on("click", function (event) {
     event.preventDefault(); // Prevent the default anchor behavior
@@ -145,6 +168,7 @@ $(document).ready(function () {
   $(document).on("click", ".pagination-link", function (e) {
     e.preventDefault();
     var page = $(this).data("page");
+    var cursor = $(this).data("cursor"); // Only set in cursor (keyset) pagination mode
     var formData = new FormData(document.getElementById("filter-form"));
     // Parse the values
     var minPriceValue = parseFloat(
@@ -168,7 +192,7 @@ $(document).ready(function () {
       formData.set("max_price_filter", ""); // Set it to blank if it's not a valid number
     }
 
-    handlePaginationClick(page, formData); // Pass the updated formData
+    handlePaginationClick(page, formData, cursor); // Pass the updated formData
   });
 
   // Event listener for the "Filter" button click
@@ -177,12 +201,125 @@ $(document).ready(function () {
     handleFormSubmit();
   });
 
+  // Save the current filters, new listings matching them are emailed to the user
+  $("#save-search").on("click", function (e) {
+    e.preventDefault();
+    var name = prompt("Name this search:");
+    if (!name) {
+      return;
+    }
+    var formData = new FormData(document.getElementById("filter-form"));
+    formData.append("name", name);
+    $.ajax({
+      type: "POST",
+      url: "/saved_searches",
+      data: formData,
+      contentType: false,
+      processData: false,
+      dataType: "json",
+      success: function (data) {
+        alert("Saved '" + data.name + "'. You will get an email when new listings match it.");
+      },
+      error: function (error) {
+        alert((error.responseJSON && error.responseJSON.error) || "The search could not be saved.");
+      },
+    });
+  });
+
+  // Set a field on, or delete, the selected properties or every property matching the filters in one batch.
+  // The server counts the scope first (dry run) and the admin confirms that count, a batch whose scope has
+  // changed in the meantime is refused and nothing is written.
+  $(".batch-action").on("click", function (e) {
+    e.preventDefault();
+    var action = $(this).data("action");
+    var scope = $("#batch-scope").val();
+    var formData = scope === "filters" ? new FormData(document.getElementById("filter-form")) : new FormData();
+    if (scope === "filters") {
+      // Same values handleFormSubmit() searches with: unformatted prices, areas comma separated
+      formData.set("min_price_filter", minPriceAutoNumeric.getNumber() || "");
+      formData.set("max_price_filter", maxPriceAutoNumeric.getNumber() || "");
+      formData.set("area_filter", $('[name="area_filter"]').val() || "");
+    } else {
+      if (selectedProperties.length === 0) {
+        alert("No properties selected.");
+        return;
+      }
+      formData.append("ids", selectedProperties.join(","));
+    }
+    formData.append("scope", scope);
+    formData.append("action", action);
+    if (action === "update") {
+      formData.append("set_" + $("#batch-field").val(), $("#batch-value").val());
+    }
+
+    sendBatch(formData, true, function (preview) {
+      var change = action === "delete" ? "Delete" : "Set " + $("#batch-field option:selected").text() + " on";
+      if (!preview.matched) {
+        alert("No properties match.");
+        return;
+      }
+      if (!confirm(change + " " + numberWithCommas(preview.matched) + " properties?")) {
+        return;
+      }
+      formData.append("expected", preview.matched);
+      sendBatch(formData, false, function (data) {
+        alert((data.action === "delete" ? "Deleted " : "Updated ") + numberWithCommas(data.affected) + " properties.");
+        selectedProperties = [];
+        $("#select_all_properties").prop("checked", false);
+        handleFormSubmit();
+      });
+    });
+  });
+
+  function sendBatch(formData, dryRun, success) {
+    formData.set("dry_run", dryRun ? "true" : "false");
+    $("#loading-overlay").show();
+    $.ajax({
+      type: "POST",
+      url: "/admin/properties/batch",
+      data: formData,
+      contentType: false,
+      processData: false,
+      dataType: "json",
+      success: function (data) {
+        $("#loading-overlay").hide();
+        success(data);
+      },
+      error: function (error) {
+        $("#loading-overlay").hide();
+        alert((error.responseJSON && error.responseJSON.error) || "The batch failed. Please contact an administrator.");
+      },
+    });
+  }
+
   // Event listener for the "Reset Filters" button click
   $("#reset-filters, #reset-filters-hidden").on("click", function (event) {
     event.preventDefault(); // Prevent the default behavior
     resetFilters();
   });
 
+  // Event listener for the server-sorted column headers
+  $(".sort-header[data-server-sort]").on("click", function (e) {
+    e.preventDefault();
+    var column = $(this).data("column");
+    // Toggle the direction when the same column is clicked again
+    sortOrder = column === sortColumn && sortOrder === "asc" ? "desc" : "asc";
+    sortColumn = column;
+
+    $(".sort-header").find(".sort-icon").html("");
+    $(this)
+      .find(".sort-icon")
+      .html(
+        '<i class="mdi mdi-sort-' +
+        (sortOrder === "asc" ? "ascending" : "descending") +
+        '"></i>'
+      );
+
+    // A new ordering always starts again from the first page
+    var formData = new FormData(document.getElementById("filter-form"));
+    handlePaginationClick(1, formData);
+  });
+
   $("#expand-toggle-btn").click(function () {
     $(".expandable-column").toggle();
     $("#properties-table").sortTable();
@@ -243,9 +380,17 @@ $(document).ready(function () {
   });
 });
 
-function handlePaginationClick(page, formData) {
+function handlePaginationClick(page, formData, cursor) {
   $("#loading-overlay").show();
-  var url = "/dashboard?page=" + page;
+  var url =
+    "/dashboard?page=" + page +
+    "&pagination=" + paginationMode +
+    "&sort=" + sortColumn +
+    "&order=" + sortOrder +
+    "&per_page=" + perPage;
+  if (cursor) {
+    url += "&cursor=" + encodeURIComponent(cursor);
+  }
 
   // Include filter criteria in the URL
   var filters = $("#filter-form").serialize(); // Serialize the filter form
@@ -273,6 +418,9 @@ function handlePaginationClick(page, formData) {
 
       // Clear the jump-to input field on success:
       $("#jump-to-page").val("");
+
+      updateFacets(formData);
+      updateAreaStatistics(formData);
     },
     error: function (error) {
       console.error("Error fetching properties:", error);
@@ -282,6 +430,54 @@ function handlePaginationClick(page, formData) {
   });
 }
 
+// Refresh the counts next to the filter options for the properties matching the current filters
+function updateFacets(formData) {
+  $.ajax({
+    type: "POST",
+    url: "/dashboard/facets",
+    data: formData,
+    contentType: false,
+    processData: false,
+    dataType: "json",
+    success: function (data) {
+      var facets = data.filtered;
+      $("option[data-facet]").each(function () {
+        var facet = $(this).data("facet");
+        var value = $(this).val();
+        var count = facet === "bedroom_filter"
+          ? data.bedroom_counts.filtered[value]
+          : (facets[facet] || {})[value];
+        $(this).text($(this).data("label") + " (" + (count || 0) + ")");
+      });
+      $(".facet-count").each(function () {
+        var count = (facets[$(this).data("facet")] || {})[$(this).data("value")] || 0;
+        $(this).text($(this).closest("label").length ? "(" + count + ")" : count);
+      });
+    },
+    error: function (error) {
+      console.error("Error fetching filter counts:", error);
+    },
+  });
+}
+
+// Refresh the market statistics panel for the areas, type and category of the current filters
+function updateAreaStatistics(formData) {
+  $.ajax({
+    type: "POST",
+    url: "/dashboard/area_statistics",
+    data: formData,
+    contentType: false,
+    processData: false,
+    dataType: "json",
+    success: function (data) {
+      $("#area-statistics").html(data.html);
+    },
+    error: function (error) {
+      console.error("Error fetching market statistics:", error);
+    },
+  });
+}
+
 // Function to update properties and pagination
 function updateProperties(data) {
   // Update properties in #properties_table tbody
@@ -515,17 +711,20 @@ function updatePaginationLinks() {
   var queryString = params.join("&");
 
   var paginationLinks = $(".dynamic-pagination-link");
-  if (paginationLinks.length === 1) {
-    var page = paginationLinks.data("page");
-    var newHref = "/dashboard?page=" + page + "&" + queryString;
-    paginationLinks.attr("href", newHref);
-  } else {
-    paginationLinks.each(function () {
-      var page = $(this).data("page");
-      var newHref = "/dashboard?page=" + page + "&" + queryString;
-      $(this).attr("href", newHref);
-    });
-  }
+  paginationLinks.each(function () {
+    var page = $(this).data("page");
+    var cursor = $(this).data("cursor");
+    var newHref =
+      "/dashboard?page=" + page +
+      "&pagination=" + paginationMode +
+      "&sort=" + sortColumn +
+      "&order=" + sortOrder +
+      "&per_page=" + perPage;
+    if (cursor) {
+      newHref += "&cursor=" + encodeURIComponent(cursor);
+    }
+    $(this).attr("href", newHref + "&" + queryString);
+  });
 }
 
 function resetFilters() {
@@ -1,4 +1,8 @@
 function updatePendingUsersBadge() {
+    // The badge is only rendered for admins, nobody else needs the count
+    if (!$('#newUsersBadgeContainer').length) {
+        return;
+    }
     $.get('/get_pending_users_count', function(data) {
         if (data.pending_users > 0) {
             $('#newUsersBadgeContainer').find('.badge').text(data.pending_users).show();
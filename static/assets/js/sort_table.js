@@ -5,7 +5,8 @@ $(document).ready(function() {
     };
     const sortDirection = {};
 
-    $('.sort-header').on('click', function() {
+    // Columns marked data-server-sort are ordered by the server across all pages (see dashboard.js)
+    $('.sort-header').not('[data-server-sort]').on('click', function() {
         const column = $(this).data('column');
         const currentOrder = $(this).data('order') || 'asc'; 
 
@@ -0,0 +1,196 @@
+# static_assets.py
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    # Optional, without it only gzip copies are built
+    brotli = None
+
+# Sources the browser never loads, left out of the build
+SKIP_EXTENSIONS = {'.scss', '.md'}
+COMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.map', '.html', '.txt', '.xml', '.ttf', '.eot', '.ico'}
+# Files smaller than this gain nothing from compression, the headers outweigh the saving
+MIN_COMPRESS_SIZE = 512
+# url(...) in a stylesheet, with or without quotes
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MANIFEST = 'manifest.json'
+
+
+def fingerprinted(name, content):
+    root, extension = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def rewrite_css_urls(name, content, manifest, prefix):
+    # Points the url()s of a stylesheet at the fingerprinted fonts and images. The fingerprinted stylesheet sits
+    # in the same directory under prefix as they do, so the urls stay relative.
+    directory = posixpath.dirname(name)
+
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        # Font urls often carry ?#iefix or ?v=1.2, kept as they are
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], posixpath.join(prefix, directory))
+        return f'url({quote}{relative}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, content.decode('utf-8', 'surrogateescape')).encode('utf-8', 'surrogateescape')
+
+
+def compressed_copies(path, content):
+    # Writes <path>.gz (and <path>.br) when the file type compresses and the copy is meaningfully smaller
+    written = []
+    if posixpath.splitext(path)[1].lower() not in COMPRESS_EXTENSIONS or len(content) < MIN_COMPRESS_SIZE:
+        return written
+    encoders = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    for suffix, encode in encoders:
+        encoded = encode(content)
+        if len(encoded) < len(content) * 0.95:
+            with open(path + suffix, 'wb') as file:
+                file.write(encoded)
+            written.append(path + suffix)
+    return written
+
+
+def load_manifest(output_folder):
+    try:
+        with open(os.path.join(output_folder, MANIFEST)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def check_output_folder(static_folder, output_folder):
+    # The fingerprinted files are served by the static route, which only reaches files under the static folder.
+    # The folder itself would not do either: a build removes the files in its output folder that it did not write.
+    static_folder, output_folder = os.path.abspath(static_folder), os.path.abspath(output_folder)
+    if output_folder == static_folder or os.path.commonpath([static_folder, output_folder]) != static_folder:
+        raise ValueError(f'STATIC_BUILD_DIR must be a directory inside the static folder {static_folder}, '
+                         f'got {output_folder}')
+
+
+def build_assets(static_folder, output_folder):
+    """Copy every static file to output_folder under a name carrying a hash of its content, with compressed copies.
+
+    Writes manifest.json mapping each file's name (as passed to url_for('static')) to its fingerprinted name,
+    relative to the static folder. Stylesheets are written last, their url()s rewritten to the fingerprinted
+    files first. The files of the previous build stay until the build after this one, so pages still being
+    served by workers that have not reloaded yet keep loading. Returns (files, compressed copies, removed).
+    Raises ValueError when output_folder is not inside static_folder.
+    """
+    check_output_folder(static_folder, output_folder)
+    previous = load_manifest(output_folder)
+    prefix = posixpath.relpath(output_folder, static_folder).replace(os.sep, '/')
+    names = []
+    for directory, subdirectories, files in os.walk(static_folder):
+        if os.path.abspath(directory) == os.path.abspath(output_folder):
+            subdirectories[:] = []
+            continue
+        subdirectories[:] = [name for name in subdirectories
+                             if os.path.abspath(os.path.join(directory, name)) != os.path.abspath(output_folder)]
+        for file_name in files:
+            if file_name.startswith('.') or os.path.splitext(file_name)[1].lower() in SKIP_EXTENSIONS:
+                continue
+            names.append(os.path.relpath(os.path.join(directory, file_name), static_folder).replace(os.sep, '/'))
+    names.sort(key=lambda name: (name.endswith('.css'), name))
+
+    manifest = {}
+    compressed = 0
+    for name in names:
+        with open(os.path.join(static_folder, name), 'rb') as file:
+            content = file.read()
+        if name.endswith('.css'):
+            content = rewrite_css_urls(name, content, manifest, prefix)
+        target = posixpath.join(prefix, fingerprinted(name, content))
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            with open(path, 'wb') as file:
+                file.write(content)
+            compressed += len(compressed_copies(path, content))
+        manifest[name] = target
+
+    # Written aside and renamed, a process reading it at this moment gets the old or the new one whole
+    manifest_path = os.path.join(output_folder, MANIFEST)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    keep = {os.path.normpath(os.path.join(static_folder, target))
+            for target in list(manifest.values()) + list(previous.values())}
+    removed = 0
+    for directory, _, files in os.walk(output_folder):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            original = re.sub(r'\.(gz|br)$', '', path)
+            if file_name != MANIFEST and os.path.normpath(original) not in keep:
+                os.remove(path)
+                removed += 1
+    return len(manifest), compressed, removed
+
+
+class StaticAssets:
+    """Serves the output of build_assets(): url_for('static') names the fingerprinted copy of a file, which is
+    sent precompressed (brotli or gzip, whichever the browser accepts) and cached by the browser for a year
+    without revalidating. A new build gives changed files new names, so nothing stale is ever served.
+
+    Without a build (development) url_for('static') and the static route behave as Flask's own.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.manifest = {}
+        self.fingerprinted = set()
+        self.version = None
+
+    def init_app(self, app):
+        check_output_folder(app.static_folder, self.output_folder)
+        self.manifest = load_manifest(self.output_folder)
+        self.fingerprinted = set(self.manifest.values())
+        # Part of the page ETags, a page naming other assets after a build is a different page
+        self.version = hashlib.sha1(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()[:12] \
+            if self.manifest else None
+        app.url_defaults(self._url_defaults)
+        app.view_functions['static'] = self.send_static_file
+
+    def _url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def send_static_file(self, filename):
+        app = current_app
+        if filename not in self.fingerprinted:
+            return app.send_static_file(filename)
+
+        # send_from_directory() picks the type from the name, the compressed copy is the original's type
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        encoding = None
+        for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if accepted[name] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                encoding = name
+                filename += suffix
+                break
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=31536000)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
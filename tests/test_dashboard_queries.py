@@ -0,0 +1,85 @@
+# test_dashboard_queries.py
+# A dashboard search is one round trip for the page of listings and the total count together
+
+import pytest
+from sqlalchemy import event
+
+ANY = {'prop_type_filter': 'Any', 'prop_category_filter': 'Any'}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def reading(self, table):
+        return [statement for statement in self.statements if f'FROM {table}' in statement]
+
+
+def dashboard_get(client, pagination):
+    query = dict(ANY, sort='price', page=2)
+    if pagination == 'cursor':
+        query = dict(ANY, sort='price', pagination='cursor')
+    return client.get('/dashboard', query_string=query)
+
+
+def dashboard_post(client, pagination):
+    query = {'page': 2} if pagination == 'offset' else {'pagination': 'cursor'}
+    return client.post('/dashboard', query_string=query, data=dict(ANY, min_price_filter='500000'))
+
+
+# (request, pagination, statements): the signed in user, the search, and for the full page the area statistics
+@pytest.mark.parametrize('send, pagination, expected', [
+    (dashboard_get, 'offset', 3),
+    (dashboard_get, 'cursor', 3),
+    (dashboard_post, 'offset', 2),
+    (dashboard_post, 'cursor', 2),
+])
+def test_dashboard_statement_count(app_module, client, monkeypatch, send, pagination, expected):
+    # The first request also loads the data version and facets, which are cached after it. The version is
+    # otherwise re-read every second, a slow run would count it.
+    monkeypatch.setattr(app_module.properties_version, 'max_age', 3600)
+    assert send(client, pagination).status_code == 200
+
+    with StatementCounter(app_module.engine) as counter:
+        response = send(client, pagination)
+
+    assert response.status_code == 200
+    assert len(counter.reading('properties')) == 1, counter.statements
+    assert len(counter.statements) == expected, counter.statements
+
+
+def test_metrics_report_the_result_cache(app_module, client):
+    dashboard_get(client, 'offset')
+    stats = app_module.dashboard_cache.stats()
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    prefix = app_module.request_metrics.prefix
+    for name, key in [('hits_total', 'hits'), ('misses_total', 'misses'), ('evictions_total', 'evictions'),
+                      ('entries', 'size')]:
+        assert f'{prefix}_dashboard_cache_{name} {stats[key]}' in lines
+
+
+def js_text(value):
+    # What jQuery's .text() shows for a JSON value, a whole float loses its decimal
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def test_bathrooms_read_the_same_in_the_page_and_the_json(client):
+    page = client.get('/dashboard', query_string=dict(ANY, sort='id')).get_data(as_text=True)
+    properties = client.post('/dashboard', query_string={'sort': 'id'}, data=ANY).get_json()['properties']
+    bathrooms = [row['bathrooms'] for row in properties if row['bathrooms'] is not None]
+    assert bathrooms
+    for value in bathrooms:
+        assert f'<td data-column="bathrooms">{js_text(value)}</td>' in page
@@ -0,0 +1,134 @@
+# test_mail_outbox.py
+# OutboxSender against a local SMTP server, whose answer depends on the recipient
+
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from mail_outbox import OutboxSender, SmtpConnection, enqueue
+from models import Base, OutboxMessage
+
+BACKOFF = 30
+
+
+class Handler:
+    def __init__(self):
+        self.connections = 0
+        self.delivered = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('busy'):
+            return '451 4.3.2 Try again later'
+        if address.startswith('unknown'):
+            return '550 5.1.1 No such mailbox'
+        if address.startswith('drop'):
+            server.transport.abort()
+            return '421 4.3.0 Closing'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.append(envelope.rcpt_tos[:])
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    handler = Handler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield handler, controller
+    controller.stop()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(engine, tables=[OutboxMessage.__table__])
+    yield sessionmaker(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def sender(smtp, session_factory):
+    _, controller = smtp
+    settings = {'host': '127.0.0.1', 'port': controller.port, 'starttls': False}
+    return OutboxSender(session_factory, settings, workers=0, batch_size=10, backoff=BACKOFF,
+                        sender_name='Mailer <mailer@example.com>')
+
+
+def queue(session_factory, *recipients):
+    with session_factory() as db_session:
+        return [enqueue(db_session, f'To {recipient}', recipient, '<p>Hello</p>') for recipient in recipients]
+
+
+def messages(session_factory):
+    with session_factory() as db_session:
+        return {message.recipients: message for message in db_session.query(OutboxMessage)}
+
+
+def test_batch_is_sent_over_one_connection(smtp, sender, session_factory):
+    handler, _ = smtp
+    queue(session_factory, 'a@example.com', 'b@example.com', 'c@example.com')
+    assert sender.drain() == (3, 0)
+    assert handler.delivered == [['a@example.com'], ['b@example.com'], ['c@example.com']]
+    assert handler.connections == 1
+    assert {message.status for message in messages(session_factory).values()} == {'sent'}
+
+    # The connection a worker keeps is reused from one batch to the next
+    connection = SmtpConnection(**sender.smtp_settings)
+    for _ in range(2):
+        queue(session_factory, 'd@example.com', 'e@example.com')
+        assert sender.process_batch(connection) == (2, 0, 2)
+    connection.close()
+    assert connection.connects == 1
+
+
+def test_temporary_rejection_is_retried_and_permanent_one_failed(sender, session_factory):
+    start = datetime.utcnow()
+    queue(session_factory, 'busy@example.com', 'unknown@example.com', 'ok@example.com')
+    assert sender.drain() == (1, 2)
+
+    by_recipient = messages(session_factory)
+    busy, unknown = by_recipient['busy@example.com'], by_recipient['unknown@example.com']
+    assert (busy.status, busy.attempts) == ('pending', 1)
+    assert busy.next_attempt_at >= start + timedelta(seconds=BACKOFF)
+    assert '451' in busy.last_error
+    assert (unknown.status, unknown.attempts) == ('failed', 1)
+    assert '550' in unknown.last_error
+    assert by_recipient['ok@example.com'].status == 'sent'
+
+    # Not due yet, a second pass sends nothing
+    assert sender.drain() == (0, 0)
+
+
+def test_dropped_connection_releases_the_rest_of_the_batch(smtp, sender, session_factory):
+    handler, _ = smtp
+    queue(session_factory, 'first@example.com', 'drop@example.com', 'second@example.com', 'third@example.com')
+    sender.drain()
+
+    by_recipient = messages(session_factory)
+    assert by_recipient['first@example.com'].status == 'sent'
+    dropped = by_recipient['drop@example.com']
+    assert (dropped.status, dropped.attempts) == ('pending', 1)
+    assert 'SMTPServerDisconnected' in dropped.last_error
+    for recipient in ('second@example.com', 'third@example.com'):
+        released = by_recipient[recipient]
+        assert (released.status, released.attempts or 0, released.last_error) == ('pending', 0, None)
+        assert released.next_attempt_at > datetime.utcnow()
+    assert handler.delivered == [['first@example.com']]
@@ -0,0 +1,42 @@
+# test_property_import.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from models import Property
+from property_import import _bounded_map, import_properties
+
+
+def count_properties(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Property.__table__)).scalar()
+
+
+def test_exported_rows_are_not_imported_again(app_module):
+    before = count_properties(app_module.engine)
+    rows = [(2, {'id': '17', 'street_name': 'Exported Street', 'price': '1000000'}),
+            (3, {'id': '', 'street_name': 'New Street', 'price': '1 200 000'}),
+            (4, {'street_name': 'Other Street', 'price': 'R950000'})]
+    report = import_properties(app_module.engine, rows, workers=1)
+
+    assert (report.rows, report.inserted) == (3, 2)
+    assert [row_number for row_number, _ in report.errors] == [2]
+    assert report.errors[0][1].startswith('id:')
+    assert count_properties(app_module.engine) == before + 2
+
+
+def test_chunks_are_read_as_they_are_processed():
+    read = []
+
+    def items():
+        for number in range(100):
+            read.append(number)
+            yield number
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = _bounded_map(executor, lambda number: number * 2, items(), window=4)
+        assert next(results) == 0
+        # The first result was taken once the window was full, nothing past it has been read
+        assert len(read) == 5
+        assert list(results) == [number * 2 for number in range(1, 100)]
@@ -0,0 +1,83 @@
+# test_request_metrics.py
+# Requests are sent buffered=True: the test client then reads and closes the body as a server does
+
+import time
+
+import pytest
+from flask import Flask, Response, abort
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from request_metrics import RequestMetrics
+
+
+@pytest.fixture
+def metrics():
+    return RequestMetrics(prefix='test')
+
+
+@pytest.fixture
+def client(metrics):
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/ok')
+    def ok():
+        return 'ok'
+
+    @app.route('/missing')
+    def missing():
+        abort(404)
+
+    @app.route('/fails')
+    def fails():
+        raise RuntimeError('broken')
+
+    @app.route('/stream')
+    def stream():
+        def chunks():
+            for _ in range(3):
+                time.sleep(0.05)
+                yield 'chunk'
+        return Response(chunks())
+
+    return app.test_client()
+
+
+def observed(metrics, labels):
+    # (count, sum of seconds) of the request latency series with these labels
+    counts, total = metrics.requests._series[labels]
+    return sum(counts), total
+
+
+def test_status_of_each_request(metrics, client):
+    assert client.get('/ok', buffered=True).status_code == 200
+    assert client.get('/missing', buffered=True).status_code == 404
+    assert client.get('/nowhere', buffered=True).status_code == 404
+    assert observed(metrics, ('ok', 'GET', '200'))[0] == 1
+    assert observed(metrics, ('missing', 'GET', '404'))[0] == 1
+    assert observed(metrics, ('unmatched', 'GET', '404'))[0] == 1
+
+
+def test_exception_is_recorded_as_500(metrics, client):
+    assert client.get('/fails', buffered=True).status_code == 500
+    assert observed(metrics, ('fails', 'GET', '500'))[0] == 1
+
+
+def test_streamed_response_is_timed_until_the_body_is_closed(metrics, client):
+    response = client.get('/stream', buffered=True)
+    assert response.get_data(as_text=True) == 'chunk' * 3
+    count, seconds = observed(metrics, ('stream', 'GET', '200'))
+    assert count == 1
+    assert seconds >= 0.15
+
+
+def test_failed_statement_raises_its_own_error(metrics):
+    engine = create_engine('sqlite://')
+    metrics.attach(engine)
+    with engine.connect() as conn:
+        conn.execute(text('CREATE TABLE pairs (a INTEGER PRIMARY KEY)'))
+        conn.execute(text('INSERT INTO pairs VALUES (1)'))
+        with pytest.raises(IntegrityError):
+            conn.execute(text('INSERT INTO pairs VALUES (1)'))
+        assert not conn.info['metrics_statement_start']
@@ -0,0 +1,41 @@
+# test_result_cache.py
+
+from result_cache import SharedVersion
+
+
+class SharedStore:
+    # The data_versions row every process reads and bumps
+    def __init__(self):
+        self.version = 0
+
+    def load(self):
+        return self.version, None
+
+    def bump(self):
+        self.version += 1
+        return self.version, None
+
+
+def test_bump_over_another_process_bump_reports_the_change():
+    store = SharedStore()
+    changes = []
+    this = SharedVersion(store.load, store.bump, max_age=3600, on_change=lambda: changes.append(1))
+    other = SharedVersion(store.load, store.bump, max_age=3600)
+
+    this.bump()
+    assert this.current()[0] == 1 and changes == []
+    other.bump()
+    # Within max_age this process still holds 1, its own bump lands on 3
+    assert this.bump()[0] == 3
+    assert changes == [1]
+    assert this.current()[0] == 3
+
+
+def test_own_bumps_are_not_changes():
+    store = SharedStore()
+    changes = []
+    version = SharedVersion(store.load, store.bump, max_age=3600, on_change=lambda: changes.append(1))
+    version.current()
+    for _ in range(3):
+        version.bump()
+    assert version.current()[0] == 3 and changes == []
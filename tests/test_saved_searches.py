@@ -0,0 +1,113 @@
+# test_saved_searches.py
+
+import json
+import random
+
+import pytest
+from sqlalchemy import event, select, text
+
+from saved_searches import MATCH_COLUMNS, SearchIndex
+from test_search_engine import filter_choices
+
+FILTER_NAMES = ['area_filter', 'min_price_filter', 'max_price_filter', 'street_name_filter', 'complex_name_filter',
+                'number_filter', 'bedroom_filter', 'bathroom_filter', 'garages_filter', 'carports_filter',
+                'swimming_pool_filter', 'garden_flat_filter', 'study_filter', 'ground_floor_filter',
+                'pet_friendly_filter', 'prop_type_filter', 'prop_category_filter', 'agent_filter',
+                'floor_area_filter', 'floor_area_select', 'stand_area_filter', 'stand_area_select']
+
+
+def search_filters(**values):
+    # A filter set as build_filters_from_form() returns it
+    filters = dict.fromkeys(FILTER_NAMES)
+    filters.update(prop_type_filter='Any', prop_category_filter='Any', floor_area_select='=', stand_area_select='=')
+    filters.update(values)
+    return filters
+
+
+@pytest.fixture
+def saved_search(app_module):
+    # One search on the most common area, saved by user0
+    with app_module.Session() as db_session:
+        area = db_session.execute(text(
+            'SELECT area FROM properties GROUP BY area ORDER BY count(*) DESC LIMIT 1')).scalar()
+        search = app_module.SavedSearch(user_id=db_session.query(app_module.User.id).filter_by(
+            email='user0@example.com').scalar(), name='Test', filters=json.dumps(search_filters(area_filter=area)))
+        db_session.add(search)
+        db_session.commit()
+        search_id = search.id
+    app_module.saved_search_index.invalidate()
+    yield search_id, area
+    with app_module.engine.begin() as conn:
+        conn.execute(text('DELETE FROM saved_search_matches WHERE search_id = :id'), {'id': search_id})
+        conn.execute(text('DELETE FROM saved_searches WHERE id = :id'), {'id': search_id})
+    app_module.saved_search_index.invalidate()
+
+
+def recorded_matches(app_module, search_id):
+    with app_module.engine.connect() as conn:
+        return {property_id for (property_id,) in conn.execute(text(
+            'SELECT property_id FROM saved_search_matches WHERE search_id = :id'), {'id': search_id})}
+
+
+def test_matches_recorded_by_another_process_meanwhile_leave_the_rest(app_module, saved_search):
+    search_id, area = saved_search
+    with app_module.engine.connect() as conn:
+        property_ids = [property_id for (property_id,) in conn.execute(
+            text('SELECT id FROM properties WHERE area = :area ORDER BY id LIMIT 10'), {'area': area})]
+
+    # Another process records the first match between the check and the insert of this one
+    flushes = []
+
+    def record_elsewhere(session, flush_context, instances):
+        flushes.append(1)
+        if len(flushes) > 1:
+            return
+        with app_module.engine.begin() as conn:
+            conn.execute(text('INSERT INTO saved_search_matches (search_id, property_id) VALUES (:s, :p)'),
+                         {'s': search_id, 'p': property_ids[0]})
+
+    event.listen(app_module.Session, 'before_flush', record_elsewhere)
+    try:
+        with app_module.app.test_request_context():
+            recorded = app_module.notify_saved_searches(property_ids)
+    finally:
+        event.remove(app_module.Session, 'before_flush', record_elsewhere)
+
+    assert recorded == len(property_ids) - 1
+    assert recorded_matches(app_module, search_id) == set(property_ids)
+
+
+def test_index_matches_what_apply_filters_returns(app_module):
+    with app_module.app.app_context():
+        choices = filter_choices(app_module)
+    rng = random.Random(7)
+    searches = []
+    for _ in range(150):
+        # Up to three filters at a time, like the columnar engine parity test
+        filters = search_filters(floor_area_select=rng.choice(['=', '>', '<']),
+                                 stand_area_select=rng.choice(['=', '>', '<']))
+        for name in rng.sample(sorted(choices), rng.randint(0, 3)):
+            filters[name] = rng.choice(choices[name])
+        searches.append(filters)
+    # Price ranges narrow enough to be filed under their buckets, with and without an area
+    prices = sorted(int(price) for price in choices['min_price_filter'])
+    for low, high in zip(prices, prices[1:]):
+        searches.append(search_filters(min_price_filter=str(low), max_price_filter=str(high)))
+        searches.append(search_filters(area_filter=rng.choice(choices['area_filter']), max_price_filter=str(high),
+                                       bedroom_filter=rng.choice(['2', '3+'])))
+
+    index = SearchIndex()
+    for search_id, filters in enumerate(searches):
+        index.add(search_id, filters)
+    matched = {search_id: set() for search_id in range(len(searches))}
+    with app_module.engine.connect() as conn:
+        for row in conn.execute(select(*[getattr(app_module.Property, column)
+                                         for column in MATCH_COLUMNS])).mappings():
+            for search_id in index.match(dict(row)):
+                matched[search_id].add(row['id'])
+
+    with app_module.app.app_context():
+        for search_id, filters in enumerate(searches):
+            expected = {property_id for (property_id,) in app_module.apply_filters(
+                app_module.Property.query.with_entities(app_module.Property.id), filters)}
+            assert matched[search_id] == expected, {name: value for name, value in filters.items() if value}
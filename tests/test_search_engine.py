@@ -0,0 +1,141 @@
+# test_search_engine.py
+# The columnar engine must return exactly what apply_filters() returns, after a rebuild and after refreshes
+
+import random
+
+import pytest
+from sqlalchemy import text
+
+import search_engine
+from search_engine import ColumnarSearchEngine
+
+
+@pytest.fixture
+def search(app_module, tmp_path):
+    with app_module.app.app_context():
+        engine = ColumnarSearchEngine(str(tmp_path))
+        engine.rebuild(app_module.db.session)
+        yield engine
+
+
+def filter_choices(app_module):
+    # Values of each filter, taken from the seeded data so that most of them match rows
+    db, Property = app_module.db, app_module.Property
+    areas = [area for (area,) in db.session.query(
+        Property.area).filter(Property.area.isnot(None)).distinct()]
+    agents = [agent for (agent,) in db.session.query(
+        Property.agent).filter(Property.agent.isnot(None)).distinct()]
+    prices = sorted(price for (price,) in db.session.query(
+        Property.price).filter(Property.price.isnot(None)).limit(1000))
+    return {
+        'area_filter': areas + [','.join(pair) for pair in zip(areas, areas[1:])] + ['park'],
+        'min_price_filter': [str(price) for price in prices[::50]],
+        'max_price_filter': [str(price) for price in prices[::50]],
+        'street_name_filter': ['st', 'ree'],
+        'complex_name_filter': ['com'],
+        'number_filter': ['1', '12'],
+        'bedroom_filter': ['', '1', '2', '2+', '3', '3+', '4+'],
+        'bathroom_filter': ['', '1', '2', '2+', '3+'],
+        'garages_filter': ['', '1', '2+'],
+        'carports_filter': ['', '1', '2+'],
+        'swimming_pool_filter': ['true', 'false'],
+        'garden_flat_filter': ['true', 'false'],
+        'study_filter': ['true', 'false'],
+        'ground_floor_filter': ['true', 'false'],
+        'pet_friendly_filter': ['true', 'false'],
+        'prop_type_filter': ['Residential', 'Commercial', None],
+        'prop_category_filter': ['Full Title', 'Apartment', 'Townhouse'],
+        'agent_filter': [agent[:5] for agent in agents[:5]],
+        'floor_area_filter': ['100', '250'],
+        'stand_area_filter': ['300', '1000'],
+    }
+
+
+def assert_parity(app_module, search, samples=200, seed=42):
+    choices = filter_choices(app_module)
+    rng = random.Random(seed)
+    for _ in range(samples):
+        # Up to three filters at a time, more rarely match anything
+        filters = dict.fromkeys(choices, None)
+        filters.update(prop_type_filter='Any', prop_category_filter='Any')
+        for name in rng.sample(sorted(choices), rng.randint(0, 3)):
+            filters[name] = rng.choice(choices[name])
+        filters['floor_area_select'] = rng.choice(['=', '>', '<'])
+        filters['stand_area_select'] = rng.choice(['=', '>', '<'])
+        sort = rng.choice(list(app_module.SORT_COLUMNS))
+        descending = rng.random() < 0.5
+
+        expected = [property_id for (property_id,) in app_module.apply_filters(
+            app_module.Property.query.with_entities(app_module.Property.id), filters).order_by(
+            *app_module.property_ordering(sort, descending))]
+        actual, total = search.search(filters, sort, descending, page=1, per_page=max(len(expected), 1))
+        assert (actual, total) == (expected, len(expected)), (sort, descending, filters)
+
+        # A later page is cut from the same order
+        if len(expected) > 10:
+            page, _ = search.search(filters, sort, descending, page=2, per_page=10)
+            assert page == expected[10:20], (sort, descending, filters)
+
+
+def write_properties(app_module):
+    # Updates, deletes and adds properties behind the engine's back, returns the ids written
+    with app_module.engine.begin() as conn:
+        updated = [row.id for row in conn.execute(text('SELECT id FROM properties ORDER BY id LIMIT 30'))]
+        conn.execute(text("UPDATE properties SET price = price * 2, area = 'Aaa New Area', bedrooms = NULL "
+                          "WHERE id IN (%s)" % ','.join(map(str, updated[:10]))))
+        conn.execute(text("UPDATE properties SET price = NULL, prop_category = 'Apartment' "
+                          "WHERE id IN (%s)" % ','.join(map(str, updated[10:20]))))
+        conn.execute(text('DELETE FROM properties WHERE id IN (%s)' % ','.join(map(str, updated[20:]))))
+        conn.execute(text("INSERT INTO properties (street_name, area, price, bedrooms, prop_type, prop_category) "
+                          "VALUES ('Zz Street', 'Zzz Area', 1500000, 3, 'Residential', 'Full Title'), "
+                          "('Yy Street', NULL, NULL, NULL, 'Commercial', 'Townhouse')"))
+        added = [row.id for row in conn.execute(text('SELECT id FROM properties ORDER BY id DESC LIMIT 2'))]
+    return updated + added
+
+
+def test_rebuild_parity(app_module, search):
+    assert search.generation()[1] is None
+    assert_parity(app_module, search)
+
+
+def test_refresh_writes_a_delta(app_module, search):
+    snapshot = search.snapshot()
+    search.refresh(app_module.db.session, write_properties(app_module))
+    assert search.snapshot() is snapshot
+    assert search.generation()[1].number == 1
+    assert_parity(app_module, search)
+
+    # A second refresh carries the first one's rows over
+    search.refresh(app_module.db.session, write_properties(app_module))
+    assert search.generation()[1].number == 2
+    assert_parity(app_module, search, seed=7)
+
+
+def test_refresh_merges_a_full_delta(app_module, search, monkeypatch):
+    monkeypatch.setattr(search_engine, 'MAX_DELTA_ROWS', 10)
+    version = search.snapshot().version
+    search.refresh(app_module.db.session, write_properties(app_module))
+    snapshot, delta = search.generation()
+    assert (snapshot.version, delta) == (version + 1, None)
+    assert_parity(app_module, search)
+
+
+def test_rebuild_after_invalidate(app_module, search):
+    version = search.snapshot().version
+    search.invalidate()
+    assert search.snapshot() is None
+    search.rebuild(app_module.db.session)
+    assert search.snapshot().version == version + 1
+    assert_parity(app_module, search, samples=50)
+
+    # A refresh with nothing live builds the snapshot afresh too
+    search.invalidate()
+    search.refresh(app_module.db.session, [1])
+    assert search.snapshot().version == version + 2
+    assert_parity(app_module, search, samples=50)
+
+
+def test_rebuild_if_missing_keeps_a_live_snapshot(app_module, search):
+    snapshot = search.snapshot()
+    search.rebuild(app_module.db.session, if_missing=True)
+    assert search.snapshot() is snapshot
@@ -0,0 +1,38 @@
+# test_slow_queries.py
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from slow_queries import SlowQueryLog, locks_rows
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT * FROM properties WHERE id = %(id)s FOR UPDATE',
+    'SELECT id FROM outbox ORDER BY id LIMIT 10 FOR UPDATE SKIP LOCKED',
+    'select * from users for no key update',
+    'SELECT * FROM properties\nFOR\n  SHARE OF properties NOWAIT',
+    'SELECT * FROM properties FOR KEY SHARE',
+])
+def test_locking_selects_are_not_analyzed(statement):
+    assert locks_rows(statement)
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT * FROM properties WHERE area = %(area)s',
+    'SELECT before_update, shared FROM audit',
+    'SELECT count(*) FROM properties',
+])
+def test_plain_selects_are_analyzed(statement):
+    assert not locks_rows(statement)
+
+
+def test_failed_statement_raises_its_own_error():
+    engine = create_engine('sqlite://')
+    SlowQueryLog().attach(engine)
+    with engine.connect() as conn:
+        conn.execute(text('CREATE TABLE pairs (a INTEGER PRIMARY KEY)'))
+        conn.execute(text('INSERT INTO pairs VALUES (1)'))
+        with pytest.raises(IntegrityError):
+            conn.execute(text('INSERT INTO pairs VALUES (1)'))
+        assert not conn.info['slow_query_start']
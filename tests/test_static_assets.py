@@ -0,0 +1,50 @@
+# test_static_assets.py
+
+import pytest
+from flask import Flask, url_for
+
+from static_assets import IMMUTABLE, StaticAssets, build_assets
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    folder = tmp_path / 'static'
+    (folder / 'css').mkdir(parents=True)
+    (folder / 'fonts').mkdir()
+    (folder / 'fonts' / 'icons.woff').write_bytes(b'font')
+    (folder / 'css' / 'style.css').write_text("body { background: url('../fonts/icons.woff'); }" + ' ' * 1000)
+    return folder
+
+
+def make_app(static_folder, output_folder):
+    app = Flask(__name__, static_folder=str(static_folder))
+    StaticAssets(str(output_folder)).init_app(app)
+    return app
+
+
+@pytest.mark.parametrize('output', ['../dist', '.'])
+def test_build_dir_outside_static_is_refused(static_folder, output):
+    with pytest.raises(ValueError):
+        make_app(static_folder, static_folder / output)
+    with pytest.raises(ValueError):
+        build_assets(str(static_folder), str(static_folder / output))
+
+
+def test_built_files_are_served(static_folder):
+    files, compressed, _ = build_assets(str(static_folder), str(static_folder / 'build' / 'v1'))
+    # Only the stylesheet is large enough to compress, gzip and brotli when it is installed
+    assert files == 2 and compressed >= 1
+    app = make_app(static_folder, static_folder / 'build' / 'v1')
+
+    with app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+    assert url.startswith('/static/build/v1/css/style.')
+
+    client = app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    response.close()
+    # The original stays reachable by its own name
+    assert client.get('/static/css/style.css').status_code == 200
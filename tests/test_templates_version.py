@@ -0,0 +1,24 @@
+# test_templates_version.py
+
+import os
+
+
+def test_nested_templates_change_the_version(app_module, tmp_path, monkeypatch):
+    nested = tmp_path / 'templates' / 'pages' / 'forms'
+    nested.mkdir(parents=True)
+    (tmp_path / 'templates' / 'base.html').write_text('base')
+    (nested / 'basic_elements.html').write_text('form')
+    for path in [tmp_path / 'templates', tmp_path / 'templates' / 'pages', nested,
+                 tmp_path / 'templates' / 'base.html', nested / 'basic_elements.html']:
+        os.utime(path, (1000, 1000))
+    monkeypatch.setattr(app_module.app, 'root_path', str(tmp_path))
+    monkeypatch.setattr(app_module.app, 'template_folder', 'templates')
+    monkeypatch.setattr(app_module.app, 'debug', True)
+    monkeypatch.setattr(app_module, '_templates_version', None)
+
+    assert app_module.templates_version() == 1000
+    os.utime(nested / 'basic_elements.html', (2000, 2000))
+    assert app_module.templates_version() == 2000
+    (nested / 'basic_elements.html').unlink()
+    os.utime(nested, (3000, 3000))
+    assert app_module.templates_version() == 3000
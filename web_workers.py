@@ -0,0 +1,140 @@
+# web_workers.py
+
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+# A worker rewrites its status file at most this often while it serves requests
+WRITE_INTERVAL = 1.0
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerBoard:
+    """Status of every web server process, one small JSON file per process in a directory they share.
+
+    Each worker registers itself after it has started (pid, the master that forked it, threads), marks
+    itself ready once it has warmed up and keeps its request count current with served(). Any process
+    can read the whole board: /admin/workers lists it, and a graceful reload waits on it until the new
+    workers are ready. Files of processes that have exited are dropped when the board is read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.status = None
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def register(self, pid, master=None, threads=None):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.status = {'pid': pid, 'master': master, 'threads': threads, 'ready': False, 'requests': 0,
+                           'started_at': datetime.utcnow().isoformat(timespec='seconds'), 'last_request_at': None}
+            self._write()
+
+    def set_ready(self, ready=True):
+        with self._lock:
+            if self.status is not None:
+                self.status['ready'] = ready
+                self._write()
+
+    def served(self, requests):
+        with self._lock:
+            if self.status is None:
+                return
+            self.status['requests'] = requests
+            self.status['last_request_at'] = datetime.utcnow().isoformat(timespec='seconds')
+            if time.monotonic() - self._written >= WRITE_INTERVAL:
+                self._write()
+
+    def current(self):
+        with self._lock:
+            return dict(self.status) if self.status is not None else None
+
+    def remove(self, pid):
+        try:
+            os.remove(self.path(pid))
+        except FileNotFoundError:
+            pass
+
+    def workers(self, master=None):
+        """Status of every live worker (of one master when given), ordered by pid."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        workers = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    status = json.load(file)
+            except (OSError, ValueError):
+                # Being replaced at this moment, or removed since listdir()
+                continue
+            if not process_alive(status['pid']):
+                self.remove(status['pid'])
+                continue
+            if master is None or status.get('master') == master:
+                workers.append(status)
+        return sorted(workers, key=lambda status: status['pid'])
+
+    def _write(self):
+        # Written aside and renamed over the old file, so a reader never sees half of it
+        path = self.path(self.status['pid'])
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.status, file)
+        os.replace(path + '.tmp', path)
+        self._written = time.monotonic()
+
+
+def read_pid(path):
+    try:
+        with open(path) as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def reload_server(pidfile, board, workers, timeout=60, poll=0.5):
+    """Replace a running gunicorn master and its workers with new ones running the current code.
+
+    USR2 makes the master start a new master from the same command line, which writes <pidfile>.2; both
+    accept connections on the inherited socket while the new workers boot. Once `workers` of them report
+    ready on the board, TERM shuts the old master down gracefully (its workers finish the requests they
+    have) and the new master takes over the pid file. When the new workers do not get ready within
+    `timeout` seconds the new master is stopped instead and the old one keeps serving. Returns the pid of
+    the new master, raises RuntimeError when the reload failed.
+    """
+    old = read_pid(pidfile)
+    if old is None or not process_alive(old):
+        raise RuntimeError(f'No running server found through {pidfile}')
+    os.kill(old, signal.SIGUSR2)
+
+    deadline = time.monotonic() + timeout
+    new = None
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        new = new or read_pid(pidfile + '.2')
+        if new is not None and sum(status['ready'] for status in board.workers(master=new)) >= workers:
+            os.kill(old, signal.SIGTERM)
+            return new
+
+    if new is not None and process_alive(new):
+        os.kill(new, signal.SIGTERM)
+    raise RuntimeError(f'The new workers were not ready within {timeout}s, the old server keeps serving')